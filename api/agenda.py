@@ -0,0 +1,122 @@
+# api/agenda.py
+"""
+Agenda da equipe: linha do tempo por funcionário e dia com agendamentos,
+bloqueios e os intervalos livres do expediente entre eles.
+
+Os dados vêm de uma consulta por modelo para todo o período (agendamentos,
+bloqueios e pais de séries por regra); os intervalos livres saem do mesmo
+cálculo de janelas usado na disponibilidade (api/availability.py).
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .availability import MAX_BOOKING_SPAN, day_bounds, free_windows, performer_windows, to_day_minutes
+from .models import Appointment, TimeBlock
+from .recurrence import rule_parents, virtual_occurrences
+
+HIDDEN_STATUSES = ('CANCELLED',)
+
+
+def _overlapping(queryset, start_field, end_field, employee_ids, range_start, range_end):
+    # Limite inferior no início para percorrer o índice (employee, início) como faixa.
+    return queryset.filter(**{
+        'employee_id__in': employee_ids,
+        f'{start_field}__gt': range_start - MAX_BOOKING_SPAN,
+        f'{start_field}__lt': range_end,
+        f'{end_field}__gt': range_start,
+    })
+
+
+def _appointment_item(appointment, is_virtual=False):
+    return {
+        'type': 'appointment',
+        'start': appointment.appointment_time,
+        'end': appointment.end_time,
+        'id': appointment.pk,
+        'status': appointment.status,
+        'pet': appointment.pet.name if appointment.pet_id else None,
+        'service': appointment.service.name if appointment.service_id else None,
+        'client_name': appointment.client_name,
+        'recurrence_parent': appointment.recurrence_parent_id,
+        'is_virtual': is_virtual,
+    }
+
+
+def load_items(employee_ids, range_start, range_end):
+    """
+    Itens (employee_id, item) do período: agendamentos não cancelados,
+    bloqueios e ocorrências virtuais. Três consultas no total.
+    """
+    appointments = _overlapping(
+        Appointment.objects.exclude(status__in=HIDDEN_STATUSES).select_related('pet', 'service'),
+        'appointment_time', 'end_time', employee_ids, range_start, range_end,
+    )
+    items = [(appointment.employee_id, _appointment_item(appointment)) for appointment in appointments]
+
+    blocks = _overlapping(TimeBlock.objects.all(), 'start_time', 'end_time', employee_ids, range_start, range_end)
+    items.extend(
+        (block.employee_id, {'type': 'time_block', 'start': block.start_time, 'end': block.end_time,
+                             'id': block.pk, 'reason': block.reason})
+        for block in blocks
+    )
+
+    parents = rule_parents(range_start, range_end).filter(employee_id__in=employee_ids).select_related('pet', 'service')
+    for parent, start, end in virtual_occurrences(parents, range_start, range_end):
+        occurrence = Appointment(
+            pet=parent.pet, service=parent.service, client_name=parent.client_name, status='PENDING',
+            appointment_time=start, end_time=end, recurrence_parent_id=parent.pk,
+        )
+        items.append((parent.employee_id, _appointment_item(occurrence, is_virtual=True)))
+    return items
+
+
+def _blocks_schedule(item):
+    return item['type'] == 'time_block' or item['status'] in Appointment.ACTIVE_STATUSES
+
+
+def day_timeline(employee, day, items):
+    """Linha do tempo de um funcionário no dia: `items` mais os intervalos livres, ordenados."""
+    midnight, next_midnight = day_bounds(day)
+    busy = [
+        (to_day_minutes(item['start'], midnight), to_day_minutes(item['end'], midnight, round_up=True))
+        for item in items if item['end'] and _blocks_schedule(item)
+    ]
+    windows = performer_windows(employee, day)
+    gaps = [
+        {'type': 'free', 'start': midnight + timedelta(minutes=start), 'end': midnight + timedelta(minutes=end)}
+        for start, end in free_windows(windows, busy)
+    ]
+    timeline = sorted(items + gaps, key=lambda item: (item['start'], item['type'] != 'free'))
+    return {
+        'date': day,
+        'working_minutes': sum(end - start for start, end in windows),
+        'free_minutes': sum(int((gap['end'] - gap['start']).total_seconds() // 60) for gap in gaps),
+        'timeline': timeline,
+    }
+
+
+def build_agenda(employees, start_day, end_day):
+    """Agenda de `employees` entre `start_day` e `end_day` (inclusive)."""
+    range_start, _ = day_bounds(start_day)
+    _, range_end = day_bounds(end_day)
+    days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+
+    by_employee_day = {}
+    for employee_id, item in load_items([employee.pk for employee in employees], range_start, range_end):
+        # Itens que atravessam a meia-noite aparecem em cada dia que tocam.
+        first = max(timezone.localdate(item['start']), start_day)
+        last = min(timezone.localdate(item['end'] - timedelta(microseconds=1)), end_day) if item['end'] else first
+        day = first
+        while day <= last:
+            by_employee_day.setdefault((employee_id, day), []).append(item)
+            day += timedelta(days=1)
+
+    return [
+        {
+            'employee_id': employee.pk,
+            'username': employee.username,
+            'days': [day_timeline(employee, day, by_employee_day.get((employee.pk, day), [])) for day in days],
+        }
+        for employee in employees
+    ]
@@ -0,0 +1,160 @@
+# api/analytics.py
+"""
+Indicadores de um pet shop num período: faturamento diário, agendamentos
+e faturamento por serviço e ocupação de cada funcionário (minutos
+agendados sobre os minutos de expediente do `work_schedule` compilado).
+
+O agrupamento e as somas são feitos no banco, numa única consulta agrupada
+por (dia, serviço, funcionário) com `TruncDate` no fuso corrente; o resto é
+só somar algumas dezenas de linhas. Os dias já encerrados (antes de hoje)
+ficam em cache, um registro por (pet shop, dia); alterações em
+agendamentos desses dias descartam o registro (api/signals.py e as
+operações em lote de AppointmentViewSet) na hora e de novo no COMMIT, para
+que uma leitura feita no meio da transação não deixe os totais antigos
+em cache.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .availability import day_bounds, performer_windows
+from .models import Appointment, User
+
+# Agendamentos que contam como faturamento.
+REVENUE_STATUSES = ('COMPLETED', 'CONFIRMED')
+# Agendamentos que ocupam a agenda do funcionário (e entram nas contagens).
+BOOKED_STATUSES = ('COMPLETED', *Appointment.ACTIVE_STATUSES)
+ZERO = Decimal('0.00')
+
+
+def _timeout():
+    return getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 86400)
+
+
+def _day_key(petshop_id, day):
+    return f'analytics:{petshop_id}:{day.isoformat()}'
+
+
+def _load_days(petshop_id, first_day, last_day):
+    """
+    Linhas (dia, service_id, serviço, employee_id, funcionário, faturamento,
+    agendamentos, minutos agendados) do período, agrupadas no banco.
+    """
+    range_start, _ = day_bounds(first_day)
+    _, range_end = day_bounds(last_day)
+    duration = ExpressionWrapper(F('end_time') - F('appointment_time'), output_field=DurationField())
+    rows = (
+        Appointment.objects
+        .filter(pet_shop_id=petshop_id, status__in=BOOKED_STATUSES,
+                appointment_time__gte=range_start, appointment_time__lt=range_end)
+        .annotate(day=TruncDate('appointment_time', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'service_id', 'service__name', 'employee_id', 'employee__username')
+        .annotate(
+            revenue=Sum('total_price', filter=Q(status__in=REVENUE_STATUSES)),
+            appointments=Count('id'),
+            booked=Sum(duration),
+        )
+        .order_by()
+    )
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(row['day'], []).append((
+            row['service_id'], row['service__name'], row['employee_id'], row['employee__username'],
+            row['revenue'] or ZERO, row['appointments'],
+            int(row['booked'].total_seconds() // 60) if row['booked'] else 0,
+        ))
+    return by_day
+
+
+def day_rows(petshop_id, days):
+    """{dia: linhas} de `days`, lendo do cache os dias encerrados já calculados."""
+    today = timezone.localdate()
+    closed = [day for day in days if day < today]
+    cached = cache.get_many([_day_key(petshop_id, day) for day in closed])
+    result = {day: cached[_day_key(petshop_id, day)] for day in closed if _day_key(petshop_id, day) in cached}
+    missing = [day for day in days if day not in result]
+    if missing:
+        loaded = _load_days(petshop_id, min(missing), max(missing))
+        for day in missing:
+            result[day] = loaded.get(day, [])
+        cache.set_many(
+            {_day_key(petshop_id, day): result[day] for day in missing if day < today}, _timeout()
+        )
+    return result
+
+
+def invalidate_days(pairs):
+    """Descarta o cache dos pares (pet_shop_id, dia) informados, agora e no COMMIT."""
+    keys = list({_day_key(petshop_id, day) for petshop_id, day in pairs if petshop_id and day})
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _money(value):
+    return str(value.quantize(ZERO))
+
+
+def build_report(petshop, start_day, end_day):
+    """Faturamento diário, totais por serviço e ocupação da equipe entre `start_day` e `end_day`."""
+    days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+    rows_by_day = day_rows(petshop.pk, days)
+
+    daily, services, booked = [], {}, {}
+    usernames = {}
+    for day in days:
+        revenue, count = ZERO, 0
+        for service_id, service_name, employee_id, username, row_revenue, row_count, minutes in rows_by_day[day]:
+            revenue += row_revenue
+            count += row_count
+            service = services.setdefault(service_id, {
+                'service_id': service_id, 'name': service_name, 'appointments': 0, 'revenue': ZERO,
+            })
+            service['appointments'] += row_count
+            service['revenue'] += row_revenue
+            if employee_id is not None:
+                booked[employee_id] = booked.get(employee_id, 0) + minutes
+                usernames[employee_id] = username
+        daily.append({'date': day, 'revenue': _money(revenue), 'appointments': count})
+
+    staff = User.objects.filter(
+        works_at=petshop, user_type__in=['GERENTE', 'FUNCIONARIO']
+    ).only('id', 'username', 'work_schedule').order_by('id')
+    available = {}
+    for employee in staff:
+        usernames[employee.pk] = employee.username
+        available[employee.pk] = sum(
+            end - start for day in days for start, end in performer_windows(employee, day)
+        )
+
+    employees = []
+    for employee_id in sorted(usernames):
+        available_minutes = available.get(employee_id, 0)
+        booked_minutes = booked.get(employee_id, 0)
+        employees.append({
+            'employee_id': employee_id,
+            'username': usernames[employee_id],
+            'booked_minutes': booked_minutes,
+            'available_minutes': available_minutes,
+            'utilization': round(booked_minutes / available_minutes, 4) if available_minutes else None,
+        })
+
+    total_revenue = sum((service['revenue'] for service in services.values()), ZERO)
+    return {
+        'start_date': start_day,
+        'end_date': end_day,
+        'revenue': _money(total_revenue),
+        'appointments': sum(entry['appointments'] for entry in daily),
+        'daily': daily,
+        'services': [
+            dict(service, revenue=_money(service['revenue']))
+            for service in sorted(services.values(), key=lambda service: (-service['appointments'], service['service_id'] or 0))
+        ],
+        'employees': employees,
+    }
@@ -0,0 +1,264 @@
+# api/availability.py
+"""
+Motor de disponibilidade baseado em intervalos.
+
+Em vez de testar cada slot contra cada funcionário e cada agendamento,
+carregamos o dia de cada funcionário uma única vez, montamos a lista
+ordenada de intervalos ocupados (agendamentos, bloqueios e pausas) e
+calculamos as janelas livres com uma varredura (merge/sweep). Os slots
+disponíveis saem diretamente das janelas livres.
+
+Todos os horários são tratados como minutos a partir da meia-noite do dia
+consultado, no fuso horário corrente.
+"""
+import logging
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .models import Appointment, TimeBlock
+from .recurrence import virtual_busy_rows
+
+SLOT_INTERVAL_MINUTES = 15
+DAY_START_MINUTES = 8 * 60
+DAY_END_MINUTES = 20 * 60
+ACTIVE_STATUSES = Appointment.ACTIVE_STATUSES
+# Duração máxima assumida para um agendamento. Serve de limite inferior nas
+# buscas de conflito, para que o índice (employee, appointment_time) seja
+# percorrido como faixa em vez de ler todo o histórico do funcionário.
+MAX_BOOKING_SPAN = timedelta(days=1)
+
+logger = logging.getLogger(__name__)
+
+
+def format_minutes(minutes):
+    """Converte minutos desde a meia-noite em 'HH:MM'."""
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def service_total_minutes(service):
+    """Duração do serviço somada ao tempo de preparação, em minutos."""
+    return (service.duration_minutes or 60) + service.buffer_time_minutes
+
+
+def day_bounds(day):
+    """Retorna o início (inclusivo) e o fim (exclusivo) do dia, já com fuso."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def merge_intervals(intervals):
+    """Ordena e funde intervalos (início, fim) sobrepostos ou encostados."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_intervals(windows, busy):
+    """
+    Remove os intervalos ocupados das janelas de trabalho.
+    `windows` e `busy` precisam estar ordenados e sem sobreposição.
+    """
+    free = []
+    i = 0
+    for window_start, window_end in windows:
+        cursor = window_start
+        # Pula os intervalos que terminam antes desta janela.
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            busy_start, busy_end = busy[j]
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if cursor >= window_end:
+                break
+            j += 1
+        if cursor < window_end:
+            free.append((cursor, window_end))
+    return free
+
+
+def to_day_minutes(value, midnight, round_up=False):
+    """Minutos entre a meia-noite do dia consultado e `value`."""
+    minutes = (value - midnight).total_seconds() / 60
+    return math.ceil(minutes) if round_up else math.floor(minutes)
+
+
+def load_busy_rows(employee_ids, start_day, end_day=None):
+    """
+    Carrega, com uma consulta por modelo, os intervalos ocupados entre
+    `start_day` e `end_day` (inclusive) como tuplas (employee_id, início, fim),
+    incluindo as ocorrências virtuais das séries por regra.
+    """
+    # Faixas [início, fim) em vez de `__date`, para que os índices
+    # (employee, appointment_time) e (employee, start_time) sejam usados.
+    range_start, _ = day_bounds(start_day)
+    _, range_end = day_bounds(end_day or start_day)
+    rows = list(
+        Appointment.objects.filter(
+            employee_id__in=employee_ids, status__in=ACTIVE_STATUSES,
+            appointment_time__gte=range_start, appointment_time__lt=range_end,
+        ).values_list('employee_id', 'appointment_time', 'end_time')
+    )
+    rows.extend(
+        TimeBlock.objects.filter(
+            employee_id__in=employee_ids, start_time__gte=range_start, start_time__lt=range_end,
+        ).values_list('employee_id', 'start_time', 'end_time')
+    )
+    rows.extend(virtual_busy_rows(employee_ids, range_start, range_end))
+    return rows
+
+
+def split_rows_by_day(busy_rows):
+    """Separa as linhas ocupadas pelo dia (no fuso corrente) em que começam."""
+    by_day = {}
+    for row in busy_rows:
+        by_day.setdefault(timezone.localdate(row[1]), []).append(row)
+    return by_day
+
+
+class BusyIndex:
+    """
+    Intervalos ocupados de um funcionário, ordenados pelo início, para
+    verificar conflitos em memória (mesma regra da consulta de conflito).
+    """
+
+    def __init__(self, intervals):
+        self._intervals = sorted((start, end) for start, end in intervals if start and end)
+        self._starts = [start for start, _ in self._intervals]
+
+    def overlaps(self, start, end):
+        low = bisect_right(self._starts, start - MAX_BOOKING_SPAN)
+        high = bisect_left(self._starts, end)
+        return any(busy_end > start for _, busy_end in self._intervals[low:high])
+
+    def add(self, start, end):
+        position = bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._intervals.insert(position, (start, end))
+
+
+def busy_by_employee(busy_rows, day):
+    """Agrupa as linhas ocupadas por funcionário, em minutos do dia."""
+    midnight, _ = day_bounds(day)
+    grouped = {}
+    for employee_id, start, end in busy_rows:
+        if start is None or end is None:
+            continue
+        grouped.setdefault(employee_id, []).append(
+            (to_day_minutes(start, midnight), to_day_minutes(end, midnight, round_up=True))
+        )
+    return grouped
+
+
+def free_windows(windows, busy):
+    """Janelas livres de um funcionário: turnos menos os intervalos ocupados."""
+    if not windows:
+        return []
+    return subtract_intervals(windows, merge_intervals(busy))
+
+
+def window_slots(window, duration, step=SLOT_INTERVAL_MINUTES,
+                 day_start=DAY_START_MINUTES, day_end=DAY_END_MINUTES):
+    """Inícios de slot (na grade de `step`) que cabem inteiros na janela."""
+    window_start, window_end = window
+    last_end = min(window_end, day_end)
+    first = max(window_start, day_start)
+    slot = day_start + math.ceil((first - day_start) / step) * step
+    while slot + duration <= last_end:
+        yield slot
+        slot += step
+
+
+def performer_windows(performer, day):
+    """
+    Turnos de trabalho do funcionário no dia, a partir do horário compilado.
+    Um `work_schedule` malformado é tratado como dia sem expediente.
+    """
+    try:
+        return performer.compiled_schedule.windows(day)
+    except ValidationError:
+        logger.warning('work_schedule inválido para o funcionário %s', performer.pk)
+        return ()
+
+
+def performer_slots(day, duration, performers, busy_rows):
+    """
+    Mapa {minuto_do_slot: [ids dos funcionários livres]} para o dia,
+    com os slots em ordem crescente.
+    """
+    busy = busy_by_employee(busy_rows, day)
+    slots = {}
+    for performer in performers:
+        windows = free_windows(performer_windows(performer, day), busy.get(performer.pk, []))
+        for window in windows:
+            for slot in window_slots(window, duration):
+                slots.setdefault(slot, []).append(performer.pk)
+    return {slot: sorted(slots[slot]) for slot in sorted(slots)}
+
+
+def available_slots(day, duration, performers, busy_rows):
+    """
+    Lista de horários 'HH:MM' em que pelo menos um dos `performers`
+    consegue atender um serviço de `duration` minutos.
+    """
+    return [format_minutes(slot) for slot in performer_slots(day, duration, performers, busy_rows)]
+
+
+def performer_slots_by_day(days, duration, performers, busy_rows):
+    """Aplica `performer_slots` a cada dia de `days`, separando as linhas por dia."""
+    rows_by_day = split_rows_by_day(busy_rows)
+    return {day: performer_slots(day, duration, performers, rows_by_day.get(day, [])) for day in days}
+
+
+def format_slots(slots, by_performer=False):
+    """
+    Converte o mapa de `performer_slots` na resposta da API: lista de 'HH:MM'
+    ou, com `by_performer`, lista de {'time': 'HH:MM', 'performers': [ids]}.
+    """
+    if by_performer:
+        return [{'time': format_minutes(slot), 'performers': ids} for slot, ids in slots.items()]
+    return [format_minutes(slot) for slot in slots]
+
+
+def booked_minutes(busy_rows):
+    """Total de minutos ocupados por funcionário, usado como medida de carga."""
+    load = {}
+    for employee_id, start, end in busy_rows:
+        if start is None or end is None:
+            continue
+        load[employee_id] = load.get(employee_id, 0) + (end - start).total_seconds() / 60
+    return load
+
+
+def pick_performer(start, duration, performers, busy_rows):
+    """
+    Escolhe, entre os funcionários livres para [start, start + duration],
+    o menos carregado no dia (empate: menor id). Retorna None se ninguém couber.
+    """
+    day = timezone.localdate(start)
+    midnight, _ = day_bounds(day)
+    start_minute = to_day_minutes(start, midnight)
+    end_minute = to_day_minutes(start + timedelta(minutes=duration), midnight, round_up=True)
+    busy = busy_by_employee(busy_rows, day)
+    load = booked_minutes(busy_rows)
+
+    candidates = []
+    for performer in performers:
+        windows = free_windows(performer_windows(performer, day), busy.get(performer.pk, []))
+        if any(window_start <= start_minute and end_minute <= window_end for window_start, window_end in windows):
+            candidates.append(performer)
+    if not candidates:
+        return None
+    return min(candidates, key=lambda performer: (load.get(performer.pk, 0), performer.pk))
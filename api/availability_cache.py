@@ -0,0 +1,154 @@
+# api/availability_cache.py
+"""
+Cache dos resultados de disponibilidade por (pet shop, serviço, dia).
+
+Cada entrada guarda o mapa {minuto_do_slot: [ids dos funcionários livres]}
+do dia junto com as "versões" do serviço e do (serviço, dia) lidas antes do
+cálculo:
+
+- mudanças que afetam o serviço inteiro (o próprio Service, a lista de
+  `performers` ou o `work_schedule` de um funcionário) trocam a versão do
+  serviço, invalidando todos os dias de uma vez;
+- mudanças pontuais (Appointment, TimeBlock) trocam só a versão dos dias
+  dos serviços do funcionário afetado.
+
+Como as versões são lidas antes das reservas, um cálculo que já estava em
+andamento durante a invalidação grava a entrada com a versão antiga, e ela
+é ignorada na leitura seguinte (apagar a chave não bastaria). As versões
+trocam na hora e de novo no COMMIT da transação que fez a mudança: uma
+leitura feita entre as duas ainda não via as linhas novas.
+
+A invalidação é disparada pelos sinais em api/signals.py.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Service
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _timeout():
+    return getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 3600)
+
+
+def _version_key(service_id):
+    return f'availability:version:{service_id}'
+
+
+def _day_key(petshop_id, service_id, day):
+    return f'availability:{petshop_id}:{service_id}:{day.isoformat()}'
+
+
+def _day_version_key(service_id, day):
+    return f'availability:version:{service_id}:{day.isoformat()}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stats():
+    """Contadores de acertos/falhas do processo atual."""
+    with _stats_lock:
+        data = dict(_stats)
+    lookups = data['hits'] + data['misses']
+    data['hit_rate'] = round(data['hits'] / lookups, 4) if lookups else None
+    return data
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def get_day_slots(service, days, compute):
+    """
+    Retorna {dia: mapa_de_slots} para `days`, calculando com
+    `compute(dias_faltantes)` apenas os dias ausentes ou desatualizados.
+    """
+    version_key = _version_key(service.pk)
+    keys = {_day_key(service.pet_shop_id, service.pk, day): day for day in days}
+    day_version_keys = {day: _day_version_key(service.pk, day) for day in days}
+    cached = cache.get_many([version_key, *day_version_keys.values(), *keys])
+
+    version = cached.get(version_key)
+    if version is None:
+        version = _new_version()
+        cache.set(version_key, version, None)
+    day_versions = {day: cached.get(key) for day, key in day_version_keys.items()}
+    unversioned = {day_version_keys[day]: _new_version() for day, value in day_versions.items() if value is None}
+    if unversioned:
+        # add(): não sobrescreve uma invalidação concorrente
+        for key, value in unversioned.items():
+            cache.add(key, value, _timeout())
+        current = cache.get_many(list(unversioned))
+        for day, key in day_version_keys.items():
+            if key in unversioned:
+                day_versions[day] = current.get(key)
+
+    result, missing = {}, []
+    for key, day in keys.items():
+        entry = cached.get(key)
+        if entry is not None and entry[:2] == (version, day_versions[day]):
+            result[day] = entry[2]
+        else:
+            missing.append(day)
+    _count('hits', len(result))
+    _count('misses', len(missing))
+
+    if missing:
+        computed = compute(missing)
+        cache.set_many(
+            {_day_key(service.pet_shop_id, service.pk, day): (version, day_versions[day], computed[day])
+             for day in missing if day_versions[day] is not None},
+            _timeout()
+        )
+        result.update(computed)
+    return result
+
+
+def _bump(keys, timeout):
+    """Troca a versão das chaves agora e outra vez no COMMIT da transação corrente."""
+    def bump():
+        version = _new_version()
+        cache.set_many({key: version for key in keys}, timeout)
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_services(service_ids):
+    """Descarta todas as entradas dos serviços informados."""
+    service_ids = list(service_ids)
+    if not service_ids:
+        return
+    _bump([_version_key(service_id) for service_id in service_ids], None)
+    _count('invalidations', len(service_ids))
+
+
+def invalidate_employee_services(employee_id):
+    """Descarta todas as entradas dos serviços que o funcionário executa."""
+    invalidate_services(Service.objects.filter(performers=employee_id).values_list('id', flat=True))
+
+
+def invalidate_employee_days(employee_id, days):
+    """Troca a versão dos dias informados nos serviços do funcionário."""
+    days = set(days)
+    if employee_id is None or not days:
+        return
+    service_ids = Service.objects.filter(performers=employee_id).values_list('id', flat=True)
+    keys = [_day_version_key(service_id, day) for service_id in service_ids for day in days]
+    if keys:
+        _bump(keys, _timeout())
+        _count('invalidations', len(keys))
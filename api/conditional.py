@@ -0,0 +1,68 @@
+# api/conditional.py
+"""
+Requisições condicionais (ETag / Last-Modified) para catálogos que mudam
+pouco, como pet shops e serviços.
+
+Os validadores saem de uma agregação barata (maior `updated_at` e
+quantidade de linhas da consulta), sem serializar o corpo; se o cliente já
+tem a versão atual, a view responde 304 sem montar a resposta.
+
+As listagens só usam ETag: excluir uma linha não muda o maior
+`updated_at`, então um Last-Modified aceitaria uma lista desatualizada;
+a contagem no ETag é que percebe exclusões.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _etag(request, *parts):
+    # A query string entra no ETag: filtros, página e ?fields= mudam o corpo.
+    raw = '|'.join(str(part) for part in (*parts, request.get_full_path()))
+    return '"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    `list` (só ETag) e `retrieve` (ETag e Last-Modified) com validadores calculados por
+    `get_list_validators()` / `get_object_validators()` a partir de
+    `updated_at`. As permissões já foram verificadas quando os métodos rodam.
+    """
+    conditional_field = 'updated_at'
+
+    def get_list_validators(self):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        totals = queryset.aggregate(last_modified=Max(self.conditional_field), count=Count('pk'))
+        return totals['last_modified'], totals['count']
+
+    def get_object_validators(self):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        last_modified = self.get_queryset().order_by().filter(**{self.lookup_field: lookup}).values_list(
+            self.conditional_field, flat=True
+        ).first()
+        return last_modified, 1 if last_modified else 0
+
+    def _conditional(self, request, validators, handler, *args, use_last_modified=True, **kwargs):
+        last_modified, count = validators
+        etag = _etag(request, count, last_modified.isoformat() if last_modified else '')
+        timestamp = int(last_modified.timestamp()) if last_modified and use_last_modified else None
+        not_modified = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(
+            request, self.get_list_validators(), super().list, *args, use_last_modified=False, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, self.get_object_validators(), super().retrieve, *args, **kwargs)
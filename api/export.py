@@ -0,0 +1,97 @@
+# api/export.py
+"""
+Exportação do histórico de agendamentos em CSV ou NDJSON (uma linha JSON
+por agendamento), para a contabilidade dos pet shops.
+
+As linhas saem de `values_list(...).iterator(chunk_size=...)` (sem
+instanciar models nem serializers) e são gravadas à medida que o cliente
+lê a resposta (StreamingHttpResponse): a memória usada não depende do
+número de agendamentos exportados.
+"""
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+# Linhas agrupadas em cada pedaço enviado ao cliente.
+ROWS_PER_WRITE = 500
+
+# (coluna no arquivo, campo consultado)
+COLUMNS = (
+    ('id', 'id'),
+    ('appointment_time', 'appointment_time'),
+    ('end_time', 'end_time'),
+    ('status', 'status'),
+    ('total_price', 'total_price'),
+    ('pet_shop_id', 'pet_shop_id'),
+    ('pet_shop', 'pet_shop__name'),
+    ('service_id', 'service_id'),
+    ('service', 'service__name'),
+    ('employee_id', 'employee_id'),
+    ('employee', 'employee__username'),
+    ('pet_id', 'pet_id'),
+    ('pet', 'pet__name'),
+    ('tutor_id', 'tutor_id'),
+    ('client_name', 'client_name'),
+)
+HEADER = [name for name, _ in COLUMNS]
+
+# Formato (?output=) -> Content-Type
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_rows(queryset, chunk_size=None):
+    """Tuplas na ordem de COLUMNS, em ordem cronológica, lidas em blocos."""
+    return queryset.order_by('appointment_time', 'id').values_list(
+        *(field for _, field in COLUMNS)
+    ).iterator(chunk_size=chunk_size or EXPORT_CHUNK_SIZE)
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class _Echo:
+    """Arquivo falso para o csv.writer: `write` devolve a linha em vez de guardá-la."""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(['' if value is None else _value(value) for value in row])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADER, map(_value, row))), ensure_ascii=False) + '\n'
+
+
+def stream(rows, output):
+    """Pedaços de texto do arquivo no formato `output` ('csv' ou 'ndjson')."""
+    lines = csv_lines(rows) if output == 'csv' else ndjson_lines(rows)
+    return _batched(lines)
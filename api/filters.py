@@ -0,0 +1,84 @@
+# api/filters.py
+"""
+Filtros por query string das listagens de agendamentos e bloqueios.
+
+Os filtros de período viram faixas sobre a coluna de horário (nunca
+`__date`), para que os índices compostos (funcionário, horário),
+(pet shop, horário) e (tutor, horário) sejam percorridos como faixa.
+Parâmetros inválidos levantam ParseError (HTTP 400).
+"""
+from datetime import datetime
+
+from rest_framework.exceptions import ParseError
+
+from .availability import day_bounds
+from .models import Appointment
+
+
+def _day(params, name):
+    try:
+        return datetime.strptime(params[name], '%Y-%m-%d').date()
+    except ValueError:
+        raise ParseError(f'{name} deve estar no formato AAAA-MM-DD.')
+
+
+def _ids(params, name):
+    try:
+        return [int(value) for value in params[name].split(',') if value.strip()]
+    except ValueError:
+        raise ParseError(f'{name} deve ser um ID ou uma lista de IDs separados por vírgula.')
+
+
+def _in(queryset, field, values):
+    # Um único valor vira igualdade: é o formato que os planos dos índices esperam.
+    if len(values) == 1:
+        return queryset.filter(**{field: values[0]})
+    return queryset.filter(**{f'{field}__in': values})
+
+
+def _period(queryset, params, field):
+    if params.get('start_date'):
+        start, _ = day_bounds(_day(params, 'start_date'))
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if params.get('end_date'):
+        _, end = day_bounds(_day(params, 'end_date'))
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
+
+
+def _ordering(params, field):
+    ordering = params.get('ordering')
+    if ordering and ordering not in (field, f'-{field}'):
+        raise ParseError(f'ordering deve ser "{field}" ou "-{field}".')
+
+
+def filter_appointments(queryset, params):
+    """
+    `start_date`/`end_date` (dias, inclusive), `status` e os IDs de
+    `employee`, `service`, `pet`, `pet_shop` e `recurrence_parent` (aceitam
+    listas separadas por vírgula). A ordenação (`ordering`) fica a cargo da
+    paginação por cursor.
+    """
+    _ordering(params, 'appointment_time')
+    queryset = _period(queryset, params, 'appointment_time')
+    if params.get('status'):
+        statuses = [value.strip().upper() for value in params['status'].split(',') if value.strip()]
+        valid = {choice for choice, _ in Appointment.STATUS_CHOICES}
+        if not set(statuses) <= valid:
+            raise ParseError(f'status deve estar entre: {", ".join(sorted(valid))}.')
+        queryset = _in(queryset, 'status', statuses)
+    for param, field in (('employee', 'employee_id'), ('service', 'service_id'), ('pet', 'pet_id'),
+                         ('pet_shop', 'pet_shop_id'), ('recurrence_parent', 'recurrence_parent_id')):
+        if params.get(param):
+            queryset = _in(queryset, field, _ids(params, param))
+    return queryset
+
+
+def filter_time_blocks(queryset, params):
+    """`start_date`/`end_date` (pelo início do bloqueio), `employee` e `pet_shop`."""
+    _ordering(params, 'start_time')
+    queryset = _period(queryset, params, 'start_time')
+    for param, field in (('employee', 'employee_id'), ('pet_shop', 'pet_shop_id')):
+        if params.get(param):
+            queryset = _in(queryset, field, _ids(params, param))
+    return queryset
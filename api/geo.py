@@ -0,0 +1,82 @@
+# api/geo.py
+"""
+Busca de pet shops próximos sem PostGIS.
+
+Um retângulo (bounding box) em torno do ponto filtra os candidatos pelo
+índice composto (latitude, longitude) de PetShop; só as coordenadas desses
+candidatos são lidas, e a distância exata (haversine) é calculada em Python
+para o corte pelo raio e a ordenação.
+"""
+import math
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+_COORD_QUANTUM = Decimal('0.000001')  # casas decimais de PetShop.latitude/longitude
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distância em km entre dois pontos (graus) sobre a esfera terrestre."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _down(value):
+    return Decimal(repr(value)).quantize(_COORD_QUANTUM, rounding=ROUND_FLOOR)
+
+
+def _up(value):
+    return Decimal(repr(value)).quantize(_COORD_QUANTUM, rounding=ROUND_CEILING)
+
+
+def bounding_box_filter(lat, lng, radius_km):
+    """
+    Q com o retângulo que contém o círculo de `radius_km` em torno do ponto.
+    Perto dos polos cobre todas as longitudes; ao cruzar o antimeridiano
+    vira duas faixas de longitude.
+    """
+    lat_delta = radius_km / _KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, lat - lat_delta), min(90.0, lat + lat_delta)
+    box = Q(latitude__gte=_down(min_lat), latitude__lte=_up(max_lat))
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return box & Q(longitude__isnull=False)
+
+    # A largura em longitude é máxima na latitude do retângulo mais distante do equador.
+    widest = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    lng_delta = radius_km / (_KM_PER_DEGREE * widest)
+    if lng_delta >= 180:
+        return box & Q(longitude__isnull=False)
+    min_lng, max_lng = lng - lng_delta, lng + lng_delta
+    if min_lng < -180:
+        lngs = Q(longitude__gte=_down(min_lng + 360)) | Q(longitude__lte=_up(max_lng))
+    elif max_lng > 180:
+        lngs = Q(longitude__gte=_down(min_lng)) | Q(longitude__lte=_up(max_lng - 360))
+    else:
+        lngs = Q(longitude__gte=_down(min_lng), longitude__lte=_up(max_lng))
+    return box & lngs
+
+
+def nearby(queryset, lat, lng, radius_km, limit):
+    """
+    Até `limit` objetos de `queryset` a no máximo `radius_km` do ponto, do
+    mais próximo ao mais distante, cada um com o atributo `distance_km`.
+    Usa duas consultas: coordenadas dos candidatos e linhas dos escolhidos.
+    """
+    ranked = []
+    rows = queryset.filter(bounding_box_filter(lat, lng, radius_km)).values_list('pk', 'latitude', 'longitude')
+    for pk, row_lat, row_lng in rows:
+        distance = haversine_km(lat, lng, row_lat, row_lng)
+        if distance <= radius_km:
+            ranked.append((distance, pk))
+    ranked.sort()
+    ranked = ranked[:limit]
+    objects = queryset.in_bulk([pk for _, pk in ranked])
+    result = []
+    for distance, pk in ranked:
+        obj = objects[pk]
+        obj.distance_km = round(distance, 3)
+        result.append(obj)
+    return result
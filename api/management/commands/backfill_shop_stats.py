@@ -0,0 +1,45 @@
+# api/management/commands/backfill_shop_stats.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import rollups
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Data inválida: {value} (use AAAA-MM-DD).')
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula o resumo diário dos pet shops (DailyShopStats) a partir do histórico de '
+        'agendamentos e avaliações, em blocos de dias (memória limitada ao bloco). Use na '
+        'implantação e após cargas em massa.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('petshop_ids', nargs='*', type=int, help='Pet shops a recalcular (padrão: todos).')
+        parser.add_argument('--start', type=_date, help='Primeiro dia (padrão: o mais antigo com movimento).')
+        parser.add_argument('--end', type=_date, help='Último dia (padrão: o mais recente com movimento).')
+        parser.add_argument('--chunk-days', type=int, default=rollups.CHUNK_DAYS, help='Dias por bloco/transação.')
+
+    def handle(self, *args, petshop_ids=None, start=None, end=None, chunk_days=None, **options):
+        if chunk_days < 1:
+            raise CommandError('--chunk-days deve ser positivo.')
+        bounds = rollups.source_bounds() if start is None or end is None else (start, end)
+        if bounds is None:
+            self.stdout.write('Nenhum agendamento ou avaliação para resumir.')
+            return
+        start, end = start or bounds[0], end or bounds[1]
+        if end < start:
+            raise CommandError('--end deve ser igual ou posterior a --start.')
+        total = 0
+        for chunk_start, chunk_end, rows in rollups.rollup_range(start, end, petshop_ids or None, chunk_days):
+            total += rows
+            self.stdout.write(f'{chunk_start.isoformat()} a {chunk_end.isoformat()}: {rows} resumo(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumo diário recalculado de {start.isoformat()} a {end.isoformat()}: {total} registro(s).'
+        ))
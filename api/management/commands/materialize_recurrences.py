@@ -0,0 +1,45 @@
+# api/management/commands/materialize_recurrences.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import availability_cache
+from api.models import User
+from api.recurrence import horizon_date, materialize_series, rule_parents
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava as ocorrências das séries recorrentes por regra até o horizonte móvel '
+        '(RECURRENCE_HORIZON_WEEKS). Agende para rodar diariamente.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=None, help='Horizonte em semanas (padrão: RECURRENCE_HORIZON_WEEKS).')
+
+    def handle(self, *args, weeks=None, **options):
+        horizon = horizon_date(weeks=weeks)
+        pending = rule_parents().filter(recurrence_materialized_until__lt=horizon).values_list('pk', 'employee_id')
+        total_created = total_skipped = 0
+        for parent_id, employee_id in pending.iterator(chunk_size=200):
+            with transaction.atomic():
+                # Mesma trava usada na criação de agendamentos
+                User.objects.select_for_update().filter(pk=employee_id).values_list('pk', flat=True).first()
+                # Relido com trava: a série pode ter sido encerrada (end_series) desde a listagem
+                parent = rule_parents().filter(
+                    pk=parent_id, recurrence_materialized_until__lt=horizon
+                ).select_for_update(of=('self',)).select_related('tutor', 'pet', 'pet_shop', 'service', 'employee').first()
+                if parent is None:
+                    continue
+                created, skipped = materialize_series(parent, horizon)
+            if skipped:
+                # Ocorrências virtuais descartadas liberam horários
+                availability_cache.invalidate_employee_days(parent.employee_id, skipped)
+                self.stderr.write(
+                    f'Série {parent.pk}: {len(skipped)} ocorrência(s) com conflito não gravada(s): '
+                    + ', '.join(day.isoformat() for day in skipped)
+                )
+            total_created += len(created)
+            total_skipped += len(skipped)
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_created} agendamentos gravados até {horizon.isoformat()} ({total_skipped} com conflito).'
+        ))
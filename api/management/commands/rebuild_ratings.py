@@ -0,0 +1,21 @@
+# api/management/commands/rebuild_ratings.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import ratings
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula a partir das avaliações os agregados de nota dos pet shops '
+        '(rating_avg, rating_count e histograma). Use após cargas em massa ou '
+        'alterações feitas sem passar pelos sinais.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('petshop_ids', nargs='*', type=int, help='Pet shops a recalcular (padrão: todos).')
+
+    def handle(self, *args, petshop_ids=None, **options):
+        with transaction.atomic():
+            total = ratings.rebuild(petshop_ids or None)
+        self.stdout.write(self.style.SUCCESS(f'Agregados de avaliação recalculados; {total} pet shop(s) corrigido(s).'))
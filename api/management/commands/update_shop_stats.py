@@ -0,0 +1,28 @@
+# api/management/commands/update_shop_stats.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula o resumo diário dos pet shops (DailyShopStats) de hoje e dos últimos dias, '
+        'corrigindo alterações que não passaram pelos sinais (update() em massa, cargas diretas '
+        'no banco). Agende para rodar diariamente.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Dias anteriores a hoje a recalcular (padrão: 7).')
+
+    def handle(self, *args, days=None, **options):
+        if days < 0:
+            raise CommandError('--days não pode ser negativo.')
+        today = timezone.localdate()
+        start = today - timedelta(days=days)
+        total = sum(rows for _, _, rows in rollups.rollup_range(start, today))
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumo diário atualizado de {start.isoformat()} a {today.isoformat()}: {total} registro(s).'
+        ))
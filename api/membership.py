@@ -0,0 +1,100 @@
+# api/membership.py
+"""
+Vínculos do usuário com pet shops (dono, gerente, funcionário).
+
+Os IDs dos pet shops que o usuário possui ficam no cache por usuário e são
+memorizados na requisição, de modo que permissões e `get_queryset` de uma
+mesma requisição compartilham uma única leitura.
+O pet shop onde ele trabalha vem de `user.works_at_id`, sem consulta.
+
+A invalidação é disparada pelos sinais de PetShop em api/signals.py.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import PetShop
+
+STAFF_ROLES = ('GERENTE', 'FUNCIONARIO')
+
+
+def _timeout():
+    return getattr(settings, 'MEMBERSHIP_CACHE_TIMEOUT', 300)
+
+
+def _owned_key(user_id):
+    return f'membership:owned:{user_id}'
+
+
+class Membership:
+    """Papéis de um usuário autenticado em relação aos pet shops."""
+
+    def __init__(self, user):
+        self.user = user
+        self._owned_petshop_ids = None
+
+    @property
+    def owned_petshop_ids(self):
+        """IDs dos pet shops que o usuário possui (lidos só quando necessários)."""
+        if self._owned_petshop_ids is None:
+            owned = ()
+            if self.user.is_authenticated:
+                owned = cache.get(_owned_key(self.user.pk))
+                if owned is None:
+                    owned = tuple(PetShop.objects.filter(owner_id=self.user.pk).values_list('id', flat=True))
+                    cache.set(_owned_key(self.user.pk), owned, _timeout())
+            self._owned_petshop_ids = frozenset(owned)
+        return self._owned_petshop_ids
+
+    @property
+    def role(self):
+        return getattr(self.user, 'user_type', None)
+
+    @property
+    def works_at_id(self):
+        return self.user.works_at_id if self.role in STAFF_ROLES else None
+
+    def owns(self, petshop_id):
+        return _as_id(petshop_id) in self.owned_petshop_ids
+
+    def manages(self, petshop_id):
+        """Dono do pet shop ou gerente que trabalha nele."""
+        petshop_id = _as_id(petshop_id)
+        if self.role == 'GERENTE' and petshop_id is not None and self.works_at_id == petshop_id:
+            return True
+        return self.owns(petshop_id)
+
+    def is_team_member(self, petshop_id):
+        """Dono, gerente ou funcionário do pet shop."""
+        petshop_id = _as_id(petshop_id)
+        if petshop_id is not None and self.works_at_id == petshop_id:
+            return True
+        return self.owns(petshop_id)
+
+    def staff_petshop_ids(self):
+        """Pet shops cujos agendamentos e bloqueios o usuário enxerga como equipe."""
+        if self.role == 'PROPRIETARIO':
+            return self.owned_petshop_ids
+        return frozenset([self.works_at_id]) if self.works_at_id else frozenset()
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_membership(request):
+    """Vínculos de `request.user`, carregados uma vez por requisição."""
+    membership = getattr(request, '_membership', None)
+    if membership is not None and membership.user is request.user:
+        return membership
+    request._membership = membership = Membership(request.user)
+    return membership
+
+
+def invalidate_owner(*user_ids):
+    """Descarta os pet shops em cache dos donos informados."""
+    keys = [_owned_key(user_id) for user_id in user_ids if user_id]
+    if keys:
+        cache.delete_many(keys)
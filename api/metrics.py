@@ -0,0 +1,83 @@
+# api/metrics.py
+"""
+Métricas em memória por endpoint: tempo total, tempo de banco e número de
+consultas de cada requisição, agregados por view + ação (por exemplo
+`AppointmentViewSet.create_recurrence`) com histogramas de faixas fixas.
+
+Alimentado por api.middleware.RequestMetricsMiddleware; exposto em
+/api/metrics/. Os valores são do processo atual (cada worker tem os seus).
+"""
+import threading
+from bisect import bisect_left
+
+# Limites superiores (inclusive) das faixas; a última faixa é "+Inf".
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+_endpoints = {}
+
+
+def _bucket_labels(bounds):
+    return [str(bound) for bound in bounds] + ['+Inf']
+
+
+def _new_entry():
+    return {
+        'count': 0,
+        'errors': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'db_ms': 0.0,
+        'queries': 0,
+        'max_queries': 0,
+        'latency_histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        'query_histogram': [0] * (len(QUERY_BUCKETS) + 1),
+    }
+
+
+def record(endpoint, total_ms, db_ms, queries, status_code):
+    """Soma uma requisição às métricas de `endpoint`."""
+    with _lock:
+        entry = _endpoints.get(endpoint)
+        if entry is None:
+            entry = _endpoints[endpoint] = _new_entry()
+        entry['count'] += 1
+        entry['errors'] += status_code >= 500
+        entry['total_ms'] += total_ms
+        entry['max_ms'] = max(entry['max_ms'], total_ms)
+        entry['db_ms'] += db_ms
+        entry['queries'] += queries
+        entry['max_queries'] = max(entry['max_queries'], queries)
+        entry['latency_histogram'][bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+        entry['query_histogram'][bisect_left(QUERY_BUCKETS, queries)] += 1
+
+
+def snapshot():
+    """Cópia das métricas com médias e histogramas rotulados, por endpoint."""
+    with _lock:
+        entries = {endpoint: dict(entry, latency_histogram=list(entry['latency_histogram']),
+                                  query_histogram=list(entry['query_histogram']))
+                   for endpoint, entry in _endpoints.items()}
+    latency_labels = _bucket_labels(LATENCY_BUCKETS_MS)
+    query_labels = _bucket_labels(QUERY_BUCKETS)
+    result = {}
+    for endpoint, entry in sorted(entries.items()):
+        count = entry['count']
+        result[endpoint] = {
+            'count': count,
+            'errors': entry['errors'],
+            'avg_ms': round(entry['total_ms'] / count, 3),
+            'max_ms': round(entry['max_ms'], 3),
+            'avg_db_ms': round(entry['db_ms'] / count, 3),
+            'avg_queries': round(entry['queries'] / count, 2),
+            'max_queries': entry['max_queries'],
+            'latency_ms': dict(zip(latency_labels, entry['latency_histogram'])),
+            'queries_per_request': dict(zip(query_labels, entry['query_histogram'])),
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
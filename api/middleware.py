@@ -0,0 +1,110 @@
+# api/middleware.py
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+slow_query_logger = logging.getLogger('api.slow_queries')
+
+
+def view_label(view_func, method):
+    """
+    Nome do endpoint para as métricas: `ViewSet.ação` nas viewsets do DRF
+    (por exemplo `AppointmentViewSet.confirm`), senão o nome da view.
+    """
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower()) or method.lower()
+    return f'{view_class.__name__}.{action}'
+
+
+class _QueryTimer:
+    """`execute_wrapper` que conta consultas e mede o tempo de banco da requisição."""
+
+    def __init__(self, request, slow_ms):
+        self.request = request
+        self.slow_ms = slow_ms
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+                slow_query_logger.warning(
+                    'Consulta lenta (%.1f ms) em %s %s [%s]: %s',
+                    elapsed * 1000, self.request.method, self.request.path,
+                    getattr(self.request, '_metrics_endpoint', '?'), sql[:2000],
+                )
+
+
+class RequestMetricsMiddleware:
+    """
+    Mede tempo total, tempo de banco e número de consultas de cada
+    requisição. Agrega por endpoint em api.metrics e devolve o cabeçalho
+    `Server-Timing` (app, db). Com SLOW_QUERY_THRESHOLD_MS > 0 registra em
+    `api.slow_queries` cada consulta acima do limite.
+
+    Respostas em streaming (StreamingHttpResponse) continuam medidas até o
+    corpo ser consumido: as consultas feitas durante a transmissão contam
+    para a requisição. Nelas não há `Server-Timing`, já que os cabeçalhos
+    saem antes de o total ser conhecido.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            return self.get_response(request)
+        timer = _QueryTimer(request, getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 0))
+        started = time.perf_counter()
+        stack = ExitStack()
+        try:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+        if response.streaming:
+            response.streaming_content = self._metered(
+                response.streaming_content, stack, request, response, timer, started
+            )
+            return response
+        stack.close()
+        total_ms, db_ms = self._record(request, response, timer, started)
+        response['Server-Timing'] = (
+            f'app;dur={total_ms:.1f}, db;dur={db_ms:.1f};desc="{timer.count} queries"'
+        )
+        return response
+
+    def _metered(self, content, stack, request, response, timer, started):
+        """Repassa o corpo em streaming e só fecha a medição quando ele termina."""
+        try:
+            yield from content
+        finally:
+            stack.close()
+            self._record(request, response, timer, started)
+
+    def _record(self, request, response, timer, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = timer.seconds * 1000
+        endpoint = getattr(request, '_metrics_endpoint', None)
+        if endpoint:
+            metrics.record(endpoint, total_ms, db_ms, timer.count, response.status_code)
+        return total_ms, db_ms
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_endpoint = view_label(view_func, request.method)
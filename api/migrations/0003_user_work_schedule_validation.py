@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:58
+
+import api.schedules
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_appointment_frequency_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='work_schedule',
+            field=models.JSONField(blank=True, help_text='\n        Ex: \n        {\n            "monday": {"start": "08:00", "break_start": "12:00", "break_end": "13:00", "end": "17:00"},\n            "tuesday": {"start": "09:00", "end": "18:00", "breaks": [{"start": "12:30", "end": "13:30"}]},\n            "saturday": {"start": "08:00", "end": "12:00"}\n        }\n        ', null=True, validators=[api.schedules.validate_work_schedule]),
+        ),
+    ]
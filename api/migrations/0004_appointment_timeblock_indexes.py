@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_user_work_schedule_validation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['employee', 'appointment_time', 'end_time'], name='appt_employee_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['pet_shop', 'appointment_time'], name='appt_shop_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['tutor', 'appointment_time'], name='appt_tutor_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeblock',
+            index=models.Index(fields=['employee', 'start_time'], name='timeblock_employee_start_idx'),
+        ),
+    ]
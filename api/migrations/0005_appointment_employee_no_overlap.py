@@ -0,0 +1,37 @@
+# Restrição de exclusão contra reservas sobrepostas do mesmo funcionário.
+# Só o PostgreSQL tem EXCLUDE USING gist; nos demais bancos a proteção é a
+# trava da linha do funcionário feita em AppointmentViewSet.perform_create.
+
+from django.db import migrations
+
+OVERLAP_CONSTRAINT = 'appointment_employee_no_overlap'
+
+CREATE_SQL = f"""
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE api_appointment ADD CONSTRAINT {OVERLAP_CONSTRAINT}
+    EXCLUDE USING gist (employee_id WITH =, tstzrange(appointment_time, end_time, '[)') WITH &&)
+    WHERE (status IN ('CONFIRMED', 'PENDING') AND employee_id IS NOT NULL AND end_time IS NOT NULL);
+"""
+
+DROP_SQL = f"ALTER TABLE api_appointment DROP CONSTRAINT IF EXISTS {OVERLAP_CONSTRAINT};"
+
+
+def add_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SQL)
+
+
+def drop_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_appointment_timeblock_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_constraint, drop_constraint),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_appointment_employee_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='recurrence_materialized_until',
+            field=models.DateField(blank=True, help_text='Série por regra: ocorrências já gravadas até esta data; as posteriores são expandidas sob demanda', null=True),
+        ),
+    ]
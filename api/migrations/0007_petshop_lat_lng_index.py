@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_appointment_recurrence_materialized_until'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='petshop',
+            index=models.Index(fields=['latitude', 'longitude'], name='petshop_lat_lng_idx'),
+        ),
+    ]
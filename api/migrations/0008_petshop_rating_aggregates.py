@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:10
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Avg, Count, Q
+
+
+def backfill_ratings(apps, schema_editor):
+    """Preenche os agregados a partir das avaliações já existentes."""
+    PetShop = apps.get_model('api', 'PetShop')
+    Review = apps.get_model('api', 'Review')
+    rows = Review.objects.filter(rating__in=range(1, 6)).values('pet_shop').annotate(
+        count=Count('id'), avg=Avg('rating'),
+        **{f'rating_{value}': Count('id', filter=Q(rating=value)) for value in range(1, 6)},
+    )
+    for row in rows:
+        PetShop.objects.filter(pk=row.pop('pet_shop')).update(
+            rating_count=row.pop('count'), rating_avg=row.pop('avg'), **row
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_petshop_lat_lng_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='petshop',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='petshop',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='petshop',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='petshop',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='petshop',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='petshop',
+            name='rating_avg',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='petshop',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AddIndex(
+            model_name='petshop',
+            index=models.Index(fields=['rating_avg', 'rating_count'], name='petshop_rating_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_petshop_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeblock',
+            index=models.Index(fields=['pet_shop', 'start_time'], name='timeblock_shop_start_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_daily_shop_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('recurrence_materialized_until__isnull', False)), fields=['employee', 'appointment_time'], name='appt_rule_parent_idx'),
+        ),
+    ]
@@ -1,6 +1,11 @@
+import copy
+
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from .schedules import WorkSchedule, validate_work_schedule
+
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
       ("TUTOR", "Tutor"),
@@ -25,16 +30,31 @@ class User(AbstractUser):
     work_schedule = models.JSONField(
         blank=True, 
         null=True, 
+        validators=[validate_work_schedule],
         help_text="""
         Ex: 
         {
             "monday": {"start": "08:00", "break_start": "12:00", "break_end": "13:00", "end": "17:00"},
-            "tuesday": {"start": "09:00", "break_start": "12:30", "break_end": "13:30", "end": "18:00"}
+            "tuesday": {"start": "09:00", "end": "18:00", "breaks": [{"start": "12:30", "end": "13:30"}]},
+            "saturday": {"start": "08:00", "end": "12:00"}
         }
         """
     )
     # --- FIM DO NOVO CAMPO ---
 
+    @property
+    def compiled_schedule(self):
+        """
+        `work_schedule` compilado (api.schedules.WorkSchedule), memorizado
+        por instância e recompilado apenas se o JSON mudar.
+        Levanta ValidationError se o JSON salvo estiver malformado.
+        """
+        cached = self.__dict__.get('_compiled_schedule')
+        if cached is None or cached[0] != self.work_schedule:
+            cached = (copy.deepcopy(self.work_schedule), WorkSchedule.parse(self.work_schedule))
+            self.__dict__['_compiled_schedule'] = cached
+        return cached[1]
+
     def __str__(self):
         return self.username
 
@@ -54,9 +74,38 @@ class PetShop(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Agregados das avaliações, mantidos pelos sinais de Review (api/ratings.py)
+    rating_avg = models.FloatField(blank=True, null=True, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Pré-filtro por retângulo da busca de pet shops próximos (api/geo.py)
+            models.Index(fields=['latitude', 'longitude'], name='petshop_lat_lng_idx'),
+            # Ordenação/filtro da listagem por nota
+            models.Index(fields=['rating_avg', 'rating_count'], name='petshop_rating_idx'),
+        ]
+
+    RATING_FIELDS = ('rating_avg', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Os agregados de nota só mudam por UPDATE atômico (api/ratings.py); um
+        # save() de uma instância carregada antes não pode sobrescrevê-los.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 #
 # Tabela 3: Pets
 #
@@ -98,6 +147,9 @@ class Service(models.Model):
         related_name='performable_services',
         blank=True
     )
+    # Também avançado quando a lista de performers muda (api/signals.py),
+    # para os validadores de cache HTTP do catálogo.
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.pet_shop.name}"
@@ -105,6 +157,11 @@ class Service(models.Model):
 #
 # Tabela 5: Appointments (Agendamentos)
 #
+
+# Nome da restrição de exclusão que impede reservas sobrepostas do mesmo
+# funcionário. Só existe no PostgreSQL (ver migração 0005).
+OVERLAP_CONSTRAINT = 'appointment_employee_no_overlap'
+
 # Em api/models.py
 
 # Em api/models.py
@@ -117,6 +174,8 @@ class Appointment(models.Model):
         ("CANCELLED", "Cancelado"),
         ("COMPLETED", "Concluído"),
     )
+    # Status que ocupam a agenda do funcionário.
+    ACTIVE_STATUSES = ("CONFIRMED", "PENDING")
 
     # NOVO: Opções de Frequência para Recorrência
     FREQUENCY_CHOICES = (
@@ -153,6 +212,13 @@ class Appointment(models.Model):
         null=True,
         help_text="Data final para a criação de agendamentos recorrentes"
     )
+    # Séries "por regra": as ocorrências só viram linhas até esta data
+    # (horizonte móvel, ver api/recurrence.py); as seguintes são virtuais.
+    recurrence_materialized_until = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Série por regra: ocorrências já gravadas até esta data; as posteriores são expandidas sob demanda"
+    )
     # Este campo liga todos os "filhos" ao primeiro agendamento da série.
     recurrence_parent = models.ForeignKey(
         'self',
@@ -163,6 +229,24 @@ class Appointment(models.Model):
     )
     # --- FIM DOS NOVOS CAMPOS ---
 
+    class Meta:
+        indexes = [
+            # Conflitos de horário e disponibilidade: employee + faixa de horário.
+            # Sem condição parcial de status: o SQLite não consegue usar índices
+            # parciais quando os valores do IN chegam como parâmetros.
+            models.Index(fields=['employee', 'appointment_time', 'end_time'], name='appt_employee_time_idx'),
+            # Listagens da equipe/dono e do tutor, ordenadas por horário.
+            models.Index(fields=['pet_shop', 'appointment_time'], name='appt_shop_time_idx'),
+            models.Index(fields=['tutor', 'appointment_time'], name='appt_tutor_time_idx'),
+            # Pais de séries por regra (api/recurrence.rule_parents), lidos em
+            # toda verificação de conflito: só as poucas linhas com regra em vigor.
+            # A condição é literal, então o SQLite também usa o índice parcial.
+            models.Index(
+                fields=['employee', 'appointment_time'], name='appt_rule_parent_idx',
+                condition=models.Q(recurrence_materialized_until__isnull=False),
+            ),
+        ]
+
     def __str__(self):
         try:
             pet_name = self.pet.name
@@ -176,7 +260,7 @@ class Review(models.Model):
     appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE, related_name='review')
     tutor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
     pet_shop = models.ForeignKey(PetShop, on_delete=models.CASCADE, related_name='reviews')
-    rating = models.IntegerField() # Nota de 1 a 5
+    rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)]) # Nota de 1 a 5
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -207,5 +291,49 @@ class TimeBlock(models.Model):
         help_text="Motivo do bloqueio (ex: Consulta médica, Feriado)"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'start_time'], name='timeblock_employee_start_idx'),
+            # Listagem da equipe/dono por pet shop, ordenada por horário.
+            models.Index(fields=['pet_shop', 'start_time'], name='timeblock_shop_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"Bloqueio para {self.employee.username} de {self.start_time.strftime('%H:%M')} a {self.end_time.strftime('%H:%M')}"
+
+class DailyShopStats(models.Model):
+    """
+    Resumo diário de um pet shop (um registro por pet shop e dia), para os
+    painéis não precisarem agregar o histórico de agendamentos.
+    Mantido por api/rollups.py: os sinais de Appointment e Review ajustam
+    o dia afetado e os comandos `update_shop_stats` e `backfill_shop_stats`
+    recalculam períodos inteiros.
+    """
+    pet_shop = models.ForeignKey(PetShop, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    # Soma de `total_price` dos agendamentos concluídos e confirmados.
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    confirmed_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    # Avaliações criadas no dia; a média é rating_sum / review_count.
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pet_shop', 'date'], name='daily_stats_shop_date_uniq'),
+        ]
+
+    @property
+    def appointment_count(self):
+        return self.pending_count + self.confirmed_count + self.completed_count + self.cancelled_count
+
+    @property
+    def rating_avg(self):
+        return self.rating_sum / self.review_count if self.review_count else None
+
     def __str__(self):
-        return f"Bloqueio para {self.employee.username} de {self.start_time.strftime('%H:%M')} a {self.end_time.strftime('%H:%M')}"
\ No newline at end of file
+        return f"{self.pet_shop.name} em {self.date.strftime('%d/%m/%Y')}"
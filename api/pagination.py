@@ -0,0 +1,36 @@
+# api/pagination.py
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class StandardPageNumberPagination(PageNumberPagination):
+    """Paginação por número de página (pets, pet shops, serviços...)."""
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class TimeOrderedCursorPagination(CursorPagination):
+    """
+    Paginação por cursor pela coluna de horário (+ id como desempate).
+    `?ordering=-<coluna>` inverte a ordem; o cursor continua usando o índice.
+    """
+    ordering_query_param = 'ordering'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get(self.ordering_query_param) == f'-{self.ordering[0]}':
+            return tuple(f'-{field}' for field in self.ordering)
+        return self.ordering
+
+
+class AppointmentCursorPagination(TimeOrderedCursorPagination):
+    """
+    Paginação por cursor para o histórico de agendamentos: o custo de cada
+    página não cresce com o tamanho da tabela (sem OFFSET nem COUNT).
+    """
+    ordering = ('appointment_time', 'id')
+
+
+class TimeBlockCursorPagination(TimeOrderedCursorPagination):
+    ordering = ('start_time', 'id')
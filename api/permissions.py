@@ -1,43 +1,30 @@
 # api/permissions.py
+import logging
+
 from rest_framework import permissions
-from .models import PetShop, Appointment
 
-# Em api/permissions.py
+from .membership import get_membership
+
+logger = logging.getLogger(__name__)
+
 
 class CanManagePetShop(permissions.BasePermission):
     """
     Permissão customizada que permite acesso apenas ao Proprietário
-    ou a um Gerente daquele pet shop específico. (VERSÃO DE DEPURAÇÃO)
+    ou a um Gerente daquele pet shop específico.
     """
     def has_permission(self, request, view):
         petshop_pk = view.kwargs.get('petshop_pk')
-        if not petshop_pk:
-            return False
-        
-        try:
-            petshop = PetShop.objects.get(pk=petshop_pk)
-        except PetShop.DoesNotExist:
-            return False
-
         user = request.user
-        
-        # --- INÍCIO DO CÓDIGO DE DEPURAÇÃO ---
-        print("--- Verificando Permissão para Gerenciar PetShop ---")
-        print(f"Usuário: {user.username} (Tipo: {user.user_type})")
-        print(f"Tentando aceder ao PetShop: {petshop.name} (ID: {petshop.id})")
-        print(f"PetShop onde o usuário trabalha (works_at): {user.works_at}")
-        # --- FIM DO CÓDIGO DE DEPURAÇÃO ---
+        if not petshop_pk or not user.is_authenticated:
+            return False
 
-        is_owner = petshop.owner == user
-        is_manager = (user.user_type == 'GERENTE' and user.works_at == petshop)
-        
-        # --- INÍCIO DO CÓDIGO DE DEPURAÇÃO ---
-        print(f"Verificação 'is_owner': {is_owner}")
-        print(f"Verificação 'is_manager': {is_manager}")
-        print("-------------------------------------------------")
-        # --- FIM DO CÓDIGO DE DEPURAÇÃO ---
-        
-        return is_owner or is_manager
+        allowed = get_membership(request).manages(petshop_pk)
+        logger.debug(
+            'Permissão para gerenciar o pet shop %s: usuário %s (%s, works_at=%s) -> %s',
+            petshop_pk, user.pk, user.user_type, user.works_at_id, allowed,
+        )
+        return allowed
 
 class IsAppointmentOwnerOrPetShopOwner(permissions.BasePermission):
     """
@@ -46,8 +33,5 @@ class IsAppointmentOwnerOrPetShopOwner(permissions.BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         user = request.user
-        is_tutor_owner = (user.user_type == 'TUTOR' and obj.tutor == user)
-        is_shop_owner = obj.pet_shop.owner == user
-        is_shop_staff = user.user_type in ['GERENTE', 'FUNCIONARIO'] and user.works_at == obj.pet_shop
-
-        return is_tutor_owner or is_shop_owner or is_shop_staff
\ No newline at end of file
+        is_tutor_owner = (user.user_type == 'TUTOR' and obj.tutor_id == user.pk)
+        return is_tutor_owner or get_membership(request).is_team_member(obj.pet_shop_id)
@@ -0,0 +1,75 @@
+# api/ratings.py
+"""
+Agregados de avaliação desnormalizados em PetShop (`rating_avg`,
+`rating_count` e o histograma `rating_1` … `rating_5`).
+
+Cada avaliação criada, alterada ou apagada ajusta os contadores do pet shop
+com um único UPDATE baseado nos valores atuais da linha (sem ler todas as
+avaliações); os sinais em api/signals.py chamam `apply_review`.
+`rebuild` recalcula tudo a partir de Review (comando `rebuild_ratings`).
+"""
+from django.db.models import Avg, Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Now
+from django.utils import timezone
+
+from .models import PetShop, Review
+
+RATINGS = range(1, 6)
+
+
+def histogram_field(rating):
+    return f'rating_{rating}'
+
+
+def apply_review(pet_shop_id, rating, sign):
+    """Soma (`sign=1`) ou retira (`sign=-1`) uma nota dos agregados do pet shop."""
+    if pet_shop_id is None or rating not in RATINGS:
+        return
+    total = sum((F(histogram_field(value)) * value for value in RATINGS), Value(sign * rating))
+    new_count = F('rating_count') + sign
+    PetShop.objects.filter(pk=pet_shop_id).update(**{
+        'rating_count': new_count,
+        histogram_field(rating): F(histogram_field(rating)) + sign,
+        # No UPDATE as colunas à direita ainda têm os valores antigos.
+        'rating_avg': Case(
+            When(rating_count__lte=-sign, then=Value(None)),
+            default=Cast(total, FloatField()) / new_count,
+            output_field=FloatField(),
+        ),
+        # update() não aciona auto_now; a nota aparece nas listagens (ETag)
+        'updated_at': Now(),
+    })
+
+
+def rebuild(pet_shop_ids=None):
+    """Recalcula os agregados (de todos os pet shops ou dos informados). Retorna quantos mudaram."""
+    reviews = Review.objects.filter(rating__in=RATINGS)
+    petshops = PetShop.objects.order_by('pk')
+    if pet_shop_ids is not None:
+        reviews = reviews.filter(pet_shop_id__in=pet_shop_ids)
+        petshops = petshops.filter(pk__in=pet_shop_ids)
+    totals = {
+        row['pet_shop']: row
+        for row in reviews.values('pet_shop').annotate(
+            count=Count('id'), avg=Avg('rating'),
+            **{histogram_field(value): Count('id', filter=Q(rating=value)) for value in RATINGS},
+        )
+    }
+    fields = ['rating_count', 'rating_avg', *(histogram_field(value) for value in RATINGS)]
+    now = timezone.now()
+    updated = []
+    for petshop in petshops.only('pk', *fields).iterator(chunk_size=1000):
+        row = totals.get(petshop.pk, {})
+        values = {
+            'rating_count': row.get('count', 0),
+            'rating_avg': row.get('avg'),
+            **{histogram_field(value): row.get(histogram_field(value), 0) for value in RATINGS},
+        }
+        if all(getattr(petshop, field) == value for field, value in values.items()):
+            continue
+        for field, value in values.items():
+            setattr(petshop, field, value)
+        petshop.updated_at = now
+        updated.append(petshop)
+    PetShop.objects.bulk_update(updated, [*fields, 'updated_at'], batch_size=500)
+    return len(updated)
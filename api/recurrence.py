@@ -0,0 +1,173 @@
+# api/recurrence.py
+"""
+Séries recorrentes.
+
+Uma série "por regra" guarda a regra no agendamento pai (`frequency`,
+`recurrence_end_date`, que pode ser vazia) e só grava linhas filhas até
+`recurrence_materialized_until`, um horizonte móvel de algumas semanas
+(RECURRENCE_HORIZON_WEEKS) avançado pelo comando `materialize_recurrences`.
+As ocorrências posteriores ao horizonte são expandidas em memória, apenas
+dentro da janela consultada (disponibilidade, conflitos e listagens).
+
+A série vale enquanto o pai tiver `recurrence_materialized_until`,
+independentemente do status do próprio pai (que pode ser concluído ou
+cancelado sozinho); `end_series` encerra a regra limpando esse campo.
+"""
+from datetime import datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, TimeBlock
+
+STEPS = {
+    'WEEKLY': relativedelta(weeks=1),
+    'BIWEEKLY': relativedelta(weeks=2),
+    'MONTHLY': relativedelta(months=1),
+}
+# Passos de tamanho fixo permitem pular direto para o início da janela.
+_FIXED_STEP_DAYS = {'WEEKLY': 7, 'BIWEEKLY': 14}
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def horizon_date(today=None, weeks=None):
+    """Último dia do horizonte de materialização a partir de hoje."""
+    weeks = settings.RECURRENCE_HORIZON_WEEKS if weeks is None else weeks
+    return (today or timezone.localdate()) + timedelta(weeks=weeks)
+
+
+def occurrence_times(frequency, first_time, window_start, window_end, last_date=None):
+    """
+    Horários das repetições de `first_time` (sem incluí-lo) que caem em
+    [window_start, window_end) e cuja data não passa de `last_date`.
+    """
+    step = STEPS[frequency]
+    current = first_time + step
+    step_days = _FIXED_STEP_DAYS.get(frequency)
+    if step_days and current < window_start:
+        current += timedelta(days=(window_start - current).days // step_days * step_days)
+    while current < window_end:
+        if last_date and timezone.localdate(current) > last_date:
+            break
+        if current >= window_start:
+            yield current
+        current += step
+
+
+def rule_parents(window_start=None, window_end=None):
+    """Agendamentos pais de séries por regra em vigor que podem tocar a janela."""
+    parents = Appointment.objects.filter(
+        recurrence_materialized_until__isnull=False, frequency__in=STEPS, end_time__isnull=False,
+    )
+    if window_end is not None:
+        parents = parents.filter(appointment_time__lt=window_end)
+    if window_start is not None:
+        parents = parents.filter(
+            Q(recurrence_end_date__isnull=True) | Q(recurrence_end_date__gte=timezone.localdate(window_start))
+        )
+    return parents
+
+
+def end_series(parent_ids):
+    """
+    Encerra as séries por regra dos pais informados: as ocorrências virtuais
+    deixam de existir. Retorna os funcionários afetados.
+    """
+    series = Appointment.objects.filter(pk__in=parent_ids, recurrence_materialized_until__isnull=False)
+    employee_ids = set(series.values_list('employee_id', flat=True))
+    if employee_ids:
+        series.update(recurrence_materialized_until=None)
+    return employee_ids
+
+
+def virtual_occurrences(parents, window_start, window_end):
+    """
+    Gera (pai, início, fim) das ocorrências ainda não gravadas, isto é,
+    posteriores a `recurrence_materialized_until`, dentro da janela.
+    """
+    for parent in parents:
+        duration = parent.end_time - parent.appointment_time
+        first_virtual = _start_of(parent.recurrence_materialized_until + timedelta(days=1))
+        times = occurrence_times(
+            parent.frequency, parent.appointment_time, max(window_start, first_virtual), window_end,
+            parent.recurrence_end_date,
+        )
+        for start in times:
+            yield parent, start, start + duration
+
+
+def virtual_busy_rows(employee_ids, window_start, window_end):
+    """Ocorrências virtuais como linhas (employee_id, início, fim), em uma consulta."""
+    parents = rule_parents(window_start, window_end).filter(employee_id__in=employee_ids).only(
+        'employee_id', 'appointment_time', 'end_time', 'frequency', 'recurrence_end_date',
+        'recurrence_materialized_until',
+    )
+    return [(parent.employee_id, start, end) for parent, start, end in virtual_occurrences(parents, window_start, window_end)]
+
+
+def build_occurrence(parent, start, end, status='PENDING'):
+    """Ocorrência (não salva) de uma série, copiando os dados do pai."""
+    return Appointment(
+        tutor=parent.tutor,
+        pet=parent.pet,
+        pet_shop=parent.pet_shop,
+        service=parent.service,
+        employee=parent.employee,
+        client_name=parent.client_name,
+        client_phone=parent.client_phone,
+        appointment_time=start,
+        end_time=end,
+        status=status,
+        total_price=parent.total_price,
+        recurrence_parent=parent,
+    )
+
+
+def materialize_series(parent, until):
+    """
+    Grava as ocorrências da série até `until` (inclusive), pulando as que
+    conflitam com agendamentos ou bloqueios existentes. Retorna (criadas, datas puladas).
+    Deve ser chamada dentro de uma transação.
+    """
+    from . import rollups
+    from .availability import MAX_BOOKING_SPAN, BusyIndex
+
+    if parent.recurrence_end_date:
+        until = min(until, parent.recurrence_end_date)
+    if until <= parent.recurrence_materialized_until:
+        return [], []
+
+    window_start = _start_of(parent.recurrence_materialized_until + timedelta(days=1))
+    window_end = _start_of(until + timedelta(days=1))
+    pending = list(virtual_occurrences([parent], window_start, window_end))
+
+    created, skipped = [], []
+    if pending:
+        busy = BusyIndex([
+            *Appointment.objects.filter(
+                employee_id=parent.employee_id, status__in=Appointment.ACTIVE_STATUSES,
+                appointment_time__gt=window_start - MAX_BOOKING_SPAN, appointment_time__lt=window_end,
+            ).values_list('appointment_time', 'end_time'),
+            *TimeBlock.objects.filter(
+                employee_id=parent.employee_id,
+                start_time__gt=window_start - MAX_BOOKING_SPAN, start_time__lt=window_end,
+            ).values_list('start_time', 'end_time'),
+        ])
+        for _, start, end in pending:
+            if busy.overlaps(start, end):
+                skipped.append(timezone.localdate(start))
+                continue
+            busy.add(start, end)
+            created.append(build_occurrence(parent, start, end))
+        Appointment.objects.bulk_create(created)
+        # bulk_create não dispara sinais
+        rollups.refresh_appointments((appt.pet_shop_id, appt.appointment_time) for appt in created)
+
+    Appointment.objects.filter(pk=parent.pk).update(recurrence_materialized_until=until)
+    parent.recurrence_materialized_until = until
+    return created, skipped
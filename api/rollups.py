@@ -0,0 +1,228 @@
+# api/rollups.py
+"""
+Resumo diário por pet shop (DailyShopStats): faturamento, agendamentos por
+status (inclusive cancelamentos) e avaliações do dia.
+
+- Os sinais de Appointment e Review (api/signals.py) chamam `apply` com a
+  parcela antiga (sinal -1) e a nova (+1) do registro. Os deltas são
+  gravados no COMMIT da transação que fez a mudança (a linha do dia não
+  fica travada durante a reserva): INSERT ... ON CONFLICT DO NOTHING cria
+  o dia que faltar e um UPDATE com F() soma o delta, sem ler os demais
+  agendamentos nem sobrescrever deltas concorrentes.
+- Operações que não disparam sinais (update() e bulk_create em lote)
+  chamam `refresh` com os dias afetados, também no COMMIT.
+- Dias anteriores à implantação só entram no resumo pelo `backfill_shop_stats`.
+- `rollup_range` recalcula um período em blocos de dias, com memória
+  limitada ao tamanho do bloco (comandos `backfill_shop_stats` e
+  `update_shop_stats`).
+
+Os painéis leem só esta tabela (`dashboard`).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Greatest, Now, TruncDate
+from django.utils import timezone
+
+from .analytics import REVENUE_STATUSES
+from .availability import day_bounds
+from .models import Appointment, DailyShopStats, Review
+
+STATUS_FIELDS = {
+    'PENDING': 'pending_count',
+    'CONFIRMED': 'confirmed_count',
+    'COMPLETED': 'completed_count',
+    'CANCELLED': 'cancelled_count',
+}
+COUNTER_FIELDS = (*STATUS_FIELDS.values(), 'revenue', 'review_count', 'rating_sum')
+CHUNK_DAYS = 31
+BATCH_SIZE = 1000
+ZERO = Decimal('0.00')
+
+
+def _day(value):
+    return timezone.localdate(value) if value else None
+
+
+def appointment_share(pet_shop_id, appointment_time, status, total_price):
+    """Parcela de um agendamento no resumo: ((pet_shop_id, dia), {campo: valor})."""
+    fields = {}
+    if status in STATUS_FIELDS:
+        fields[STATUS_FIELDS[status]] = 1
+    if status in REVENUE_STATUSES and total_price:
+        fields['revenue'] = Decimal(total_price)
+    return (pet_shop_id, _day(appointment_time)), fields
+
+
+def review_share(pet_shop_id, created_at, rating):
+    """Parcela de uma avaliação no resumo do dia em que foi criada."""
+    return (pet_shop_id, _day(created_at)), {'review_count': 1, 'rating_sum': rating or 0}
+
+
+def apply(changes):
+    """
+    Soma as parcelas `(chave, campos, sinal)` aos resumos dos dias, no
+    COMMIT da transação corrente (ou já, fora de uma transação).
+    """
+    deltas = {}
+    for key, fields, sign in changes:
+        if not all(key):
+            continue
+        target = deltas.setdefault(key, {})
+        for field, value in fields.items():
+            target[field] = target.get(field, 0) + sign * value
+    deltas = {key: {field: value for field, value in fields.items() if value} for key, fields in deltas.items()}
+    deltas = {key: fields for key, fields in deltas.items() if fields}
+    if deltas:
+        transaction.on_commit(lambda: _apply_deltas(deltas), robust=True)
+
+
+def _increment(field, value):
+    # Contadores não ficam negativos (PositiveIntegerField), mesmo num dia
+    # anterior ao backfill que só recebeu o delta de um cancelamento.
+    if value < 0 and field != 'revenue':
+        return Greatest(F(field) + value, 0)
+    return F(field) + value
+
+
+def _apply_deltas(deltas):
+    with transaction.atomic():
+        DailyShopStats.objects.bulk_create(
+            [DailyShopStats(pet_shop_id=pet_shop_id, date=day) for pet_shop_id, day in sorted(deltas)],
+            ignore_conflicts=True,
+        )
+        for (pet_shop_id, day), fields in sorted(deltas.items()):
+            DailyShopStats.objects.filter(pet_shop_id=pet_shop_id, date=day).update(
+                updated_at=Now(), **{field: _increment(field, value) for field, value in fields.items()}
+            )
+
+
+def _compute(first_day, last_day, pet_shop_ids=None):
+    """{(pet_shop_id, dia): campos} do período, agregado no banco (duas consultas)."""
+    range_start, _ = day_bounds(first_day)
+    _, range_end = day_bounds(last_day)
+    tz = timezone.get_current_timezone()
+    appointments = Appointment.objects.filter(appointment_time__gte=range_start, appointment_time__lt=range_end)
+    reviews = Review.objects.filter(created_at__gte=range_start, created_at__lt=range_end)
+    if pet_shop_ids is not None:
+        appointments = appointments.filter(pet_shop_id__in=pet_shop_ids)
+        reviews = reviews.filter(pet_shop_id__in=pet_shop_ids)
+
+    rows = {}
+    appointment_days = appointments.annotate(day=TruncDate('appointment_time', tzinfo=tz)).values(
+        'pet_shop_id', 'day'
+    ).annotate(
+        revenue=Sum('total_price', filter=Q(status__in=REVENUE_STATUSES)),
+        **{field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()},
+    ).order_by()
+    for row in appointment_days.iterator():
+        fields = rows.setdefault((row['pet_shop_id'], row['day']), {})
+        fields.update({field: row[field] for field in STATUS_FIELDS.values()})
+        fields['revenue'] = row['revenue'] or ZERO
+
+    review_days = reviews.annotate(day=TruncDate('created_at', tzinfo=tz)).values('pet_shop_id', 'day').annotate(
+        review_count=Count('id'), rating_sum=Sum('rating'),
+    ).order_by()
+    for row in review_days.iterator():
+        fields = rows.setdefault((row['pet_shop_id'], row['day']), {})
+        fields.update(review_count=row['review_count'], rating_sum=row['rating_sum'] or 0)
+    return rows
+
+
+def _write(rows):
+    DailyShopStats.objects.bulk_create(
+        (DailyShopStats(pet_shop_id=pet_shop_id, date=day, **fields) for (pet_shop_id, day), fields in rows.items()),
+        batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=['pet_shop', 'date'],
+        update_fields=[*COUNTER_FIELDS, 'updated_at'],
+    )
+
+
+def refresh(pairs):
+    """
+    Recalcula a partir da origem os resumos dos pares (pet_shop_id, dia), no
+    COMMIT da transação corrente. Dias que ficaram sem agendamentos nem
+    avaliações perdem o registro.
+    """
+    pairs = {(pet_shop_id, day) for pet_shop_id, day in pairs if pet_shop_id and day}
+    if pairs:
+        transaction.on_commit(lambda: _refresh(pairs), robust=True)
+
+
+def _refresh(pairs):
+    pet_shop_ids = {pet_shop_id for pet_shop_id, _ in pairs}
+    days = {day for _, day in pairs}
+    computed = _compute(min(days), max(days), pet_shop_ids)
+    with transaction.atomic():
+        DailyShopStats.objects.filter(pet_shop_id__in=pet_shop_ids, date__in=days).delete()
+        _write({key: fields for key, fields in computed.items() if key[1] in days})
+
+
+def refresh_appointments(rows):
+    """`refresh` dos dias de linhas (pet_shop_id, appointment_time) alteradas em lote."""
+    refresh((pet_shop_id, _day(appointment_time)) for pet_shop_id, appointment_time in rows)
+
+
+def source_bounds():
+    """Primeiro e último dia com agendamentos ou avaliações (ou None)."""
+    appointments = Appointment.objects.aggregate(first=Min('appointment_time'), last=Max('appointment_time'))
+    reviews = Review.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    firsts = [value for value in (appointments['first'], reviews['first']) if value]
+    lasts = [value for value in (appointments['last'], reviews['last']) if value]
+    if not firsts:
+        return None
+    return _day(min(firsts)), _day(max(lasts))
+
+
+def rollup_range(first_day, last_day, pet_shop_ids=None, chunk_days=CHUNK_DAYS):
+    """
+    Recalcula os resumos entre `first_day` e `last_day` (inclusive), um
+    bloco de `chunk_days` dias por transação. Gera (início, fim, linhas)
+    de cada bloco processado.
+    """
+    start = first_day
+    while start <= last_day:
+        end = min(start + timedelta(days=chunk_days - 1), last_day)
+        rows = _compute(start, end, pet_shop_ids)
+        with transaction.atomic():
+            stale = DailyShopStats.objects.filter(date__gte=start, date__lte=end)
+            if pet_shop_ids is not None:
+                stale = stale.filter(pet_shop_id__in=pet_shop_ids)
+            stale.delete()
+            _write(rows)
+        yield start, end, len(rows)
+        start = end + timedelta(days=1)
+
+
+def _money(value):
+    return str((value or ZERO).quantize(ZERO))
+
+
+def _summary(row):
+    appointments = sum(row[field] or 0 for field in STATUS_FIELDS.values())
+    return {
+        'revenue': _money(row['revenue']),
+        'appointments': appointments,
+        **{field.replace('_count', ''): row[field] or 0 for field in STATUS_FIELDS.values()},
+        'reviews': row['review_count'] or 0,
+        'rating_avg': round(row['rating_sum'] / row['review_count'], 2) if row['review_count'] else None,
+    }
+
+
+def dashboard(pet_shop_ids, start_day, end_day):
+    """Totais por pet shop e série diária somada, lidos só dos resumos (duas consultas)."""
+    stats = DailyShopStats.objects.filter(date__gte=start_day, date__lte=end_day)
+    if pet_shop_ids is not None:
+        stats = stats.filter(pet_shop_id__in=pet_shop_ids)
+    sums = {field: Sum(field) for field in COUNTER_FIELDS}
+    shops = stats.values('pet_shop_id', 'pet_shop__name').annotate(**sums).order_by('pet_shop_id')
+    daily = stats.values('date').annotate(**sums).order_by('date')
+    return {
+        'start_date': start_day,
+        'end_date': end_day,
+        'shops': [
+            {'pet_shop_id': row['pet_shop_id'], 'name': row['pet_shop__name'], **_summary(row)} for row in shops
+        ],
+        'daily': [{'date': row['date'], **_summary(row)} for row in daily],
+    }
@@ -0,0 +1,110 @@
+# api/schedules.py
+"""
+Representação compilada do `User.work_schedule`.
+
+O JSON é validado e convertido uma única vez em janelas de trabalho em
+minutos desde a meia-noite, por dia da semana. Formato aceito por dia:
+
+    {"start": "08:00", "end": "17:00"}                               # sem pausa
+    {"start": "08:00", "break_start": "12:00", "break_end": "13:00", "end": "17:00"}
+    {"start": "08:00", "end": "18:00",
+     "breaks": [{"start": "10:00", "end": "10:15"}, {"start": "12:00", "end": "13:00"}]}
+
+Dias ausentes, nulos ou vazios são dias de folga.
+"""
+import re
+
+from django.core.exceptions import ValidationError
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+_TIME_RE = re.compile(r'^([01]\d|2[0-3]):([0-5]\d)$')
+
+
+def _minutes(value, label):
+    match = _TIME_RE.match(value) if isinstance(value, str) else None
+    if not match:
+        raise ValidationError(f'{label}: horário inválido {value!r}, use HH:MM.')
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def _interval(entry, start_key, end_key, label):
+    start = _minutes(entry.get(start_key), f'{label}.{start_key}')
+    end = _minutes(entry.get(end_key), f'{label}.{end_key}')
+    if start >= end:
+        raise ValidationError(f'{label}: "{start_key}" deve ser anterior a "{end_key}".')
+    return start, end
+
+
+def _compile_day(name, entry):
+    if not entry:
+        return ()
+    if not isinstance(entry, dict):
+        raise ValidationError(f'{name}: esperado um objeto com "start" e "end".')
+
+    work_start, work_end = _interval(entry, 'start', 'end', name)
+
+    breaks = []
+    if 'break_start' in entry or 'break_end' in entry:
+        breaks.append(_interval(entry, 'break_start', 'break_end', name))
+    extra_breaks = entry.get('breaks') or []
+    if not isinstance(extra_breaks, list):
+        raise ValidationError(f'{name}.breaks: esperada uma lista de pausas.')
+    for index, item in enumerate(extra_breaks):
+        if not isinstance(item, dict):
+            raise ValidationError(f'{name}.breaks[{index}]: esperado um objeto com "start" e "end".')
+        breaks.append(_interval(item, 'start', 'end', f'{name}.breaks[{index}]'))
+
+    windows = []
+    cursor = work_start
+    for break_start, break_end in sorted(breaks):
+        if break_start < cursor or break_end > work_end:
+            raise ValidationError(f'{name}: pausas devem estar dentro do expediente e não podem se sobrepor.')
+        if break_start > cursor:
+            windows.append((cursor, break_start))
+        cursor = break_end
+    if cursor < work_end:
+        windows.append((cursor, work_end))
+    return tuple(windows)
+
+
+class WorkSchedule:
+    """Janelas de trabalho (início, fim) em minutos, por dia da semana."""
+
+    def __init__(self, windows_by_weekday):
+        self._windows = windows_by_weekday
+
+    @classmethod
+    def parse(cls, raw):
+        """Valida e compila o JSON. Levanta ValidationError se estiver malformado."""
+        if raw in (None, ''):
+            return cls({})
+        if not isinstance(raw, dict):
+            raise ValidationError('O horário de trabalho deve ser um objeto com os dias da semana.')
+        unknown = set(raw) - set(WEEKDAYS)
+        if unknown:
+            raise ValidationError(f'Dias da semana desconhecidos: {", ".join(sorted(unknown))}.')
+        return cls({
+            WEEKDAYS.index(name): _compile_day(name, entry)
+            for name, entry in raw.items() if entry
+        })
+
+    def windows(self, day):
+        """Janelas de trabalho da data `day` (tupla vazia em dia de folga)."""
+        return self._windows.get(day.weekday(), ())
+
+    def works_on(self, day):
+        return bool(self.windows(day))
+
+    def fits(self, day, start_minute, end_minute):
+        """Indica se o intervalo cabe inteiro em uma das janelas do dia."""
+        return any(start <= start_minute and end_minute <= end for start, end in self.windows(day))
+
+    def minutes_on(self, day):
+        """Total de minutos de trabalho no dia."""
+        return sum(end - start for start, end in self.windows(day))
+
+
+def validate_work_schedule(value):
+    """Validador do campo `User.work_schedule` (admin e serializers)."""
+    WorkSchedule.parse(value)
@@ -8,11 +8,49 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'user_type']
 
-class PetShopSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Recorta e expande os campos conforme o contexto recebido da view:
+    `fields` (nomes a manter) e `expand` (relações de `expandable` a embutir
+    como objetos completos). Vale só para o serializer de nível superior.
+    """
+    expandable = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = kwargs.get('context') or {}
+        for name in context.get('expand', ()):
+            if name in self.expandable:
+                self.fields[name] = self.expandable[name](read_only=True)
+        fields = context.get('fields')
+        if fields:
+            unknown = set(fields) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError(
+                    {'fields': f'Campos desconhecidos: {", ".join(sorted(unknown))}.'}
+                )
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PetShopSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = PetShop
         fields = '__all__'
 
+class PetShopListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Versão enxuta para listagens (sem descrição e horários de funcionamento)."""
+    class Meta:
+        model = PetShop
+        fields = ['id', 'name', 'address', 'latitude', 'longitude', 'phone_number', 'rating_avg', 'rating_count']
+
+class NearbyPetShopSerializer(PetShopListSerializer):
+    # Preenchido por api.geo.nearby
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta(PetShopListSerializer.Meta):
+        fields = PetShopListSerializer.Meta.fields + ['distance_km']
+
 class PetSerializer(serializers.ModelSerializer):
     tutor = UserSerializer(read_only=True)
 
@@ -38,7 +76,7 @@ class ServiceSerializer(serializers.ModelSerializer):
 
 # Em api/serializers.py
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Campos para LEITURA (mostrar dados completos)
     tutor = UserSerializer(read_only=True)
     pet = PetSerializer(read_only=True)
@@ -56,8 +94,9 @@ class AppointmentSerializer(serializers.ModelSerializer):
     service_id = serializers.PrimaryKeyRelatedField(
         queryset=Service.objects.all(), source='service', write_only=True
     )
+    # Opcional: sem employee_id o servidor escolhe o funcionário livre menos ocupado
     employee_id = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(), source='employee', write_only=True
+        queryset=User.objects.all(), source='employee', write_only=True, required=False
     )
 
     class Meta:
@@ -69,11 +108,39 @@ class AppointmentSerializer(serializers.ModelSerializer):
         # ... (a sua lógica de validação existente aqui, se houver)
         return data
 
+class AppointmentListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Versão enxuta para listagens: relações só como IDs, sem consultas extras.
+    Com `?expand=pet,service,...` a relação vem também como objeto completo.
+    """
+    expandable = {
+        'tutor': UserSerializer,
+        'pet': PetSerializer,
+        'pet_shop': PetShopListSerializer,
+        'service': ServiceSerializer,
+        'employee': UserSerializer,
+    }
+
+    tutor_id = serializers.IntegerField(read_only=True)
+    pet_id = serializers.IntegerField(read_only=True)
+    pet_shop_id = serializers.IntegerField(read_only=True)
+    service_id = serializers.IntegerField(read_only=True)
+    employee_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Appointment
+        fields = [
+            'id', 'appointment_time', 'end_time', 'status', 'total_price', 'client_name',
+            'tutor_id', 'pet_id', 'pet_shop_id', 'service_id', 'employee_id', 'frequency', 'recurrence_parent',
+        ]
+        read_only_fields = fields
+
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = '__all__'
-        read_only_fields = ('tutor',)
+        # O pet shop vem do agendamento avaliado
+        read_only_fields = ('tutor', 'pet_shop')
 
 class TimeBlockSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,198 @@
+# api/signals.py
+"""
+Sinais que mantêm o cache de disponibilidade (api/availability_cache.py),
+o de vínculos (api/membership.py), o dos indicadores (api/analytics.py),
+os agregados de avaliação (api/ratings.py), o resumo diário dos pet shops
+(api/rollups.py) e o `Service.updated_at` (ETag do catálogo) coerentes
+com os dados que resumem.
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import analytics, availability_cache, membership, ratings, rollups
+from .models import Appointment, PetShop, Review, Service, TimeBlock, User
+
+
+def _booking_day(value):
+    return timezone.localdate(value) if value else None
+
+
+def _remember_previous_booking(instance, start_field, extra_fields=()):
+    """
+    Guarda funcionário e dia anteriores, para invalidar também a posição
+    antiga. Retorna a linha anterior (com `extra_fields` no fim) ou None.
+    """
+    instance._previous_booking = instance._previous_shop_day = None
+    if not instance.pk:
+        return None
+    previous = type(instance).objects.filter(pk=instance.pk).values_list(
+        'employee_id', start_field, 'pet_shop_id', *extra_fields
+    ).first()
+    if previous:
+        instance._previous_booking = (previous[0], _booking_day(previous[1]))
+        instance._previous_shop_day = (previous[2], _booking_day(previous[1]))
+    return previous
+
+
+def _deleting_petshop(origin):
+    """Exclusão em cascata de um pet shop: o resumo diário dele some junto."""
+    return isinstance(origin, PetShop) or (isinstance(origin, QuerySet) and origin.model is PetShop)
+
+
+def _invalidate_booking(instance, start_field):
+    bookings = {(instance.employee_id, _booking_day(getattr(instance, start_field)))}
+    previous = getattr(instance, '_previous_booking', None)
+    if previous:
+        bookings.add(previous)
+    for employee_id, day in bookings:
+        if day:
+            availability_cache.invalidate_employee_days(employee_id, [day])
+
+
+@receiver(pre_save, sender=Appointment)
+def appointment_pre_save(sender, instance, **kwargs):
+    previous = _remember_previous_booking(instance, 'appointment_time', ('status', 'total_price'))
+    instance._previous_share = None
+    if previous:
+        _, appointment_time, pet_shop_id, status, total_price = previous
+        instance._previous_share = rollups.appointment_share(pet_shop_id, appointment_time, status, total_price)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_changed(sender, instance, signal, origin=None, **kwargs):
+    _invalidate_booking(instance, 'appointment_time')
+    analytics.invalidate_days([
+        (instance.pet_shop_id, _booking_day(instance.appointment_time)),
+        getattr(instance, '_previous_shop_day', None) or (None, None),
+    ])
+    share = rollups.appointment_share(instance.pet_shop_id, instance.appointment_time, instance.status, instance.total_price)
+    if signal is post_delete:
+        if not _deleting_petshop(origin):
+            rollups.apply([(*share, -1)])
+    else:
+        previous = getattr(instance, '_previous_share', None)
+        rollups.apply([(*share, 1)] + ([(*previous, -1)] if previous else []))
+    if instance.recurrence_materialized_until:
+        # Pai de série por regra: as ocorrências virtuais ocupam dias futuros
+        availability_cache.invalidate_employee_services(instance.employee_id)
+
+
+@receiver(pre_save, sender=TimeBlock)
+def time_block_pre_save(sender, instance, **kwargs):
+    _remember_previous_booking(instance, 'start_time')
+
+
+@receiver(post_save, sender=TimeBlock)
+@receiver(post_delete, sender=TimeBlock)
+def time_block_changed(sender, instance, **kwargs):
+    _invalidate_booking(instance, 'start_time')
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def service_changed(sender, instance, **kwargs):
+    availability_cache.invalidate_services([instance.pk])
+
+
+def _services_changed(service_ids):
+    """Serviços cujo conteúdo mudou: cache de disponibilidade e `updated_at` (ETag do catálogo)."""
+    service_ids = list(service_ids)
+    if service_ids:
+        availability_cache.invalidate_services(service_ids)
+        Service.objects.filter(pk__in=service_ids).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Service.performers.through)
+def service_performers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _services_changed([instance.pk])
+        return
+    # Lado reverso (`user.performable_services`): `instance` é o funcionário.
+    if action == 'pre_clear':
+        instance._cleared_service_ids = list(instance.performable_services.values_list('id', flat=True))
+    elif action == 'post_clear':
+        _services_changed(getattr(instance, '_cleared_service_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        _services_changed(pk_set or [])
+
+
+# Campos do funcionário exibidos no catálogo de serviços (UserSerializer).
+PERFORMER_FIELDS = ('username', 'first_name', 'last_name', 'user_type')
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._work_schedule_changed = instance._performer_changed = False
+    watched = ('work_schedule', *PERFORMER_FIELDS)
+    if update_fields is not None:
+        watched = tuple(field for field in watched if field in update_fields)
+    if not instance.pk or not watched:
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*watched).first()
+    if previous is None:
+        return
+    changed = {field for field in watched if previous[field] != getattr(instance, field)}
+    instance._work_schedule_changed = 'work_schedule' in changed
+    instance._performer_changed = bool(changed & set(PERFORMER_FIELDS))
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, created, **kwargs):
+    if created:
+        return
+    if getattr(instance, '_work_schedule_changed', False):
+        availability_cache.invalidate_employee_services(instance.pk)
+    if getattr(instance, '_performer_changed', False):
+        Service.objects.filter(performers=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=User)
+def user_pre_delete(sender, instance, **kwargs):
+    # Antes do delete, enquanto o vínculo com os serviços ainda existe.
+    _services_changed(Service.objects.filter(performers=instance.pk).values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=PetShop)
+def petshop_pre_save(sender, instance, **kwargs):
+    instance._previous_owner_id = None
+    if instance.pk:
+        instance._previous_owner_id = PetShop.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+
+
+@receiver(post_save, sender=PetShop)
+@receiver(post_delete, sender=PetShop)
+def petshop_changed(sender, instance, **kwargs):
+    membership.invalidate_owner(instance.owner_id, getattr(instance, '_previous_owner_id', None))
+
+
+@receiver(pre_save, sender=Review)
+def review_pre_save(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('pet_shop_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    current = (instance.pet_shop_id, instance.rating)
+    previous = getattr(instance, '_previous_rating', None)
+    if previous == current:
+        return
+    if previous:
+        ratings.apply_review(*previous, sign=-1)
+    ratings.apply_review(*current, sign=1)
+    changes = [(*rollups.review_share(instance.pet_shop_id, instance.created_at, instance.rating), 1)]
+    if previous:
+        changes.append((*rollups.review_share(previous[0], instance.created_at, previous[1]), -1))
+    rollups.apply(changes)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    ratings.apply_review(instance.pet_shop_id, instance.rating, sign=-1)
+    if not _deleting_petshop(origin):
+        rollups.apply([(*rollups.review_share(instance.pet_shop_id, instance.created_at, instance.rating), -1)])
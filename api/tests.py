@@ -1,3 +1,1408 @@
-from django.test import TestCase
+import csv
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+import threading
+from io import StringIO
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.db import connection, connections, transaction
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from . import analytics, availability_cache, metrics, recurrence
+from .geo import bounding_box_filter, haversine_km
+from .availability import load_busy_rows, free_windows, merge_intervals, subtract_intervals
+from .schedules import WorkSchedule
+from .models import User, PetShop, Service, Pet, Appointment, Review, TimeBlock, DailyShopStats
+from .views import AppointmentViewSet
+
+WORK_SCHEDULE = {
+    "monday": {"start": "08:00", "break_start": "12:00", "break_end": "13:00", "end": "17:00"},
+}
+MONDAY = date(2025, 8, 4)
+
+
+def aware(day, hhmm):
+    return timezone.make_aware(datetime.combine(day, datetime.strptime(hhmm, '%H:%M').time()))
+
+
+class BookingFixtureMixin:
+    """Pet shop com dono, dois funcionários, um tutor com pet e um serviço de 60 min."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('dono', user_type='PROPRIETARIO')
+        self.petshop = PetShop.objects.create(owner=self.owner, name='Pet Feliz')
+        self.groomer = User.objects.create_user(
+            'tosador', user_type='FUNCIONARIO', works_at=self.petshop, work_schedule=WORK_SCHEDULE
+        )
+        self.groomer2 = User.objects.create_user(
+            'tosador2', user_type='FUNCIONARIO', works_at=self.petshop, work_schedule=WORK_SCHEDULE
+        )
+        self.tutor = User.objects.create_user('tutor', user_type='TUTOR')
+        self.pet = Pet.objects.create(tutor=self.tutor, name='Rex')
+        self.service = Service.objects.create(
+            pet_shop=self.petshop, name='Banho', base_price='50.00', duration_minutes=45, buffer_time_minutes=15
+        )
+        self.service.performers.set([self.groomer])
+        self.client = APIClient()
+
+    def book(self, employee, day, hhmm, minutes=60, **extra):
+        start = aware(day, hhmm)
+        defaults = dict(
+            tutor=self.tutor, pet=self.pet, pet_shop=self.petshop, service=self.service, employee=employee,
+            appointment_time=start, end_time=start + timedelta(minutes=minutes), total_price='50.00',
+        )
+        defaults.update(extra)
+        return Appointment.objects.create(**defaults)
+
+
+class IntervalHelpersTests(TestCase):
+    def test_merge_intervals_joins_overlapping_and_touching(self):
+        self.assertEqual(merge_intervals([(30, 40), (0, 10), (10, 20), (35, 50)]), [(0, 20), (30, 50)])
+
+    def test_subtract_intervals(self):
+        windows = [(480, 720), (780, 1020)]
+        busy = [(470, 500), (600, 660), (700, 800)]
+        self.assertEqual(subtract_intervals(windows, busy), [(500, 600), (660, 700), (800, 1020)])
+
+    def test_free_windows_without_schedule(self):
+        self.assertEqual(free_windows((), [(600, 660)]), [])
+
+
+class WorkScheduleTests(TestCase):
+    def test_legacy_format_splits_on_break(self):
+        schedule = WorkSchedule.parse(WORK_SCHEDULE)
+        self.assertEqual(schedule.windows(MONDAY), ((480, 720), (780, 1020)))
+        self.assertFalse(schedule.works_on(MONDAY + timedelta(days=1)))
+
+    def test_day_without_break_and_multiple_breaks(self):
+        schedule = WorkSchedule.parse({
+            'monday': {'start': '08:00', 'end': '12:00'},
+            'tuesday': {
+                'start': '08:00', 'end': '18:00',
+                'breaks': [{'start': '12:00', 'end': '13:00'}, {'start': '10:00', 'end': '10:15'}],
+            },
+            'sunday': None,
+        })
+        self.assertEqual(schedule.windows(MONDAY), ((480, 720),))
+        self.assertEqual(
+            schedule.windows(MONDAY + timedelta(days=1)), ((480, 600), (615, 720), (780, 1080))
+        )
+        self.assertEqual(schedule.minutes_on(MONDAY + timedelta(days=1)), 525)
+        self.assertTrue(schedule.fits(MONDAY, 600, 720))
+        self.assertFalse(schedule.fits(MONDAY, 690, 750))
+
+    def test_malformed_schedules_are_rejected(self):
+        invalid = [
+            ['monday'],
+            {'funday': {'start': '08:00', 'end': '12:00'}},
+            {'monday': {'start': '08:00'}},
+            {'monday': {'start': '8h', 'end': '12:00'}},
+            {'monday': {'start': '12:00', 'end': '08:00'}},
+            {'monday': {'start': '08:00', 'end': '12:00', 'break_start': '11:00'}},
+            {'monday': {'start': '08:00', 'end': '12:00', 'breaks': [{'start': '11:00', 'end': '13:00'}]}},
+        ]
+        for raw in invalid:
+            with self.assertRaises(ValidationError, msg=raw):
+                WorkSchedule.parse(raw)
+
+    def test_model_validation_and_memoized_compilation(self):
+        user = User(username='func', work_schedule={'monday': {'start': '08:00'}})
+        with self.assertRaises(ValidationError):
+            user.full_clean()
+        user.work_schedule = WORK_SCHEDULE
+        compiled = user.compiled_schedule
+        self.assertIs(user.compiled_schedule, compiled)
+        user.work_schedule = {'monday': {'start': '09:00', 'end': '10:00'}}
+        self.assertEqual(user.compiled_schedule.windows(MONDAY), ((540, 600),))
+
+
+class AvailabilityTests(BookingFixtureMixin, TestCase):
+    def get_slots(self, day=MONDAY):
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        return self.client.get(url, {'date': day.isoformat(), 'service_id': self.service.pk})
+
+    def test_requires_date_and_service(self):
+        self.client.force_authenticate(self.tutor)
+        response = self.client.get(f'/api/petshops/{self.petshop.pk}/availability/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_slots_respect_shifts_and_break(self):
+        slots = self.get_slots().data
+        self.assertEqual(slots[0], '08:00')
+        self.assertIn('11:00', slots)
+        self.assertNotIn('11:15', slots)
+        self.assertNotIn('12:30', slots)
+        self.assertIn('13:00', slots)
+        self.assertEqual(slots[-1], '16:00')
+
+    def test_bookings_and_blocks_remove_slots(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        self.book(self.groomer, MONDAY, '14:00', status='CANCELLED')
+        TimeBlock.objects.create(
+            employee=self.groomer, pet_shop=self.petshop,
+            start_time=aware(MONDAY, '15:00'), end_time=aware(MONDAY, '16:00'),
+        )
+        slots = self.get_slots().data
+        self.assertIn('08:00', slots)
+        self.assertNotIn('08:15', slots)
+        self.assertNotIn('09:45', slots)
+        self.assertIn('10:00', slots)
+        self.assertIn('14:00', slots)
+        self.assertNotIn('14:15', slots)
+        self.assertNotIn('15:30', slots)
+        self.assertIn('16:00', slots)
+
+    def test_any_free_performer_keeps_slot(self):
+        self.service.performers.add(self.groomer2)
+        self.book(self.groomer, MONDAY, '09:00')
+        self.assertIn('09:00', self.get_slots().data)
+
+    def test_day_off_has_no_slots(self):
+        self.assertEqual(self.get_slots(MONDAY + timedelta(days=1)).data, [])
+
+    def test_multiple_breaks_and_invalid_schedule(self):
+        schedule = {'monday': {'start': '08:00', 'end': '11:00', 'breaks': [{'start': '09:00', 'end': '09:30'}]}}
+        User.objects.filter(pk=self.groomer.pk).update(work_schedule=schedule)
+        self.assertEqual(self.get_slots().data, ['08:00', '09:30', '09:45', '10:00'])
+        User.objects.filter(pk=self.groomer.pk).update(work_schedule={'monday': {'start': '08:00'}})
+        cache.clear()
+        with self.assertLogs('api.availability', 'WARNING'):
+            self.assertEqual(self.get_slots().data, [])
+
+    def test_range_mode_returns_map_with_constant_queries(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        self.book(self.groomer, MONDAY + timedelta(days=7), '08:00', minutes=600)
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        params = {
+            'start_date': MONDAY.isoformat(), 'end_date': (MONDAY + timedelta(days=7)).isoformat(),
+            'service_id': self.service.pk,
+        }
+        with self.assertNumQueries(6):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 8)
+        self.assertNotIn('09:00', response.data[MONDAY.isoformat()])
+        self.assertEqual(response.data[(MONDAY + timedelta(days=1)).isoformat()], [])
+        self.assertEqual(response.data[(MONDAY + timedelta(days=7)).isoformat()], [])
+
+    def test_range_mode_rejects_inverted_or_long_ranges(self):
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        for start, end in (('2025-08-10', '2025-08-04'), ('2025-08-01', '2025-09-30')):
+            response = self.client.get(url, {'start_date': start, 'end_date': end, 'service_id': self.service.pk})
+            self.assertEqual(response.status_code, 400)
+
+    def test_by_performer_lists_free_employees_per_slot(self):
+        self.service.performers.add(self.groomer2)
+        self.book(self.groomer, MONDAY, '09:00')
+        self.client.force_authenticate(self.tutor)
+        response = self.client.get(
+            f'/api/petshops/{self.petshop.pk}/availability/',
+            {'date': MONDAY.isoformat(), 'service_id': self.service.pk, 'by_performer': 'true'},
+        )
+        slots = {item['time']: item['performers'] for item in response.data}
+        self.assertEqual(slots['08:00'], [self.groomer.pk, self.groomer2.pk])
+        self.assertEqual(slots['09:00'], [self.groomer2.pk])
+
+
+class AppointmentCreateTests(BookingFixtureMixin, TestCase):
+    def create(self, hhmm, **extra):
+        self.client.force_authenticate(self.tutor)
+        payload = {
+            'pet_id': self.pet.pk, 'pet_shop_id': self.petshop.pk, 'service_id': self.service.pk,
+            'appointment_time': aware(MONDAY, hhmm).isoformat(),
+        }
+        payload.update(extra)
+        return self.client.post('/api/agendamentos/', payload, format='json')
+
+    def test_explicit_employee(self):
+        response = self.create('09:00', employee_id=self.groomer.pk)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Appointment.objects.get().employee, self.groomer)
+
+    def test_conflict_is_rejected(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        response = self.create('09:30', employee_id=self.groomer.pk)
+        self.assertEqual(response.status_code, 400)
+
+    def test_auto_assign_picks_least_loaded_free_performer(self):
+        self.service.performers.add(self.groomer2)
+        self.book(self.groomer, MONDAY, '14:00')
+        response = self.create('09:00')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Appointment.objects.get(appointment_time=aware(MONDAY, '09:00')).employee, self.groomer2)
+
+    def test_invalid_schedule_is_a_validation_error(self):
+        User.objects.filter(pk=self.groomer.pk).update(work_schedule={'monday': {'end': '17:00'}})
+        response = self.create('09:00', employee_id=self.groomer.pk)
+        self.assertEqual(response.status_code, 400)
+
+    def test_auto_assign_without_free_performer(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        response = self.create('09:00')
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_into_an_overlap_is_rejected(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        moved = self.book(self.groomer, MONDAY, '14:00')
+        self.client.force_authenticate(self.owner)
+        url = f'/api/agendamentos/{moved.pk}/'
+        response = self.client.patch(url, {'appointment_time': aware(MONDAY, '09:30').isoformat()}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(url, {'appointment_time': aware(MONDAY, '15:00').isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        moved.refresh_from_db()
+        self.assertEqual(moved.end_time, aware(MONDAY, '16:00'))
+
+    def test_only_pending_appointments_can_be_confirmed(self):
+        cancelled = self.book(self.groomer, MONDAY, '09:00', status='CANCELLED')
+        self.book(self.groomer, MONDAY, '09:00')
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.post(f'/api/agendamentos/{cancelled.pk}/confirm/').status_code, 400)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'CANCELLED')
+
+
+class AvailabilityCacheTests(BookingFixtureMixin, TestCase):
+    def get_slots(self):
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        return self.client.get(url, {'date': MONDAY.isoformat(), 'service_id': self.service.pk}).data
+
+    def test_repeated_query_is_served_from_cache(self):
+        availability_cache.reset_stats()
+        first = self.get_slots()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_slots(), first)
+        stats = availability_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_appointment_and_time_block_invalidate_the_day(self):
+        self.assertIn('09:00', self.get_slots())
+        appointment = self.book(self.groomer, MONDAY, '09:00')
+        self.assertNotIn('09:00', self.get_slots())
+        appointment.appointment_time = aware(MONDAY + timedelta(days=7), '09:00')
+        appointment.save()
+        self.assertIn('09:00', self.get_slots())
+        TimeBlock.objects.create(
+            employee=self.groomer, pet_shop=self.petshop,
+            start_time=aware(MONDAY, '14:00'), end_time=aware(MONDAY, '15:00'),
+        )
+        self.assertNotIn('14:00', self.get_slots())
+
+    def test_invalidation_during_compute_discards_the_stale_entry(self):
+        def compute(days):
+            # A reserva chega depois da leitura das linhas ocupadas
+            availability_cache.invalidate_employee_days(self.groomer.pk, days)
+            return {day: 'antigo' for day in days}
+
+        self.assertEqual(availability_cache.get_day_slots(self.service, [MONDAY], compute), {MONDAY: 'antigo'})
+        fresh = availability_cache.get_day_slots(self.service, [MONDAY], lambda days: {day: 'novo' for day in days})
+        self.assertEqual(fresh, {MONDAY: 'novo'})
+
+    def test_performers_and_schedule_changes_invalidate_the_service(self):
+        self.assertNotEqual(self.get_slots(), [])
+        self.groomer.work_schedule = {}
+        self.groomer.save()
+        self.assertEqual(self.get_slots(), [])
+        self.service.performers.add(self.groomer2)
+        self.assertNotEqual(self.get_slots(), [])
+        self.groomer2.performable_services.clear()
+        self.assertEqual(self.get_slots(), [])
+
+    def test_service_change_invalidates(self):
+        self.assertIn('16:00', self.get_slots())
+        self.service.duration_minutes = 105
+        self.service.save()
+        self.assertNotIn('16:00', self.get_slots())
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.client.force_authenticate(self.tutor)
+        self.assertEqual(self.client.get('/api/petshops/availability-cache/').status_code, 403)
+        admin = User.objects.create_superuser('admin')
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/petshops/availability-cache/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hits', response.data)
+
+
+class AppointmentListQueryTests(BookingFixtureMixin, TestCase):
+    def list_as(self, user, expected_count, queries=1, **params):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/agendamentos/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), expected_count)
+        return response
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.service.performers.add(self.groomer2)
+        self.book(self.groomer, MONDAY, '09:00')
+        self.list_as(self.tutor, 1, queries=2, expand='pet,service')
+        for offset in range(1, 15):
+            self.book(self.groomer2, MONDAY + timedelta(days=7 * offset), '09:00')
+        response = self.list_as(self.tutor, 15, queries=2, expand='pet,service')
+        first = response.data['results'][0]
+        self.assertEqual(first['pet']['tutor']['username'], 'tutor')
+        self.assertEqual(len(first['service']['performers']), 2)
+
+    def test_staff_listing(self):
+        for offset in range(5):
+            self.book(self.groomer, MONDAY + timedelta(days=7 * offset), '09:00')
+        self.list_as(self.groomer, 5)
+
+    def test_compact_rows_and_sparse_fieldsets(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        row = self.list_as(self.tutor, 1).data['results'][0]
+        self.assertEqual((row['employee_id'], row['service_id'], row['pet_shop_id']), (self.groomer.pk, self.service.pk, self.petshop.pk))
+        self.assertNotIn('pet_shop', row)
+        fields = 'id,appointment_time,end_time,status,employee_id'
+        row = self.list_as(self.tutor, 1, fields=fields).data['results'][0]
+        self.assertEqual(set(row), set(fields.split(',')))
+        row = self.list_as(self.tutor, 1, queries=1, fields='id,employee', expand='employee').data['results'][0]
+        self.assertEqual(row['employee']['username'], 'tosador')
+        self.assertEqual(self.client.get('/api/agendamentos/', {'fields': 'id,senha'}).status_code, 400)
+
+    def test_detail_keeps_full_representation(self):
+        appointment = self.book(self.groomer, MONDAY, '09:00')
+        self.client.force_authenticate(self.tutor)
+        data = self.client.get(f'/api/agendamentos/{appointment.pk}/').data
+        self.assertEqual(data['pet_shop']['name'], 'Pet Feliz')
+        data = self.client.get(f'/api/agendamentos/{appointment.pk}/', {'fields': 'id,status'}).data
+        self.assertEqual(set(data), {'id', 'status'})
+
+    def test_petshop_list_is_compact(self):
+        PetShop.objects.filter(pk=self.petshop.pk).update(description='x' * 2000, opening_hours={'monday': '8-18'})
+        self.client.force_authenticate(self.tutor)
+        row = self.client.get('/api/petshops/').data['results'][0]
+        self.assertNotIn('description', row)
+        self.assertNotIn('opening_hours', row)
+        self.assertIn('description', self.client.get(f'/api/petshops/{self.petshop.pk}/').data)
+
+
+class PaginationTests(BookingFixtureMixin, TestCase):
+    def test_appointments_use_cursor_pagination_in_time_order(self):
+        for offset in reversed(range(12)):
+            self.book(self.groomer, MONDAY + timedelta(days=7 * offset), '09:00')
+        self.client.force_authenticate(self.owner)
+        url, seen = '/api/agendamentos/?page_size=5', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 5)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['appointment_time'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_petshops_use_page_numbers(self):
+        for index in range(3):
+            PetShop.objects.create(owner=self.owner, name=f'Loja {index}')
+        self.client.force_authenticate(self.tutor)
+        response = self.client.get('/api/petshops/', {'page_size': 2, 'page': 2})
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(len(response.data['results']), 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Os planos verificados são do SQLite.')
+class QueryPlanTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for offset in range(60):
+            self.book(self.groomer if offset % 2 else self.groomer2, MONDAY + timedelta(days=offset), '09:00')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def plans(self, func):
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                if query['sql'].startswith('SELECT'):
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    plans.append(' '.join(str(row[-1]) for row in cursor.fetchall()))
+        return plans
+
+    def test_availability_queries_use_composite_indexes(self):
+        plans = self.plans(lambda: load_busy_rows([self.groomer.pk, self.groomer2.pk], MONDAY, MONDAY + timedelta(days=6)))
+        self.assertEqual(len(plans), 3)
+        self.assertIn('appt_employee_time_idx (employee_id=? AND appointment_time>? AND appointment_time<?)', plans[0])
+        self.assertIn('timeblock_employee_start_idx (employee_id=? AND start_time>? AND start_time<?)', plans[1])
+        # Pais de séries por regra (ocorrências virtuais)
+        self.assertIn('appt_rule_parent_idx (employee_id=? AND appointment_time<?)', plans[2])
+
+    def test_conflict_check_is_a_range_scan(self):
+        view = AppointmentViewSet()
+        plans = self.plans(lambda: view._validate_appointment_time(
+            SimpleNamespace(instance=None), aware(MONDAY + timedelta(days=7), '14:00'), self.service, self.groomer
+        ))
+        self.assertIn('appt_employee_time_idx (employee_id=? AND appointment_time>? AND appointment_time<?)', plans[-1])
+
+    def test_shop_listing_uses_shop_time_index(self):
+        self.client.force_authenticate(self.owner)
+        plans = self.plans(lambda: self.client.get('/api/agendamentos/'))
+        self.assertTrue(any('appt_shop_time_idx' in plan for plan in plans), plans)
+
+    def test_nearby_prefilter_uses_coordinates_index(self):
+        PetShop.objects.bulk_create(
+            PetShop(owner=self.owner, name=f'Loja {i}', latitude=-23.0 - i / 100, longitude=-46.6) for i in range(50)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.client.force_authenticate(self.tutor)
+        plans = self.plans(lambda: self.client.get('/api/petshops/nearby/', {'lat': -23.1, 'lng': -46.6, 'radius': 2}))
+        self.assertIn('petshop_lat_lng_idx (latitude>? AND latitude<?)', plans[0])
+
+
+class ConcurrentBookingTests(BookingFixtureMixin, TransactionTestCase):
+    def post_in_parallel(self, payloads):
+        barrier = threading.Barrier(len(payloads))
+        statuses = [None] * len(payloads)
+
+        def worker(index, payload):
+            client = APIClient()
+            client.force_authenticate(self.tutor)
+            try:
+                barrier.wait()
+                statuses[index] = client.post('/api/agendamentos/', payload, format='json').status_code
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=item) for item in enumerate(payloads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def payload(self, employee, hhmm):
+        return {
+            'pet_id': self.pet.pk, 'pet_shop_id': self.petshop.pk, 'service_id': self.service.pk,
+            'employee_id': employee.pk, 'appointment_time': aware(MONDAY, hhmm).isoformat(),
+        }
+
+    def test_only_one_of_many_parallel_bookings_wins(self):
+        statuses = self.post_in_parallel([self.payload(self.groomer, '09:00')] * 8)
+        self.assertEqual(statuses.count(201), 1, statuses)
+        self.assertEqual(statuses.count(400), 7, statuses)
+        self.assertEqual(Appointment.objects.filter(employee=self.groomer).count(), 1)
+
+    def test_non_conflicting_bookings_all_succeed(self):
+        payloads = [self.payload(self.groomer, '08:00'), self.payload(self.groomer, '10:00'),
+                    self.payload(self.groomer2, '08:00'), self.payload(self.groomer2, '10:00')]
+        self.assertEqual(self.post_in_parallel(payloads), [201] * 4)
+
+    def test_read_during_open_booking_transaction_is_not_cached(self):
+        booked, release = threading.Event(), threading.Event()
+
+        def writer():
+            try:
+                with transaction.atomic():
+                    self.book(self.groomer, MONDAY, '09:00')
+                    booked.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            self.assertTrue(booked.wait(10))
+            self.client.force_authenticate(self.tutor)
+            url = f'/api/petshops/{self.petshop.pk}/availability/'
+            params = {'date': MONDAY.isoformat(), 'service_id': self.service.pk}
+            # Antes do COMMIT a reserva ainda não aparece para outras conexões
+            self.assertIn('09:00', self.client.get(url, params).data)
+        finally:
+            release.set()
+            thread.join()
+        self.assertNotIn('09:00', self.client.get(url, params).data)
+
+
+class RecurrenceTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.parent = self.book(self.groomer, MONDAY, '09:00')
+        self.client.force_authenticate(self.owner)
+
+    def recur(self, end_date, **extra):
+        payload = {'frequency': 'WEEKLY', 'recurrence_end_date': end_date.isoformat()}
+        payload.update(extra)
+        return self.client.post(f'/api/agendamentos/{self.parent.pk}/create_recurrence/', payload, format='json')
+
+    def test_weekly_series_is_bulk_created_with_constant_queries(self):
+        with CaptureQueriesContext(connection) as short:
+            self.recur(MONDAY + timedelta(weeks=3))
+        Appointment.objects.filter(recurrence_parent=self.parent).delete()
+        with CaptureQueriesContext(connection) as long:
+            response = self.recur(MONDAY + timedelta(weeks=52))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.parent.recurrences.count(), 52)
+        self.assertLessEqual(len(long.captured_queries), len(short.captured_queries) + 1)
+        self.parent.refresh_from_db()
+        self.assertEqual((self.parent.frequency, self.parent.recurrence_end_date), ('WEEKLY', MONDAY + timedelta(weeks=52)))
+
+    def test_conflict_rejects_whole_series_and_lists_every_date(self):
+        self.book(self.groomer, MONDAY + timedelta(weeks=2), '09:30')
+        self.book(self.groomer, MONDAY + timedelta(weeks=4), '08:30')
+        response = self.recur(MONDAY + timedelta(weeks=5))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [conflict['date'] for conflict in response.data['conflicts']],
+            [(MONDAY + timedelta(weeks=2)).isoformat(), (MONDAY + timedelta(weeks=4)).isoformat()],
+        )
+        self.assertEqual(self.parent.recurrences.count(), 0)
+
+    def test_dry_run_reports_without_writing(self):
+        self.book(self.groomer, MONDAY + timedelta(weeks=1), '09:00')
+        response = self.recur(MONDAY + timedelta(weeks=2), dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['dates']), 2)
+        self.assertEqual(len(response.data['conflicts']), 1)
+        self.assertEqual(self.parent.recurrences.count(), 0)
+
+    def test_invalid_frequency(self):
+        self.assertEqual(self.recur(MONDAY + timedelta(weeks=2), frequency='DAILY').status_code, 400)
+
+    def test_series_invalidates_cached_availability(self):
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        next_week = {'date': (MONDAY + timedelta(weeks=1)).isoformat(), 'service_id': self.service.pk}
+        self.assertIn('09:00', self.client.get(url, next_week).data)
+        self.client.force_authenticate(self.owner)
+        self.recur(MONDAY + timedelta(weeks=1))
+        self.client.force_authenticate(self.tutor)
+        self.assertNotIn('09:00', self.client.get(url, next_week).data)
+
+
+@override_settings(RECURRENCE_HORIZON_WEEKS=2)
+class RuleRecurrenceTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        self.first_monday = today + timedelta(days=7 - today.weekday())
+        self.parent = self.book(self.groomer, self.first_monday, '09:00')
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(
+            f'/api/agendamentos/{self.parent.pk}/create_recurrence/', {'frequency': 'WEEKLY', 'mode': 'rule'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def monday(self, weeks):
+        return self.first_monday + timedelta(weeks=weeks)
+
+    def test_only_the_horizon_is_materialized(self):
+        self.parent.refresh_from_db()
+        self.assertEqual(self.parent.recurrence_materialized_until, timezone.localdate() + timedelta(weeks=2))
+        self.assertEqual(self.parent.recurrence_end_date, None)
+        self.assertLessEqual(self.parent.recurrences.count(), 2)
+
+    def test_virtual_occurrences_block_availability_and_bookings(self):
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        slots = self.client.get(url, {'date': self.monday(30).isoformat(), 'service_id': self.service.pk}).data
+        self.assertNotIn('09:00', slots)
+        self.assertIn('10:00', slots)
+        response = self.client.post('/api/agendamentos/', {
+            'pet_id': self.pet.pk, 'pet_shop_id': self.petshop.pk, 'service_id': self.service.pk,
+            'employee_id': self.groomer.pk, 'appointment_time': aware(self.monday(30), '09:30').isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_occurrences_listing_expands_virtual_rows(self):
+        response = self.client.get('/api/agendamentos/occurrences/', {
+            'start_date': self.monday(10).isoformat(), 'end_date': (self.monday(12) + timedelta(days=6)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(all(item['is_virtual'] and item['id'] is None for item in response.data))
+        self.assertEqual(response.data[0]['recurrence_parent'], self.parent.pk)
+
+    def test_materialize_command_advances_the_horizon(self):
+        self.book(self.groomer, self.monday(4), '09:30')
+        call_command('materialize_recurrences', weeks=6, stdout=StringIO(), stderr=StringIO())
+        self.parent.refresh_from_db()
+        self.assertEqual(self.parent.recurrence_materialized_until, timezone.localdate() + timedelta(weeks=6))
+        materialized = set(self.parent.recurrences.values_list('appointment_time', flat=True))
+        self.assertIn(aware(self.monday(5), '09:00'), materialized)
+        self.assertNotIn(aware(self.monday(4), '09:00'), materialized)
+        listed = self.client.get('/api/agendamentos/occurrences/', {
+            'start_date': self.monday(5).isoformat(), 'end_date': self.monday(7).isoformat(),
+        }).data
+        self.assertEqual([item['is_virtual'] for item in listed], [False, True, True])
+
+    def test_series_outlives_its_first_appointment(self):
+        self.parent.status = 'COMPLETED'
+        self.parent.save(update_fields=['status'])
+        listed = self.client.get('/api/agendamentos/occurrences/', {
+            'start_date': self.monday(10).isoformat(), 'end_date': self.monday(10).isoformat(),
+        }).data
+        self.assertEqual(len(listed), 1)
+        self.client.force_authenticate(self.tutor)
+        slots = self.client.get(f'/api/petshops/{self.petshop.pk}/availability/',
+                                {'date': self.monday(10).isoformat(), 'service_id': self.service.pk}).data
+        self.assertNotIn('09:00', slots)
+
+    def test_cancel_with_future_ends_the_series(self):
+        self.client.post(f'/api/agendamentos/{self.parent.pk}/cancel/', {'include_future': True}, format='json')
+        self.parent.refresh_from_db()
+        self.assertIsNone(self.parent.recurrence_materialized_until)
+        listed = self.client.get('/api/agendamentos/occurrences/', {
+            'start_date': self.monday(10).isoformat(), 'end_date': self.monday(12).isoformat(),
+        }).data
+        self.assertEqual(listed, [])
+
+    def test_materialize_does_not_revive_a_series_ended_meanwhile(self):
+        calls = []
+
+        def rule_parents(*args):
+            calls.append(args)
+            if len(calls) == 2:  # releitura com trava: o cancelamento chegou antes
+                recurrence.end_series([self.parent.pk])
+            return recurrence.rule_parents(*args)
+
+        before = self.parent.recurrences.count()
+        with patch('api.management.commands.materialize_recurrences.rule_parents', rule_parents):
+            call_command('materialize_recurrences', weeks=6, stdout=StringIO(), stderr=StringIO())
+        self.parent.refresh_from_db()
+        self.assertIsNone(self.parent.recurrence_materialized_until)
+        self.assertEqual(self.parent.recurrences.count(), before)
+
+    def test_materialize_skips_time_blocks(self):
+        TimeBlock.objects.create(employee=self.groomer, pet_shop=self.petshop,
+                                 start_time=aware(self.monday(4), '08:30'), end_time=aware(self.monday(4), '09:30'))
+        call_command('materialize_recurrences', weeks=6, stdout=StringIO(), stderr=StringIO())
+        materialized = set(self.parent.recurrences.values_list('appointment_time', flat=True))
+        self.assertNotIn(aware(self.monday(4), '09:00'), materialized)
+        self.assertIn(aware(self.monday(5), '09:00'), materialized)
+
+
+class BulkStatusTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.morning = [self.book(self.groomer, MONDAY, hhmm, status='PENDING') for hhmm in ('08:00', '09:00', '10:00')]
+        self.client.force_authenticate(self.owner)
+
+    def post(self, action, payload):
+        return self.client.post(f'/api/agendamentos/{action}/', payload, format='json')
+
+    def test_bulk_confirm_by_ids_reports_each_id(self):
+        done = self.book(self.groomer2, MONDAY, '08:00', status='CANCELLED')
+        ids = [appointment.pk for appointment in self.morning] + [done.pk, 999999]
+        response = self.post('bulk_confirm', {'ids': ids})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(response.data['skipped_ids'], [done.pk])
+        self.assertEqual(response.data['not_found_ids'], [999999])
+        self.assertEqual(Appointment.objects.filter(status='CONFIRMED').count(), 3)
+
+    def test_bulk_confirm_uses_constant_queries(self):
+        extra = [self.book(self.groomer, MONDAY + timedelta(days=1), '08:00', status='PENDING') for _ in range(10)]
+        self.client.get('/api/agendamentos/')  # aquece o cache de vínculos do dono
+        with CaptureQueriesContext(connection) as few:
+            self.post('bulk_confirm', {'ids': [self.morning[0].pk]})
+        with CaptureQueriesContext(connection) as many:
+            self.post('bulk_confirm', {'ids': [appointment.pk for appointment in self.morning[1:] + extra]})
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_tutor_cannot_bulk_confirm(self):
+        self.client.force_authenticate(self.tutor)
+        self.assertEqual(self.post('bulk_confirm', {'ids': [self.morning[0].pk]}).status_code, 403)
+        self.assertFalse(Appointment.objects.filter(status='CONFIRMED').exists())
+
+    def test_bulk_cancel_by_date_and_employee_frees_the_slots(self):
+        other = self.book(self.groomer2, MONDAY, '08:00')
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        self.assertNotIn('08:00', self.client.get(url, {'date': MONDAY.isoformat(), 'service_id': self.service.pk}).data)
+        response = self.post('bulk_cancel', {'date': MONDAY.isoformat(), 'employee_id': self.groomer.pk})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(sorted(response.data['updated_ids']), sorted(a.pk for a in self.morning))
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'PENDING')
+        self.assertIn('08:00', self.client.get(url, {'date': MONDAY.isoformat(), 'service_id': self.service.pk}).data)
+
+    def test_bulk_requires_ids_or_date(self):
+        self.assertEqual(self.post('bulk_cancel', {}).status_code, 400)
+
+    def test_bulk_rejects_non_numeric_employee(self):
+        response = self.post('bulk_cancel', {'date': MONDAY.isoformat(), 'employee_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Appointment.objects.filter(status='CANCELLED').exists())
+        self.assertEqual(self.post('bulk_cancel', {'ids': 'abc'}).status_code, 400)
+
+    def test_cancel_parent_with_include_future(self):
+        next_monday = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        parent = self.book(self.groomer, next_monday, '09:00')
+        children = [
+            self.book(self.groomer, next_monday + timedelta(weeks=weeks), '09:00', recurrence_parent=parent)
+            for weeks in (1, 2)
+        ]
+        response = self.client.post(f'/api/agendamentos/{parent.pk}/cancel/', {'include_future': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(Appointment.objects.filter(pk__in=[c.pk for c in children]).values_list('status', flat=True)),
+            {'CANCELLED'},
+        )
+        response = self.post('bulk_cancel', {'ids': [self.morning[0].pk], 'include_future': True})
+        self.assertEqual(response.data['future_cancelled'], 0)
+
+
+class MembershipPermissionTests(BookingFixtureMixin, TestCase):
+    def services_url(self, petshop=None):
+        return f'/api/petshops/{(petshop or self.petshop).pk}/services/'
+
+    def test_service_listing_reads_membership_once_then_from_cache(self):
+        self.client.force_authenticate(self.owner)
+        # vínculos + validadores (ETag) + COUNT + página + performers
+        with self.assertNumQueries(5):
+            self.assertEqual(self.client.get(self.services_url()).status_code, 200)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(self.services_url()).status_code, 200)
+
+    def test_manager_only_of_own_shop_and_no_console_output(self):
+        manager = User.objects.create_user('gerente', user_type='GERENTE', works_at=self.petshop)
+        other_shop = PetShop.objects.create(owner=self.owner, name='Outro')
+        self.client.force_authenticate(manager)
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            self.assertEqual(self.client.get(self.services_url()).status_code, 200)
+            self.assertEqual(self.client.get(self.services_url(other_shop)).status_code, 403)
+        self.assertEqual(stdout.getvalue(), '')
+        self.client.force_authenticate(self.groomer)
+        self.assertEqual(self.client.get(self.services_url()).status_code, 403)
+
+    def test_new_and_transferred_shops_invalidate_cached_ownership(self):
+        self.client.force_authenticate(self.owner)
+        self.client.get('/api/agendamentos/')
+        new_shop = PetShop.objects.create(owner=self.owner, name='Filial')
+        self.assertEqual(self.client.get(self.services_url(new_shop)).status_code, 200)
+        new_owner = User.objects.create_user('novo_dono', user_type='PROPRIETARIO')
+        new_shop.owner = new_owner
+        new_shop.save()
+        self.assertEqual(self.client.get(self.services_url(new_shop)).status_code, 403)
+
+    def test_team_can_open_appointment_but_other_tutor_cannot(self):
+        appointment = self.book(self.groomer, MONDAY, '09:00')
+        self.client.force_authenticate(self.groomer2)
+        self.assertEqual(self.client.get(f'/api/agendamentos/{appointment.pk}/').status_code, 200)
+        stranger = User.objects.create_user('outro_tutor', user_type='TUTOR')
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(f'/api/agendamentos/{appointment.pk}/').status_code, 404)
+
+
+class NearbyPetShopTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.petshop.delete()
+        self.paulista = PetShop.objects.create(owner=self.owner, name='Paulista', latitude='-23.561414', longitude='-46.655881')
+        self.pinheiros = PetShop.objects.create(owner=self.owner, name='Pinheiros', latitude='-23.567200', longitude='-46.692300')
+        self.santos = PetShop.objects.create(owner=self.owner, name='Santos', latitude='-23.960800', longitude='-46.333600')
+        PetShop.objects.create(owner=self.owner, name='Sem endereço')
+        self.client.force_authenticate(self.tutor)
+
+    def nearby(self, **params):
+        return self.client.get('/api/petshops/nearby/', params)
+
+    def test_haversine_known_distance(self):
+        # São Paulo (Sé) -> Rio de Janeiro (Centro): ~ 361 km
+        self.assertAlmostEqual(haversine_km(-23.5505, -46.6333, -22.9068, -43.1729), 361, delta=2)
+
+    def test_ranked_by_distance_within_radius(self):
+        with self.assertNumQueries(2):
+            response = self.nearby(lat=-23.5614, lng=-46.6559, radius=10)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data], ['Paulista', 'Pinheiros'])
+        self.assertLess(response.data[0]['distance_km'], 0.1)
+        self.assertAlmostEqual(response.data[1]['distance_km'], 3.8, delta=0.2)
+
+        wide = self.nearby(lat=-23.5614, lng=-46.6559, radius=80, limit=1).data
+        self.assertEqual([item['name'] for item in wide], ['Paulista'])
+        self.assertEqual(len(self.nearby(lat=-23.5614, lng=-46.6559, radius=80).data), 3)
+
+    def test_bounding_box_wraps_the_antimeridian(self):
+        fiji = PetShop.objects.create(owner=self.owner, name='Fiji', latitude='-17.000000', longitude='179.990000')
+        samoa = PetShop.objects.create(owner=self.owner, name='Samoa', latitude='-17.000000', longitude='-179.990000')
+        found = set(PetShop.objects.filter(bounding_box_filter(-17.0, 179.999, 5)).values_list('pk', flat=True))
+        self.assertEqual(found, {fiji.pk, samoa.pk})
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.nearby(lng=-46.6).status_code, 400)
+        self.assertEqual(self.nearby(lat=95, lng=-46.6).status_code, 400)
+        self.assertEqual(self.nearby(lat=-23.5, lng=-46.6, radius=5000).status_code, 400)
+        self.assertEqual(self.nearby(lat=-23.5, lng=-46.6, limit=0).status_code, 400)
+
+
+class RatingAggregateTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.done = [self.book(self.groomer, MONDAY + timedelta(weeks=w), '09:00', status='COMPLETED') for w in range(3)]
+
+    def review(self, appointment, rating):
+        return Review.objects.create(appointment=appointment, tutor=self.tutor, pet_shop=self.petshop, rating=rating)
+
+    def aggregates(self):
+        return PetShop.objects.values(*PetShop.RATING_FIELDS).get(pk=self.petshop.pk)
+
+    def test_signals_keep_average_count_and_histogram(self):
+        first = self.review(self.done[0], 5)
+        second = self.review(self.done[1], 4)
+        self.review(self.done[2], 4)
+        self.assertEqual(self.aggregates(), {
+            'rating_avg': 13 / 3, 'rating_count': 3,
+            'rating_1': 0, 'rating_2': 0, 'rating_3': 0, 'rating_4': 2, 'rating_5': 1,
+        })
+        second.rating = 1
+        second.save()
+        first.delete()
+        aggregates = self.aggregates()
+        self.assertEqual((aggregates['rating_avg'], aggregates['rating_count']), (2.5, 2))
+        self.assertEqual((aggregates['rating_1'], aggregates['rating_4'], aggregates['rating_5']), (1, 1, 0))
+        Review.objects.all().delete()
+        self.assertEqual((self.aggregates()['rating_avg'], self.aggregates()['rating_count']), (None, 0))
+
+    def test_stale_petshop_save_keeps_aggregates(self):
+        stale = PetShop.objects.get(pk=self.petshop.pk)
+        self.review(self.done[0], 5)
+        stale.name = 'Pet Feliz 2'
+        stale.save()
+        self.assertEqual(self.aggregates()['rating_count'], 1)
+
+    def test_rebuild_command_fixes_drift(self):
+        self.review(self.done[0], 3)
+        self.review(self.done[1], 5)
+        PetShop.objects.filter(pk=self.petshop.pk).update(rating_count=0, rating_avg=None, rating_3=7)
+        call_command('rebuild_ratings', stdout=StringIO())
+        aggregates = self.aggregates()
+        self.assertEqual((aggregates['rating_avg'], aggregates['rating_count'], aggregates['rating_3']), (4.0, 2, 1))
+
+    def test_listing_ordered_and_filtered_by_rating(self):
+        other = PetShop.objects.create(owner=self.owner, name='Outro')
+        unrated = PetShop.objects.create(owner=self.owner, name='Sem notas')
+        self.review(self.done[0], 3)
+        other_visit = self.book(self.groomer, MONDAY + timedelta(weeks=5), '09:00', status='COMPLETED', pet_shop=other)
+        Review.objects.create(appointment=other_visit, tutor=self.tutor, pet_shop=other, rating=5)
+        self.client.force_authenticate(self.tutor)
+        ids = [item['id'] for item in self.client.get('/api/petshops/', {'ordering': '-rating'}).data['results']]
+        self.assertEqual(ids, [other.pk, self.petshop.pk, unrated.pk])
+        filtered = self.client.get('/api/petshops/', {'min_rating': 4}).data['results']
+        self.assertEqual([(item['id'], item['rating_avg']) for item in filtered], [(other.pk, 5.0)])
+        self.assertEqual(self.client.get('/api/petshops/', {'ordering': 'owner'}).status_code, 400)
+
+    def test_review_endpoint_sets_tutor_and_petshop(self):
+        self.client.force_authenticate(self.tutor)
+        response = self.client.post('/api/avaliacoes/', {'appointment': self.done[0].pk, 'rating': 5}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['tutor'], response.data['pet_shop']), (self.tutor.pk, self.petshop.pk))
+        self.assertEqual(self.aggregates()['rating_count'], 1)
+        self.assertEqual(
+            self.client.post('/api/avaliacoes/', {'appointment': self.done[1].pk, 'rating': 6}, format='json').status_code, 400
+        )
+        pending = self.book(self.groomer, MONDAY + timedelta(weeks=6), '09:00')
+        self.assertEqual(
+            self.client.post('/api/avaliacoes/', {'appointment': pending.pk, 'rating': 4}, format='json').status_code, 400
+        )
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(
+            self.client.post('/api/avaliacoes/', {'appointment': self.done[1].pk, 'rating': 1}, format='json').status_code, 400
+        )
+        self.assertEqual(self.client.delete(f"/api/avaliacoes/{response.data['id']}/").status_code, 404)
+
+
+class AgendaTests(BookingFixtureMixin, TestCase):
+    def agenda(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/agendamentos/agenda/', params)
+
+    def test_employee_sees_own_day_as_single_timeline(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        self.book(self.groomer, MONDAY, '14:00', status='CANCELLED')
+        self.book(self.groomer2, MONDAY, '10:00')
+        TimeBlock.objects.create(
+            employee=self.groomer, pet_shop=self.petshop, start_time=aware(MONDAY, '15:00'), end_time=aware(MONDAY, '16:00'),
+            reason='Consulta',
+        )
+        with self.assertNumQueries(4):
+            response = self.agenda(self.groomer, date=MONDAY.isoformat())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([employee['employee_id'] for employee in response.data['employees']], [self.groomer.pk])
+        day = response.data['employees'][0]['days'][0]
+        timeline = [(item['type'], item['start'].strftime('%H:%M'), item['end'].strftime('%H:%M')) for item in day['timeline']]
+        self.assertEqual(timeline, [
+            ('free', '08:00', '09:00'),
+            ('appointment', '09:00', '10:00'),
+            ('free', '10:00', '12:00'),
+            ('free', '13:00', '15:00'),
+            ('time_block', '15:00', '16:00'),
+            ('free', '16:00', '17:00'),
+        ])
+        self.assertEqual((day['working_minutes'], day['free_minutes']), (480, 360))
+
+    def test_owner_sees_whole_shop_and_tutor_is_refused(self):
+        self.book(self.groomer2, MONDAY, '10:00')
+        response = self.agenda(self.owner, start_date=MONDAY.isoformat(), end_date=(MONDAY + timedelta(days=1)).isoformat())
+        self.assertEqual([employee['employee_id'] for employee in response.data['employees']], [self.groomer.pk, self.groomer2.pk])
+        self.assertEqual(len(response.data['employees'][0]['days']), 2)
+        self.assertEqual(response.data['employees'][0]['days'][1]['timeline'], [])  # terça: folga
+        self.assertEqual(self.agenda(self.tutor, date=MONDAY.isoformat()).status_code, 403)
+        self.assertEqual(self.agenda(self.owner, date='04/08/2025').status_code, 400)
+
+    def test_query_count_does_not_grow_with_range_or_team(self):
+        with CaptureQueriesContext(connection) as small:
+            self.agenda(self.owner, employee_id=self.groomer.pk, date=MONDAY.isoformat())
+        for offset in range(14):
+            self.book(self.groomer if offset % 2 else self.groomer2, MONDAY + timedelta(days=offset), '09:00')
+        with CaptureQueriesContext(connection) as large:
+            response = self.agenda(self.owner, start_date=MONDAY.isoformat(), end_date=(MONDAY + timedelta(days=13)).isoformat())
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(large.captured_queries), len(small.captured_queries))
+
+
+class ListFilterTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.service.performers.add(self.groomer2)
+        self.appointments = [
+            self.book(employee, MONDAY + timedelta(weeks=week), '09:00', status=status)
+            for week, (employee, status) in enumerate([
+                (self.groomer, 'CONFIRMED'), (self.groomer, 'PENDING'), (self.groomer2, 'CONFIRMED'),
+                (self.groomer, 'CONFIRMED'), (self.groomer, 'CANCELLED'),
+            ])
+        ]
+        for week in range(3):
+            TimeBlock.objects.create(
+                employee=self.groomer2 if week == 1 else self.groomer, pet_shop=self.petshop,
+                start_time=aware(MONDAY + timedelta(weeks=week), '15:00'),
+                end_time=aware(MONDAY + timedelta(weeks=week), '16:00'),
+            )
+        self.client.force_authenticate(self.owner)
+        self.client.get('/api/agendamentos/')  # aquece o cache de vínculos do dono
+
+    def ids(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [item['id'] for item in response.data['results']]
+
+    def test_appointment_filters(self):
+        week = lambda n: (MONDAY + timedelta(weeks=n)).isoformat()  # noqa: E731
+        with self.assertNumQueries(1):
+            found = self.ids('/api/agendamentos/', status='CONFIRMED', employee=self.groomer.pk,
+                             start_date=week(0), end_date=week(3))
+        self.assertEqual(found, [self.appointments[0].pk, self.appointments[3].pk])
+        self.assertEqual(self.ids('/api/agendamentos/', status='pending,cancelled'),
+                         [self.appointments[1].pk, self.appointments[4].pk])
+        self.assertEqual(len(self.ids('/api/agendamentos/', service=self.service.pk, pet=self.pet.pk)), 5)
+        self.assertEqual(self.ids('/api/agendamentos/', recurrence_parent=self.appointments[0].pk), [])
+        self.assertEqual(self.ids('/api/agendamentos/', ordering='-appointment_time', page_size=2),
+                         [self.appointments[4].pk, self.appointments[3].pk])
+
+    def test_invalid_filters_are_rejected(self):
+        for params in ({'status': 'DONE'}, {'employee': 'abc'}, {'start_date': '2025-13-01'}, {'ordering': 'status'}):
+            self.assertEqual(self.client.get('/api/agendamentos/', params).status_code, 400, params)
+        self.assertEqual(self.client.get('/api/bloqueios/', {'ordering': 'employee'}).status_code, 400)
+
+    def test_time_block_filters(self):
+        blocks = list(TimeBlock.objects.order_by('start_time').values_list('pk', flat=True))
+        self.assertEqual(self.ids('/api/bloqueios/', employee=self.groomer.pk), [blocks[0], blocks[2]])
+        self.assertEqual(self.ids('/api/bloqueios/', start_date=(MONDAY + timedelta(weeks=1)).isoformat(),
+                                  ordering='-start_time'), [blocks[2], blocks[1]])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Os planos verificados são do SQLite.')
+    def test_filters_use_composite_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        def plan(url, **params):
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(url, params)
+            sql = captured.captured_queries[-1]['sql']
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+        day = MONDAY.isoformat()
+        # Funcionário + período: qualquer um dos índices (X, horário) percorrido como faixa
+        self.assertRegex(
+            plan('/api/agendamentos/', employee=self.groomer.pk, start_date=day, end_date=day),
+            r'SEARCH api_appointment USING INDEX appt_(employee|shop)_time_idx '
+            r'\((employee|pet_shop)_id=\? AND appointment_time>\? AND appointment_time<\?\)',
+        )
+        self.assertIn('appt_shop_time_idx',
+                      plan('/api/agendamentos/', status='CONFIRMED', start_date=day))
+        self.client.force_authenticate(self.tutor)
+        self.assertIn('appt_tutor_time_idx (tutor_id=? AND appointment_time>?)',
+                      plan('/api/agendamentos/', start_date=day))
+        self.client.force_authenticate(self.groomer)
+        self.assertIn('timeblock_shop_start_idx', plan('/api/bloqueios/', start_date=day))
+
+
+class ConditionalRequestTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+        self.services_url = f'/api/petshops/{self.petshop.pk}/services/'
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_service_catalog_returns_304_until_it_changes(self):
+        first = self.client.get(self.services_url)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Last-Modified', first)  # listagens: só ETag
+        with self.assertNumQueries(1):  # só a agregação; vínculos já em cache
+            again = self.revalidate(self.services_url, first)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+
+        self.service.performers.add(self.groomer2)
+        changed = self.revalidate(self.services_url, first)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.data['results'][0]['performers']), 2)
+
+        self.groomer2.first_name = 'Ana'
+        self.groomer2.save()
+        self.assertEqual(self.revalidate(self.services_url, changed).status_code, 200)
+
+    def test_service_detail_and_deletion(self):
+        url = f'{self.services_url}{self.service.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        Service.objects.filter(pk=self.service.pk).update(name='Tosa', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+        listing = self.client.get(self.services_url)
+        Service.objects.create(pet_shop=self.petshop, name='Hidratação', base_price='30.00')
+        self.assertEqual(self.revalidate(self.services_url, listing).status_code, 200)
+
+    def test_petshop_list_changes_with_ratings_and_query_string(self):
+        self.client.force_authenticate(self.tutor)
+        first = self.client.get('/api/petshops/')
+        self.assertEqual(self.revalidate('/api/petshops/', first).status_code, 304)
+        self.assertEqual(self.revalidate('/api/petshops/', first, fields='id').status_code, 200)
+        visit = self.book(self.groomer, MONDAY, '09:00', status='COMPLETED')
+        Review.objects.create(appointment=visit, tutor=self.tutor, pet_shop=self.petshop, rating=5)
+        self.assertEqual(self.revalidate('/api/petshops/', first).status_code, 200)
+
+    def test_list_ignores_if_modified_since_after_deletion(self):
+        extra = Service.objects.create(pet_shop=self.petshop, name='Hidratação', base_price='30.00')
+        since = http_date(timezone.now().timestamp() + 60)
+        extra.delete()
+        response = self.client.get(self.services_url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_petshop_detail_if_modified_since(self):
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get('/api/petshops/999999/').status_code, 404)
+
+    def test_permissions_checked_before_304(self):
+        first = self.client.get(self.services_url)
+        self.client.force_authenticate(self.tutor)
+        self.assertEqual(self.revalidate(self.services_url, first).status_code, 403)
+
+
+class RequestMetricsTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.admin = User.objects.create_superuser('admin', is_staff=True)
+
+    def test_server_timing_and_per_action_metrics(self):
+        self.client.force_authenticate(self.tutor)
+        url = f'/api/petshops/{self.petshop.pk}/availability/'
+        for _ in range(3):
+            response = self.client.get(url, {'date': MONDAY.isoformat(), 'service_id': self.service.pk})
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+        self.client.force_authenticate(self.admin)
+        data = self.client.get('/api/metrics/').data
+        entry = data['PetShopViewSet.availability']
+        self.assertEqual(entry['count'], 3)
+        self.assertEqual(sum(entry['latency_ms'].values()), 3)
+        self.assertGreater(entry['max_queries'], 0)
+        self.assertEqual(self.client.delete('/api/metrics/').status_code, 204)
+        self.assertNotIn('PetShopViewSet.availability', self.client.get('/api/metrics/').data)
+
+    def test_query_count_matches_the_request(self):
+        appointment = self.book(self.groomer, MONDAY, '09:00')
+        self.client.force_authenticate(self.owner)
+        with CaptureQueriesContext(connection) as captured:
+            self.client.post(f'/api/agendamentos/{appointment.pk}/confirm/')
+        entry = metrics.snapshot()['AppointmentViewSet.confirm']
+        self.assertEqual(entry['max_queries'], len(captured.captured_queries))
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_streamed_queries_count_for_the_request(self):
+        self.book(self.groomer, MONDAY, '09:00')
+        self.client.force_authenticate(self.owner)
+        response = self.client.get('/api/agendamentos/export/')
+        self.assertNotIn('AppointmentViewSet.export', metrics.snapshot())
+        self.assertNotIn('Server-Timing', response)
+        with CaptureQueriesContext(connection) as streamed:
+            b''.join(response.streaming_content)
+        self.assertGreater(len(streamed.captured_queries), 0)
+        entry = metrics.snapshot()['AppointmentViewSet.export']
+        self.assertEqual(entry['count'], 1)
+        self.assertGreaterEqual(entry['max_queries'], len(streamed.captured_queries))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    def test_slow_query_log(self):
+        self.client.force_authenticate(self.tutor)
+        with self.assertLogs('api.slow_queries', level='WARNING') as logs:
+            self.client.get('/api/pets/')
+        self.assertIn('PetViewSet.list', logs.output[0])
+
+
+class AppointmentExportTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.book(self.groomer, MONDAY, '09:00', client_name='Ana, "Aninha"')
+        self.book(self.groomer2, MONDAY + timedelta(days=7), '10:00', status='CANCELLED')
+        other_owner = User.objects.create_user('outro', user_type='PROPRIETARIO')
+        other = PetShop.objects.create(owner=other_owner, name='Outro')
+        Appointment.objects.create(
+            tutor=self.tutor, pet=self.pet, pet_shop=other, appointment_time=aware(MONDAY, '11:00'), total_price='10.00',
+        )
+        self.client.force_authenticate(self.owner)
+
+    def export(self, **params):
+        response = self.client.get('/api/agendamentos/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_own_shop_rows_in_order(self):
+        rows = list(csv.reader(StringIO(self.export())))
+        self.assertEqual(rows[0][:5], ['id', 'appointment_time', 'end_time', 'status', 'total_price'])
+        self.assertEqual(len(rows), 3)
+        first = dict(zip(rows[0], rows[1]))
+        self.assertEqual(first['id'], str(self.first.pk))
+        self.assertEqual(first['total_price'], '50.00')
+        self.assertEqual((first['service'], first['employee'], first['pet']), ('Banho', 'tosador', 'Rex'))
+        self.assertEqual(first['client_name'], 'Ana, "Aninha"')
+        self.assertEqual(first['appointment_time'], timezone.localtime(self.first.appointment_time).isoformat())
+
+    def test_ndjson_with_filters(self):
+        lines = self.export(output='ndjson', status='CANCELLED').splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual((row['status'], row['employee_id'], row['pet']), ('CANCELLED', self.groomer2.pk, 'Rex'))
+        self.assertEqual(self.export(output='ndjson', end_date=MONDAY.isoformat()).count('\n'), 1)
+        self.assertEqual(self.client.get('/api/agendamentos/export/', {'output': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/agendamentos/export/', {'status': 'X'}).status_code, 400)
+
+    def test_rows_are_read_in_chunks_with_constant_queries(self):
+        for week in range(2, 8):
+            self.book(self.groomer, MONDAY + timedelta(days=7 * week), '09:00')
+        with patch('api.export.EXPORT_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as captured:
+            content = self.export()
+        self.assertEqual(content.count('\n'), 9)
+        self.assertEqual(sum('"api_appointment"' in query['sql'] for query in captured.captured_queries), 1)
+
+
+class AnalyticsTests(BookingFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.book(self.groomer, MONDAY, '09:00', status='COMPLETED', total_price='80.00')
+        self.book(self.groomer, MONDAY, '10:00', status='CONFIRMED', minutes=30)
+        self.book(self.groomer2, MONDAY, '10:00', status='PENDING')
+        self.book(self.groomer2, MONDAY, '14:00', status='CANCELLED')
+        self.url = f'/api/petshops/{self.petshop.pk}/analytics/'
+        self.params = {'start_date': MONDAY.isoformat(), 'end_date': (MONDAY + timedelta(days=1)).isoformat()}
+
+    def report(self, user=None, **params):
+        self.client.force_authenticate(user or self.owner)
+        return self.client.get(self.url, params or self.params)
+
+    def test_revenue_services_and_utilization(self):
+        data = self.report().data
+        self.assertEqual((data['revenue'], data['appointments']), ('130.00', 3))
+        self.assertEqual(data['daily'], [
+            {'date': MONDAY, 'revenue': '130.00', 'appointments': 3},
+            {'date': MONDAY + timedelta(days=1), 'revenue': '0.00', 'appointments': 0},
+        ])
+        self.assertEqual(data['services'], [
+            {'service_id': self.service.pk, 'name': 'Banho', 'appointments': 3, 'revenue': '130.00'},
+        ])
+        # Segunda: 8h de expediente; terça: folga
+        self.assertEqual(data['employees'], [
+            {'employee_id': self.groomer.pk, 'username': 'tosador', 'booked_minutes': 90,
+             'available_minutes': 480, 'utilization': 0.1875},
+            {'employee_id': self.groomer2.pk, 'username': 'tosador2', 'booked_minutes': 60,
+             'available_minutes': 480, 'utilization': 0.125},
+        ])
+
+    def test_closed_days_are_cached_and_invalidated(self):
+        self.report()
+        with self.assertNumQueries(2):  # pet shop e equipe; os dias vêm do cache
+            self.report()
+        appointment = self.book(self.groomer2, MONDAY, '15:00', status='CONFIRMED', total_price='20.00')
+        self.assertEqual(self.report().data['revenue'], '150.00')
+
+        self.client.force_authenticate(self.owner)
+        self.client.post('/api/agendamentos/bulk_cancel/', {'ids': [appointment.pk]}, format='json')
+        self.assertEqual(self.report().data['revenue'], '130.00')
+
+    def test_read_before_commit_does_not_stick(self):
+        self.report()
+        appointment = Appointment.objects.get(status='PENDING')
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = 'COMPLETED'
+            appointment.save(update_fields=['status'])
+            # Leitura de outra conexão antes do COMMIT: ainda via os totais antigos
+            cache.set(analytics._day_key(self.petshop.pk, MONDAY), [])
+        self.assertEqual(self.report().data['revenue'], '180.00')
+
+    def test_recurrence_invalidates_closed_days(self):
+        next_week = {'start_date': (MONDAY + timedelta(weeks=1)).isoformat(),
+                     'end_date': (MONDAY + timedelta(weeks=1)).isoformat()}
+        self.assertEqual(self.report(**next_week).data['appointments'], 0)
+        parent = Appointment.objects.get(employee=self.groomer, appointment_time=aware(MONDAY, '09:00'))
+        response = self.client.post(f'/api/agendamentos/{parent.pk}/create_recurrence/', {
+            'frequency': 'WEEKLY', 'recurrence_end_date': (MONDAY + timedelta(weeks=1)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.report(**next_week).data['appointments'], 1)
+
+    def test_today_is_not_cached(self):
+        today = timezone.localdate()
+        self.report(start_date=today.isoformat(), end_date=today.isoformat())
+        with CaptureQueriesContext(connection) as captured:
+            self.report(start_date=today.isoformat(), end_date=today.isoformat())
+        self.assertEqual(len(captured.captured_queries), 3)
+
+    def test_permissions_and_validation(self):
+        self.assertEqual(self.report(self.groomer).status_code, 403)
+        self.assertEqual(self.report(self.tutor).status_code, 403)
+        manager = User.objects.create_user('gerente', user_type='GERENTE', works_at=self.petshop)
+        self.assertEqual(self.report(manager).status_code, 200)
+        self.assertEqual(self.report(start_date='2025-02-01', end_date='2025-01-01').status_code, 400)
+        self.assertEqual(self.report(start_date='01/02/2025').status_code, 400)
+
+
+class DailyShopStatsTests(BookingFixtureMixin, TransactionTestCase):
+    """TransactionTestCase: o resumo é gravado no COMMIT de cada alteração."""
+
+    def stats(self, day=MONDAY, petshop=None):
+        return DailyShopStats.objects.filter(pet_shop=petshop or self.petshop, date=day).first()
+
+    def counters(self, day=MONDAY):
+        row = self.stats(day)
+        return row and (str(row.revenue), row.pending_count, row.confirmed_count, row.completed_count,
+                        row.cancelled_count, row.review_count, row.rating_sum)
+
+    def test_signals_keep_the_day_current(self):
+        appointment = self.book(self.groomer, MONDAY, '09:00', status='CONFIRMED', total_price='80.00')
+        self.book(self.groomer2, MONDAY, '10:00')
+        self.assertEqual(self.counters(), ('80.00', 1, 1, 0, 0, 0, 0))
+
+        appointment.status = 'COMPLETED'
+        appointment.total_price = '90.00'
+        with CaptureQueriesContext(connection) as captured:
+            appointment.save(update_fields=['status', 'total_price'])
+        rollup_queries = [query['sql'] for query in captured.captured_queries if 'api_dailyshopstats' in query['sql']]
+        # INSERT que ignora o dia existente e um UPDATE com F(), sem reler o dia
+        self.assertEqual([sql.split()[0] for sql in rollup_queries], ['INSERT', 'UPDATE'])
+        self.assertEqual(self.counters(), ('90.00', 1, 0, 1, 0, 0, 0))
+
+        appointment.appointment_time = aware(MONDAY + timedelta(days=7), '09:00')
+        appointment.save()
+        self.assertEqual(self.counters(), ('0.00', 1, 0, 0, 0, 0, 0))
+        self.assertEqual(self.counters(MONDAY + timedelta(days=7)), ('90.00', 0, 0, 1, 0, 0, 0))
+
+        Review.objects.create(appointment=appointment, tutor=self.tutor, pet_shop=self.petshop, rating=4)
+        today = self.stats(timezone.localdate())
+        self.assertEqual((today.review_count, today.rating_avg), (1, 4))
+        appointment.delete()  # leva a avaliação junto
+        self.assertEqual(self.counters(MONDAY + timedelta(days=7)), ('0.00', 0, 0, 0, 0, 0, 0))
+        self.assertEqual(self.stats(timezone.localdate()).review_count, 0)
+
+    def test_rollup_is_written_on_commit(self):
+        with transaction.atomic():
+            self.book(self.groomer, MONDAY, '09:00')
+            self.book(self.groomer2, MONDAY, '09:00')
+            self.assertIsNone(self.stats())
+        self.assertEqual(self.counters(), ('0.00', 2, 0, 0, 0, 0, 0))
+
+    def test_day_missing_from_the_rollup_never_goes_negative(self):
+        appointment = self.book(self.groomer, MONDAY, '09:00')
+        DailyShopStats.objects.all().delete()  # dia anterior ao backfill
+        appointment.status = 'CANCELLED'
+        appointment.save(update_fields=['status'])
+        self.assertEqual(self.counters(), ('0.00', 0, 0, 0, 1, 0, 0))
+
+    def test_bulk_paths_refresh_the_rollup(self):
+        first = self.book(self.groomer, MONDAY, '09:00', total_price='40.00')
+        second = self.book(self.groomer2, MONDAY, '09:00', total_price='60.00')
+        self.client.force_authenticate(self.owner)
+        self.client.post('/api/agendamentos/bulk_confirm/', {'ids': [first.pk, second.pk]}, format='json')
+        self.assertEqual(self.counters(), ('100.00', 0, 2, 0, 0, 0, 0))
+        self.client.post('/api/agendamentos/bulk_cancel/', {'ids': [first.pk]}, format='json')
+        self.assertEqual(self.counters(), ('60.00', 0, 1, 0, 1, 0, 0))
+
+    def test_backfill_matches_incremental_updates_in_chunks(self):
+        for week in range(6):
+            self.book(self.groomer, MONDAY + timedelta(days=7 * week), '09:00', status='COMPLETED')
+            self.book(self.groomer2, MONDAY + timedelta(days=7 * week), '09:00', status='CANCELLED')
+        expected = sorted(DailyShopStats.objects.values_list('date', 'revenue', 'completed_count', 'cancelled_count'))
+        # Carga feita por fora dos sinais
+        DailyShopStats.objects.all().delete()
+        Appointment.objects.filter(pk=Appointment.objects.order_by('pk').first().pk).update(total_price='10.00')
+        expected[0] = (expected[0][0], Decimal('10.00'), *expected[0][2:])
+
+        out = StringIO()
+        call_command('backfill_shop_stats', '--chunk-days', '10', stdout=out)
+        self.assertEqual(out.getvalue().count(' a '), 5)  # 36 dias em blocos de 10
+        self.assertEqual(
+            sorted(DailyShopStats.objects.values_list('date', 'revenue', 'completed_count', 'cancelled_count')), expected
+        )
+
+    def test_petshop_deletion_cascades(self):
+        appointment = self.book(self.groomer, MONDAY, '09:00', status='COMPLETED')
+        Review.objects.create(appointment=appointment, tutor=self.tutor, pet_shop=self.petshop, rating=5)
+        self.petshop.delete()
+        self.assertFalse(DailyShopStats.objects.exists())
+
+    def test_dashboard_reads_only_rollups(self):
+        other = PetShop.objects.create(owner=self.owner, name='Filial')
+        self.book(self.groomer, MONDAY, '09:00', status='COMPLETED', total_price='70.00')
+        Appointment.objects.create(
+            tutor=self.tutor, pet=self.pet, pet_shop=other, appointment_time=aware(MONDAY, '11:00'),
+            status='CONFIRMED', total_price='30.00',
+        )
+        params = {'start_date': (MONDAY - timedelta(days=1)).isoformat(), 'end_date': MONDAY.isoformat()}
+        self.client.force_authenticate(self.owner)
+        with CaptureQueriesContext(connection) as captured:
+            data = self.client.get('/api/petshops/stats/', params).data
+        self.assertFalse(any('"api_appointment"' in query['sql'] for query in captured.captured_queries))
+        self.assertEqual([(shop['name'], shop['revenue'], shop['appointments']) for shop in data['shops']],
+                         [('Pet Feliz', '70.00', 1), ('Filial', '30.00', 1)])
+        self.assertEqual([(day['date'], day['revenue']) for day in data['daily']], [(MONDAY, '100.00')])
+
+        only = self.client.get('/api/petshops/stats/', {**params, 'pet_shop': other.pk}).data
+        self.assertEqual([shop['pet_shop_id'] for shop in only['shops']], [other.pk])
+        self.client.force_authenticate(self.groomer)
+        self.assertEqual(self.client.get('/api/petshops/stats/', params).status_code, 403)
+        stranger = User.objects.create_user('estranho', user_type='PROPRIETARIO')
+        PetShop.objects.create(owner=stranger, name='Outra')
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get('/api/petshops/stats/', {'pet_shop': other.pk}).status_code, 403)
@@ -1,7 +1,9 @@
 # api/urls.py
 from django.urls import path, include
 from rest_framework_nested import routers
-from .views import PetShopViewSet, ServiceViewSet, PetViewSet, AppointmentViewSet, TimeBlockViewSet
+from .views import (
+    PetShopViewSet, ServiceViewSet, PetViewSet, AppointmentViewSet, TimeBlockViewSet, ReviewViewSet, MetricsView
+)
 
 # 1. Router principal (pai)
 router = routers.DefaultRouter()
@@ -9,6 +11,7 @@ router.register(r'petshops', PetShopViewSet, basename='petshop')
 router.register(r'pets', PetViewSet, basename='pet')
 router.register(r'agendamentos', AppointmentViewSet, basename='appointment')
 router.register(r'bloqueios', TimeBlockViewSet, basename='timeblock')
+router.register(r'avaliacoes', ReviewViewSet, basename='review')
 
 # 2. Router aninhado (filho) para os serviços
 petshops_router = routers.NestedDefaultRouter(router, r'petshops', lookup='petshop')
@@ -16,6 +19,7 @@ petshops_router.register(r'services', ServiceViewSet, basename='petshop-services
 
 # 3. Lista final de URLs, incluindo ambos os routers
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
     path('', include(petshops_router.urls)),
 ]
\ No newline at end of file
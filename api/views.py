@@ -1,128 +1,272 @@
 # api/views.py
+from contextlib import contextmanager
 from datetime import timedelta, datetime
 from rest_framework import viewsets, permissions, serializers, status
+from rest_framework.views import APIView
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from dateutil.relativedelta import relativedelta
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.core.exceptions import ValidationError as DjangoValidationError
 
-from .models import User, PetShop, Service, Pet, Appointment, Review, TimeBlock
+from .models import OVERLAP_CONSTRAINT, User, PetShop, Service, Pet, Appointment, Review, TimeBlock
 from .serializers import (
-    PetShopSerializer, ServiceSerializer, PetSerializer, AppointmentSerializer, 
-    TimeBlockSerializer, ReviewSerializer
+    PetShopSerializer, PetShopListSerializer, NearbyPetShopSerializer, ServiceSerializer, PetSerializer,
+    AppointmentSerializer, AppointmentListSerializer, TimeBlockSerializer, ReviewSerializer
 )
+from .pagination import AppointmentCursorPagination, TimeBlockCursorPagination
+from .recurrence import (
+    STEPS as RECURRENCE_STEPS, build_occurrence, end_series, horizon_date, occurrence_times, rule_parents,
+    virtual_busy_rows, virtual_occurrences
+)
+from .agenda import build_agenda
+from .conditional import ConditionalGetMixin
+from .filters import filter_appointments, filter_time_blocks
+from .membership import get_membership
 from .permissions import CanManagePetShop, IsAppointmentOwnerOrPetShopOwner
+from . import analytics, availability_cache, export, geo, metrics, rollups
+from .availability import (
+    MAX_BOOKING_SPAN, BusyIndex, day_bounds, format_slots, load_busy_rows, performer_slots_by_day, pick_performer,
+    service_total_minutes, to_day_minutes
+)
+
+
+def _is_true(value):
+    return str(value).lower() in ('1', 'true')
+
+
+def _csv_param(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
 
 
-class PetShopViewSet(viewsets.ModelViewSet):
-    queryset = PetShop.objects.all()
+def parse_report_range(params, max_days, default_days):
+    """`start_date`/`end_date` dos relatórios; por padrão os últimos `default_days` dias até hoje."""
+    try:
+        end_day = datetime.strptime(params['end_date'], '%Y-%m-%d').date() if params.get('end_date') else timezone.localdate()
+        start_day = (
+            datetime.strptime(params['start_date'], '%Y-%m-%d').date() if params.get('start_date')
+            else end_day - timedelta(days=default_days - 1)
+        )
+    except ValueError:
+        raise ParseError('start_date e end_date devem estar no formato AAAA-MM-DD.')
+    if end_day < start_day or (end_day - start_day).days >= max_days:
+        raise ParseError(f'O intervalo deve ter entre 1 e {max_days} dias.')
+    return start_day, end_day
+
+
+class SparseFieldsetViewMixin:
+    """
+    Listagens usam `list_serializer_class` (enxuto) e leituras aceitam
+    `?fields=a,b` e `?expand=relacao` (ver serializers.SparseFieldsetMixin).
+    """
+    list_serializer_class = None
+    list_actions = ('list',)
+
+    def is_list_mode(self):
+        return self.action in self.list_actions and self.list_serializer_class is not None
+
+    def requested_expand(self):
+        if self.request is None or self.request.method not in permissions.SAFE_METHODS:
+            return []
+        return _csv_param(self.request.query_params.get('expand'))
+
+    def get_serializer_class(self):
+        if self.is_list_mode():
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request is not None and self.request.method in permissions.SAFE_METHODS:
+            context['fields'] = _csv_param(self.request.query_params.get('fields'))
+            context['expand'] = self.requested_expand()
+        return context
+
+
+class PetShopViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    queryset = PetShop.objects.order_by('id')
     serializer_class = PetShopSerializer
+    list_serializer_class = PetShopListSerializer
     permission_classes = [IsAuthenticated]
 
+    # ?ordering= aceito na listagem; sem avaliações (nota nula) vão para o fim.
+    ORDERINGS = {
+        'rating': (F('rating_avg').asc(nulls_last=True), 'rating_count', 'id'),
+        '-rating': (F('rating_avg').desc(nulls_last=True), '-rating_count', 'id'),
+        'rating_count': ('rating_count', 'id'),
+        '-rating_count': ('-rating_count', 'id'),
+        'name': ('name', 'id'),
+    }
+
+    MAX_AVAILABILITY_RANGE_DAYS = 31
+    DEFAULT_NEARBY_RADIUS_KM = 5
+    MAX_NEARBY_RADIUS_KM = 100
+    DEFAULT_NEARBY_LIMIT = 20
+    MAX_NEARBY_LIMIT = 100
+
+    def get_queryset(self):
+        """Na listagem aceita `ordering`, `min_rating` e `min_reviews`."""
+        petshops = super().get_queryset()
+        if self.action != 'list':
+            return petshops
+        params = self.request.query_params
+        try:
+            if params.get('min_rating'):
+                petshops = petshops.filter(rating_avg__gte=float(params['min_rating']))
+            if params.get('min_reviews'):
+                petshops = petshops.filter(rating_count__gte=int(params['min_reviews']))
+        except ValueError:
+            raise ParseError('min_rating e min_reviews devem ser numéricos.')
+        ordering = params.get('ordering')
+        if ordering:
+            if ordering not in self.ORDERINGS:
+                raise ParseError(f'ordering deve ser um de: {", ".join(self.ORDERINGS)}.')
+            petshops = petshops.order_by(*self.ORDERINGS[ordering])
+        return petshops
+
     @action(detail=True, methods=['get'])
     def availability(self, request, pk=None):
+        """
+        Horários livres de um serviço. Aceita um único dia (`date`) ou um
+        intervalo (`start_date` e `end_date`); no modo intervalo a resposta é
+        um mapa {data: [horários]} calculado com uma consulta por modelo.
+        Com `by_performer=true` cada horário traz os IDs dos funcionários livres.
+        """
         petshop = self.get_object()
         date_str = request.query_params.get('date')
+        start_date_str = request.query_params.get('start_date')
+        end_date_str = request.query_params.get('end_date')
         service_id = request.query_params.get('service_id')
+        by_performer = request.query_params.get('by_performer', '').lower() in ('1', 'true')
+        is_range = not date_str and bool(start_date_str or end_date_str)
 
-        if not date_str or not service_id:
+        if not service_id or not (date_str or (start_date_str and end_date_str)):
             return Response(
-                {'detail': 'A data (no formato AAAA-MM-DD) e o ID do serviço (service_id) são obrigatórios.'},
+                {'detail': 'A data (no formato AAAA-MM-DD) ou o intervalo (start_date e end_date) e o ID do serviço (service_id) são obrigatórios.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            day = datetime.strptime(date_str, '%Y-%m-%d').date()
+            if is_range:
+                start_day = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+                end_day = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+            else:
+                start_day = end_day = datetime.strptime(date_str, '%Y-%m-%d').date()
             service = Service.objects.get(pk=service_id, pet_shop=petshop)
         except (ValueError, Service.DoesNotExist):
             return Response({'detail': 'Data inválida ou serviço não encontrado neste pet shop.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        performers = service.performers.all()
-        if not performers.exists():
-            return Response([], status=status.HTTP_200_OK)
+        if end_day < start_day or (end_day - start_day).days >= self.MAX_AVAILABILITY_RANGE_DAYS:
+            return Response(
+                {'detail': f'O intervalo deve ter entre 1 e {self.MAX_AVAILABILITY_RANGE_DAYS} dias.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        existing_appointments = Appointment.objects.filter(
-            employee__in=performers, appointment_time__date=day, status__in=['CONFIRMED', 'PENDING']
-        )
-        existing_blocks = TimeBlock.objects.filter(
-            employee__in=performers, start_time__date=day
-        )
+        days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+
+        def compute(missing_days):
+            performers = list(service.performers.all())
+            busy_rows = load_busy_rows(
+                [performer.pk for performer in performers], min(missing_days), max(missing_days)
+            ) if performers else []
+            return performer_slots_by_day(missing_days, service_total_minutes(service), performers, busy_rows)
+
+        slots_by_day = availability_cache.get_day_slots(service, days, compute)
+        if is_range:
+            return Response({day.isoformat(): format_slots(slots_by_day[day], by_performer) for day in days})
+        return Response(format_slots(slots_by_day[start_day], by_performer))
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Pet shops num raio (`radius`, em km) do ponto `lat`/`lng`, do mais
+        próximo ao mais distante, no máximo `limit` resultados.
+        """
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', self.DEFAULT_NEARBY_RADIUS_KM))
+            limit = int(request.query_params.get('limit', self.DEFAULT_NEARBY_LIMIT))
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Informe lat e lng numéricos; radius (km) e limit são opcionais.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({'detail': 'Coordenadas fora do intervalo válido.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (0 < radius <= self.MAX_NEARBY_RADIUS_KM) or not (0 < limit <= self.MAX_NEARBY_LIMIT):
+            return Response(
+                {'detail': f'radius deve estar entre 0 e {self.MAX_NEARBY_RADIUS_KM} km e limit entre 1 e {self.MAX_NEARBY_LIMIT}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        petshops = geo.nearby(self.get_queryset(), lat, lng, radius, limit)
+        return Response(NearbyPetShopSerializer(petshops, many=True, context=self.get_serializer_context()).data)
 
-        total_duration = timedelta(minutes=(service.duration_minutes + service.buffer_time_minutes))
-        day_of_week = day.strftime('%A').lower()
-        available_slots = []
-        
-        slot_interval_minutes = 15
-        day_start_time = datetime.strptime("08:00", "%H:%M").time()
-        day_end_time = datetime.strptime("20:00", "%H:%M").time()
-
-        slot_time = datetime.combine(day, day_start_time)
-        end_of_day = datetime.combine(day, day_end_time)
-        end_of_day_aware = timezone.make_aware(end_of_day)
-
-        while slot_time < end_of_day:
-            slot_start_aware = timezone.make_aware(slot_time)
-            slot_end_aware = slot_start_aware + total_duration
-
-            if slot_end_aware > end_of_day_aware:
-                break
-
-            is_slot_available = False
-            for performer in performers:
-                performer_is_free = True
-                
-                schedule = performer.work_schedule.get(day_of_week) if performer.work_schedule else None
-                if not schedule:
-                    performer_is_free = False
-                    continue
-
-                work_start = datetime.strptime(schedule['start'], '%H:%M').time()
-                break_start = datetime.strptime(schedule['break_start'], '%H:%M').time()
-                break_end = datetime.strptime(schedule['break_end'], '%H:%M').time()
-                work_end = datetime.strptime(schedule['end'], '%H:%M').time()
-
-                fits_in_morning = (slot_start_aware.time() >= work_start and slot_end_aware.time() <= break_start)
-                fits_in_afternoon = (slot_start_aware.time() >= break_end and slot_end_aware.time() <= work_end)
-
-                if not (fits_in_morning or fits_in_afternoon):
-                    performer_is_free = False
-                    continue
-
-                for appt in existing_appointments:
-                    if appt.employee == performer:
-                        if slot_start_aware < appt.end_time and slot_end_aware > appt.appointment_time:
-                            performer_is_free = False
-                            break
-                if not performer_is_free: continue
-
-                for block in existing_blocks:
-                    if block.employee == performer:
-                        if slot_start_aware < block.end_time and slot_end_aware > block.start_time:
-                            performer_is_free = False
-                            break
-                if not performer_is_free: continue
-                
-                if performer_is_free:
-                    is_slot_available = True
-                    break
-            
-            if is_slot_available:
-                available_slots.append(slot_time.strftime('%H:%M'))
-
-            slot_time += timedelta(minutes=slot_interval_minutes)
-
-        return Response(available_slots)
-
-
-class ServiceViewSet(viewsets.ModelViewSet):
+    MAX_ANALYTICS_RANGE_DAYS = 366
+    DEFAULT_REPORT_DAYS = 30
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """
+        Faturamento diário, agendamentos e faturamento por serviço e ocupação
+        da equipe entre `start_date` e `end_date` (padrão: últimos 30 dias).
+        Restrito ao dono e aos gerentes do pet shop.
+        """
+        petshop = self.get_object()
+        if not request.user.is_superuser and not get_membership(request).manages(petshop.pk):
+            return Response({'detail': 'Apenas o dono ou um gerente do pet shop pode ver os indicadores.'}, status=status.HTTP_403_FORBIDDEN)
+        start_day, end_day = parse_report_range(
+            request.query_params, self.MAX_ANALYTICS_RANGE_DAYS, self.DEFAULT_REPORT_DAYS
+        )
+        return Response(analytics.build_report(petshop, start_day, end_day))
+
+    MAX_STATS_RANGE_DAYS = 1830
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Painel dos pet shops do usuário, lido do resumo diário (DailyShopStats):
+        totais por pet shop e a série diária somada entre `start_date` e
+        `end_date` (padrão: últimos 30 dias). `pet_shop` (IDs separados por
+        vírgula) restringe a alguns deles. Para donos e gerentes.
+        """
+        start_day, end_day = parse_report_range(request.query_params, self.MAX_STATS_RANGE_DAYS, self.DEFAULT_REPORT_DAYS)
+        membership = get_membership(request)
+        visible = None
+        if not request.user.is_superuser:
+            visible = set(membership.owned_petshop_ids)
+            if membership.role == 'GERENTE' and membership.works_at_id:
+                visible.add(membership.works_at_id)
+            if not visible:
+                return Response({'detail': 'Apenas donos e gerentes de pet shops podem ver o painel.'}, status=status.HTTP_403_FORBIDDEN)
+        requested = _csv_param(request.query_params.get('pet_shop'))
+        if requested:
+            try:
+                requested = {int(value) for value in requested}
+            except ValueError:
+                raise ParseError('pet_shop deve ser um ID ou uma lista de IDs separados por vírgula.')
+            if visible is not None and not requested <= visible:
+                return Response({'detail': 'Você não tem acesso a todos os pet shops informados.'}, status=status.HTTP_403_FORBIDDEN)
+            visible = requested
+        return Response(rollups.dashboard(visible, start_day, end_day))
+
+    @action(detail=False, methods=['get'], url_path='availability-cache', permission_classes=[IsAdminUser])
+    def availability_cache_stats(self, request):
+        """Contadores de acerto/falha do cache de disponibilidade neste processo."""
+        return Response(availability_cache.stats())
+
+
+class ServiceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ServiceSerializer
     permission_classes = [CanManagePetShop]
 
     def get_queryset(self):
         petshop_pk = self.kwargs['petshop_pk']
-        return Service.objects.filter(pet_shop_id=petshop_pk)
+        return Service.objects.filter(pet_shop_id=petshop_pk).prefetch_related('performers').order_by('id')
 
 
 class PetViewSet(viewsets.ModelViewSet):
@@ -130,15 +274,29 @@ class PetViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Pet.objects.filter(tutor=self.request.user)
+        return Pet.objects.filter(tutor=self.request.user).order_by('id')
 
     def perform_create(self, serializer):
         serializer.save(tutor=self.request.user)
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
+    list_serializer_class = AppointmentListSerializer
+    list_actions = ('list', 'occurrences')
     permission_classes = [IsAuthenticated]
+    pagination_class = AppointmentCursorPagination
+
+    # Relações lidas pelo AppointmentSerializer completo, e por cada `expand` no modo lista
+    FULL_SELECT_RELATED = ('tutor', 'employee', 'pet__tutor', 'pet_shop', 'service')
+    FULL_PREFETCH_RELATED = ('service__performers',)
+    EXPAND_RELATED = {
+        'tutor': (('tutor',), ()),
+        'pet': (('pet__tutor',), ()),
+        'pet_shop': (('pet_shop',), ()),
+        'service': (('service',), ('service__performers',)),
+        'employee': (('employee',), ()),
+    }
 
     def get_permissions(self):
         if self.action in ['retrieve', 'update', 'partial_update', 'destroy', 'confirm', 'cancel', 'create_recurrence']:
@@ -147,120 +305,409 @@ class AppointmentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        # Carrega de uma vez tudo o que o serializer vai ler (evita N+1)
+        if self.action == 'export':
+            # A exportação lê só as colunas necessárias, com values_list()
+            select, prefetch = [], []
+        elif self.is_list_mode():
+            select, prefetch = [], []
+            for name in self.requested_expand():
+                related = self.EXPAND_RELATED.get(name, ((), ()))
+                select.extend(related[0])
+                prefetch.extend(related[1])
+        else:
+            select, prefetch = self.FULL_SELECT_RELATED, self.FULL_PREFETCH_RELATED
+        appointments = Appointment.objects.all()
+        if select:
+            # select_related() sem argumentos seguiria todas as FKs
+            appointments = appointments.select_related(*select)
+        if prefetch:
+            appointments = appointments.prefetch_related(*prefetch)
+        if self.action in ('list', 'export'):
+            appointments = filter_appointments(appointments, self.request.query_params)
         if user.is_superuser:
-            return Appointment.objects.all()
+            return appointments
         if user.user_type == 'TUTOR':
-            return Appointment.objects.filter(tutor=user)
-        if user.user_type == 'PROPRIETARIO':
-            owned_petshops = PetShop.objects.filter(owner=user)
-            return Appointment.objects.filter(pet_shop__in=owned_petshops)
-        if user.user_type in ['GERENTE', 'FUNCIONARIO']:
-            if user.works_at:
-                return Appointment.objects.filter(pet_shop=user.works_at)
+            return appointments.filter(tutor=user)
+        petshop_ids = get_membership(self.request).staff_petshop_ids()
+        if petshop_ids:
+            return appointments.filter(pet_shop_id__in=petshop_ids)
         return Appointment.objects.none()
 
-    def _validate_appointment_time(self, serializer, appointment_time, service, employee):
+    def _appointment_end_time(self, appointment_time, service):
         duration = service.duration_minutes or 60
-        end_time = appointment_time + timedelta(minutes=(duration + service.buffer_time_minutes))
-        
+        return appointment_time + timedelta(minutes=(duration + service.buffer_time_minutes))
+
+    def _check_work_schedule(self, appointment_time, end_time, employee):
         if not employee.work_schedule:
             raise serializers.ValidationError(f"O funcionário {employee.username} não tem um horário de trabalho definido.")
-        day_of_week = appointment_time.strftime('%A').lower()
-        schedule_for_day = employee.work_schedule.get(day_of_week)
-        if not schedule_for_day:
+        try:
+            schedule = employee.compiled_schedule
+        except DjangoValidationError:
+            raise serializers.ValidationError(f"O horário de trabalho do funcionário {employee.username} é inválido.")
+        day = timezone.localdate(appointment_time)
+        if not schedule.works_on(day):
             raise serializers.ValidationError(f"O funcionário {employee.username} não trabalha neste dia da semana.")
-        
-        work_start = datetime.strptime(schedule_for_day['start'], '%H:%M').time()
-        break_start = datetime.strptime(schedule_for_day['break_start'], '%H:%M').time()
-        break_end = datetime.strptime(schedule_for_day['break_end'], '%H:%M').time()
-        work_end = datetime.strptime(schedule_for_day['end'], '%H:%M').time()
-        
-        fits_in_morning = (appointment_time.time() >= work_start and end_time.time() <= break_start)
-        fits_in_afternoon = (appointment_time.time() >= break_end and end_time.time() <= work_end)
-        if not (fits_in_morning or fits_in_afternoon):
+
+        midnight, _ = day_bounds(day)
+        start_minute = to_day_minutes(appointment_time, midnight)
+        end_minute = to_day_minutes(end_time, midnight, round_up=True)
+        if not schedule.fits(day, start_minute, end_minute):
             raise serializers.ValidationError(f"O horário {appointment_time.strftime('%H:%M')} do dia {appointment_time.strftime('%d/%m')} não se encaixa nos turnos de trabalho.")
 
+    def _validate_appointment_time(self, serializer, appointment_time, service, employee):
+        end_time = self._appointment_end_time(appointment_time, service)
+        self._check_work_schedule(appointment_time, end_time, employee)
+
         conflicting_appointments = Appointment.objects.filter(
-            employee=employee, status__in=['CONFIRMED', 'PENDING'], appointment_time__lt=end_time, end_time__gt=appointment_time
+            employee=employee, status__in=Appointment.ACTIVE_STATUSES,
+            appointment_time__gt=appointment_time - MAX_BOOKING_SPAN, appointment_time__lt=end_time,
+            end_time__gt=appointment_time
         ).exclude(pk=getattr(serializer.instance, 'pk', None))
         
-        if conflicting_appointments.exists():
+        # Ocorrências ainda não gravadas de séries por regra também ocupam a agenda
+        virtual_rows = virtual_busy_rows([employee.pk], appointment_time - MAX_BOOKING_SPAN, end_time)
+        if conflicting_appointments.exists() or BusyIndex(row[1:] for row in virtual_rows).overlaps(appointment_time, end_time):
             raise serializers.ValidationError(f"Conflito de horário para {employee.username} no dia {appointment_time.strftime('%d/%m/%Y %H:%M')}.")
         
         return end_time
 
+    def _auto_assign_employee(self, appointment_time, service):
+        """Quando o cliente não informa `employee_id`, escolhe o funcionário livre menos ocupado do dia."""
+        performers = list(service.performers.all())
+        day = timezone.localdate(appointment_time)
+        busy_rows = load_busy_rows([performer.pk for performer in performers], day) if performers else []
+        employee = pick_performer(appointment_time, service_total_minutes(service), performers, busy_rows)
+        if employee is None:
+            raise serializers.ValidationError(f"Nenhum funcionário disponível para {appointment_time.strftime('%d/%m/%Y %H:%M')}.")
+        return employee
+
+    def _lock_employee_schedule(self, employee):
+        """
+        Trava a linha do funcionário até o fim da transação (SELECT ... FOR UPDATE),
+        serializando apenas as reservas do mesmo funcionário. Em bancos sem
+        travas de linha (SQLite) o `transaction_mode` IMMEDIATE configurado em
+        settings.py já serializa as escritas.
+        """
+        User.objects.select_for_update().filter(pk=employee.pk).values_list('pk', flat=True).first()
+
     def perform_create(self, serializer):
         user = self.request.user
         service = serializer.validated_data.get('service')
         employee = serializer.validated_data.get('employee')
         appointment_time = serializer.validated_data.get('appointment_time')
-        
-        end_time = self._validate_appointment_time(serializer, appointment_time, service, employee)
 
         if user.user_type == 'TUTOR':
             pet = serializer.validated_data.get('pet')
             if pet.tutor != user:
                 raise serializers.ValidationError("Erro: Você só pode agendar serviços para os seus próprios pets.")
-            serializer.save(tutor=user, total_price=service.base_price, end_time=end_time)
+            extra = {'tutor': user}
         elif user.user_type in ['PROPRIETARIO', 'GERENTE', 'FUNCIONARIO']:
-            serializer.save(total_price=service.base_price, end_time=end_time)
+            extra = {}
         else:
             raise serializers.ValidationError("Erro: Tipo de usuário inválido para criar um agendamento.")
-    
+
+        # Verificação de conflito e gravação na mesma transação, com a agenda do
+        # funcionário travada: evita duas reservas simultâneas no mesmo horário.
+        with transaction.atomic():
+            if employee is None:
+                employee = self._auto_assign_employee(appointment_time, service)
+            with self._overlap_as_conflict(employee, appointment_time):
+                self._lock_employee_schedule(employee)
+                end_time = self._validate_appointment_time(serializer, appointment_time, service, employee)
+                serializer.save(employee=employee, total_price=service.base_price, end_time=end_time, **extra)
+
+    def perform_update(self, serializer):
+        """
+        Mudanças de horário, funcionário ou serviço de um agendamento ativo
+        passam pela mesma trava e verificação de conflito da criação.
+        """
+        instance = serializer.instance
+        data = serializer.validated_data
+        appointment_time = data.get('appointment_time', instance.appointment_time)
+        employee = data.get('employee', instance.employee)
+        service = data.get('service', instance.service)
+        moved = any(field in data for field in ('appointment_time', 'employee', 'service'))
+        with transaction.atomic():
+            if not (moved and employee and service and instance.status in Appointment.ACTIVE_STATUSES):
+                with self._overlap_as_conflict(employee, appointment_time):
+                    serializer.save()
+                return
+            with self._overlap_as_conflict(employee, appointment_time):
+                self._lock_employee_schedule(employee)
+                end_time = self._validate_appointment_time(serializer, appointment_time, service, employee)
+                serializer.save(end_time=end_time)
+
+    @contextmanager
+    def _overlap_as_conflict(self, employee, appointment_time):
+        """Traduz a restrição de exclusão do PostgreSQL (migração 0005) num erro 400."""
+        try:
+            with transaction.atomic():
+                yield
+        except IntegrityError as exc:
+            if OVERLAP_CONSTRAINT not in str(exc):
+                raise
+            username = employee.username if employee else '?'
+            raise serializers.ValidationError(f"Conflito de horário para {username} no dia {appointment_time.strftime('%d/%m/%Y %H:%M')}.")
+
+    MAX_OCCURRENCES_WINDOW_DAYS = 92
+
+    def _plan_recurrence(self, parent_appointment, appointment_dates):
+        """
+        Valida todas as ocorrências em memória, a partir de uma única consulta
+        com as reservas do funcionário na janela da série (mais as ocorrências
+        virtuais de outras séries por regra). Retorna as ocorrências (não
+        salvas) e a lista de conflitos por data.
+        """
+        service = parent_appointment.service
+        employee = parent_appointment.employee
+        end_times = [self._appointment_end_time(date, service) for date in appointment_dates]
+        window_start = appointment_dates[0] - MAX_BOOKING_SPAN
+        busy = BusyIndex(
+            Appointment.objects.filter(
+                employee=employee, status__in=Appointment.ACTIVE_STATUSES,
+                appointment_time__gt=window_start, appointment_time__lt=end_times[-1],
+            ).values_list('appointment_time', 'end_time')
+        )
+        for _, start, end in virtual_busy_rows([employee.pk], window_start, end_times[-1]):
+            busy.add(start, end)
+
+        occurrences, conflicts = [], []
+        for date, end_time in zip(appointment_dates, end_times):
+            try:
+                self._check_work_schedule(date, end_time, employee)
+                if busy.overlaps(date, end_time):
+                    raise serializers.ValidationError(f"Conflito de horário para {employee.username} no dia {date.strftime('%d/%m/%Y %H:%M')}.")
+            except serializers.ValidationError as e:
+                conflicts.append({'date': date.date().isoformat(), 'detail': str(e.detail[0])})
+                continue
+            busy.add(date, end_time)
+            occurrences.append(build_occurrence(parent_appointment, date, end_time))
+        return occurrences, conflicts
+
     @action(detail=True, methods=['post'])
     def create_recurrence(self, request, pk=None):
+        """
+        Cria, de uma vez (bulk_create), as repetições de um agendamento até
+        `recurrence_end_date`. Com `dry_run=true` nada é gravado: a resposta
+        traz as datas da série e os conflitos encontrados em cada uma.
+
+        Com `mode=rule` a série fica guardada como regra no agendamento pai
+        (`recurrence_end_date` passa a ser opcional) e só as ocorrências dentro
+        do horizonte (RECURRENCE_HORIZON_WEEKS) são gravadas; as demais são
+        geradas pelo comando `materialize_recurrences`.
+        """
         parent_appointment = self.get_object()
         
         frequency = request.data.get('frequency')
         recurrence_end_date_str = request.data.get('recurrence_end_date')
+        dry_run = _is_true(request.data.get('dry_run', ''))
+        rule_mode = request.data.get('mode') == 'rule'
 
-        if not frequency or not recurrence_end_date_str:
+        if not frequency or not (recurrence_end_date_str or rule_mode):
             return Response({'detail': 'Frequência e data final são obrigatórias.'}, status=status.HTTP_400_BAD_REQUEST)
         
+        recurrence_end_date = None
+        if recurrence_end_date_str:
+            try:
+                recurrence_end_date = datetime.strptime(recurrence_end_date_str, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({'detail': 'Formato de data inválido. Use AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if frequency not in RECURRENCE_STEPS:
+            return Response({'detail': 'Frequência inválida.'}, status=status.HTTP_400_BAD_REQUEST)
+        if parent_appointment.service is None or parent_appointment.employee is None:
+            return Response({'detail': 'O agendamento original não tem serviço ou funcionário definido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # No modo regra só o horizonte é gravado agora
+        materialize_until = recurrence_end_date
+        if rule_mode:
+            horizon = horizon_date()
+            materialize_until = min(horizon, recurrence_end_date) if recurrence_end_date else horizon
+        _, window_end = day_bounds(materialize_until)
+        appointment_dates = list(occurrence_times(
+            frequency, parent_appointment.appointment_time, parent_appointment.appointment_time,
+            window_end, materialize_until
+        ))
+
+        if not appointment_dates:
+            occurrences, conflicts = [], []
+        elif dry_run:
+            occurrences, conflicts = self._plan_recurrence(parent_appointment, appointment_dates)
+        else:
+            employee = parent_appointment.employee
+            try:
+                with transaction.atomic():
+                    self._lock_employee_schedule(employee)
+                    occurrences, conflicts = self._plan_recurrence(parent_appointment, appointment_dates)
+                    if not conflicts:
+                        Appointment.objects.bulk_create(occurrences)
+            except IntegrityError as exc:
+                if OVERLAP_CONSTRAINT not in str(exc):
+                    raise
+                return Response({'detail': f'Conflito de horário para {employee.username} na série.'}, status=status.HTTP_400_BAD_REQUEST)
+            if not conflicts:
+                # bulk_create não dispara sinais: invalida o cache de disponibilidade aqui.
+                availability_cache.invalidate_employee_days(
+                    employee.pk, {timezone.localdate(appt.appointment_time) for appt in occurrences}
+                )
+                analytics.invalidate_days(
+                    (appt.pet_shop_id, timezone.localdate(appt.appointment_time)) for appt in occurrences
+                )
+                rollups.refresh_appointments((appt.pet_shop_id, appt.appointment_time) for appt in occurrences)
+
+        if dry_run:
+            return Response({
+                'dry_run': True,
+                'dates': [date.date().isoformat() for date in appointment_dates],
+                'conflicts': conflicts,
+            })
+        if conflicts:
+            first = conflicts[0]
+            first_date = datetime.strptime(first['date'], '%Y-%m-%d').strftime('%d/%m/%Y')
+            return Response(
+                {'detail': f'Não foi possível criar agendamento para {first_date}: {first["detail"]}', 'conflicts': conflicts},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        Appointment.objects.filter(pk=parent_appointment.pk).update(
+            frequency=frequency, recurrence_end_date=recurrence_end_date,
+            recurrence_materialized_until=materialize_until if rule_mode else None
+        )
+        if rule_mode:
+            # As ocorrências virtuais ocupam dias além do horizonte
+            availability_cache.invalidate_employee_services(parent_appointment.employee_id)
+            return Response({
+                'detail': f'Série criada: {len(occurrences) + 1} agendamentos gravados até {materialize_until.strftime("%d/%m/%Y")}; os seguintes serão gerados automaticamente.'
+            })
+        return Response({'detail': f'{len(occurrences) + 1} agendamentos recorrentes criados com sucesso.'})
+
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request):
+        """
+        Agendamentos de uma janela (`start_date` e `end_date`, até 92 dias),
+        incluindo as ocorrências virtuais das séries por regra (`id` nulo e
+        `is_virtual` verdadeiro), em ordem de horário.
+        """
         try:
-            recurrence_end_date = datetime.strptime(recurrence_end_date_str, '%Y-%m-%d').date()
+            start_day = datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+            end_day = datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
         except ValueError:
-            return Response({'detail': 'Formato de data inválido. Use AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        appointment_dates = []
-        current_date = parent_appointment.appointment_time
-        while current_date.date() < recurrence_end_date:
-            if frequency == 'WEEKLY':
-                current_date += relativedelta(weeks=1)
-            elif frequency == 'BIWEEKLY':
-                current_date += relativedelta(weeks=2)
-            elif frequency == 'MONTHLY':
-                current_date += relativedelta(months=1)
-            else:
-                return Response({'detail': 'Frequência inválida.'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if current_date.date() <= recurrence_end_date:
-                appointment_dates.append(current_date)
-        
-        created_appointments = [parent_appointment]
-        with transaction.atomic():
-            for date in appointment_dates:
-                try:
-                    # Usamos um serializer vazio aqui, pois não temos uma instância ainda para editar
-                    end_time = self._validate_appointment_time(self.get_serializer(), date, parent_appointment.service, parent_appointment.employee)
-                except serializers.ValidationError as e:
-                    return Response({'detail': f'Não foi possível criar agendamento para {date.strftime("%d/%m/%Y")}: {e.detail[0]}'}, status=status.HTTP_400_BAD_REQUEST)
-
-                new_appt = Appointment.objects.create(
-                    tutor=parent_appointment.tutor,
-                    pet=parent_appointment.pet,
-                    pet_shop=parent_appointment.pet_shop,
-                    service=parent_appointment.service,
-                    employee=parent_appointment.employee,
-                    appointment_time=date,
-                    end_time=end_time,
-                    status='PENDING',
-                    total_price=parent_appointment.total_price,
-                    recurrence_parent=parent_appointment
-                )
-                created_appointments.append(new_appt)
-                
-        return Response({'detail': f'{len(created_appointments)} agendamentos recorrentes criados com sucesso.'})
+            return Response({'detail': 'start_date e end_date (AAAA-MM-DD) são obrigatórios.'}, status=status.HTTP_400_BAD_REQUEST)
+        if end_day < start_day or (end_day - start_day).days >= self.MAX_OCCURRENCES_WINDOW_DAYS:
+            return Response(
+                {'detail': f'O intervalo deve ter entre 1 e {self.MAX_OCCURRENCES_WINDOW_DAYS} dias.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        window_start, _ = day_bounds(start_day)
+        _, window_end = day_bounds(end_day)
+        queryset = self.get_queryset()
+        appointments = list(queryset.filter(appointment_time__gte=window_start, appointment_time__lt=window_end))
+        parents = queryset.filter(pk__in=rule_parents(window_start, window_end).values('pk'))
+        virtual = [
+            build_occurrence(parent, start, end)
+            for parent, start, end in virtual_occurrences(parents, window_start, window_end)
+        ]
+
+        items = sorted(appointments + virtual, key=lambda appt: (appt.appointment_time, appt.pk or 0))
+        data = self.get_serializer(items, many=True).data
+        for item, appt in zip(data, items):
+            item['is_virtual'] = appt.pk is None
+        return Response(data)
+
+    MAX_AGENDA_RANGE_DAYS = 31
+
+    @action(detail=False, methods=['get'])
+    def agenda(self, request):
+        """
+        Linha do tempo da equipe (agendamentos, bloqueios e intervalos livres)
+        para `date` ou `start_date`/`end_date`. Por padrão mostra o próprio
+        funcionário; `employee_id` ou `pet_shop` escolhem outro funcionário ou
+        toda a equipe de um pet shop ao qual o usuário tenha acesso.
+        """
+        user = request.user
+        params = request.query_params
+        start_str = params.get('start_date') or params.get('date', '')
+        end_str = params.get('end_date') or start_str
+        try:
+            start_day = datetime.strptime(start_str, '%Y-%m-%d').date()
+            end_day = datetime.strptime(end_str, '%Y-%m-%d').date()
+            employee_id = int(params['employee_id']) if params.get('employee_id') else None
+            pet_shop_id = int(params['pet_shop']) if params.get('pet_shop') else None
+        except ValueError:
+            return Response(
+                {'detail': 'Informe date ou start_date/end_date (AAAA-MM-DD); employee_id e pet_shop são IDs numéricos.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if end_day < start_day or (end_day - start_day).days >= self.MAX_AGENDA_RANGE_DAYS:
+            return Response(
+                {'detail': f'O intervalo deve ter entre 1 e {self.MAX_AGENDA_RANGE_DAYS} dias.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        staff = User.objects.filter(user_type__in=['GERENTE', 'FUNCIONARIO']).order_by('id')
+        if not user.is_superuser:
+            petshop_ids = get_membership(request).staff_petshop_ids()
+            if not petshop_ids:
+                return Response({'detail': 'Apenas a equipe do pet shop pode ver a agenda.'}, status=status.HTTP_403_FORBIDDEN)
+            staff = staff.filter(works_at_id__in=petshop_ids)
+        if employee_id:
+            staff = staff.filter(pk=employee_id)
+        elif pet_shop_id:
+            staff = staff.filter(works_at_id=pet_shop_id)
+        elif user.user_type in ['GERENTE', 'FUNCIONARIO']:
+            staff = staff.filter(pk=user.pk)
+        employees = list(staff)
+
+        return Response({
+            'start_date': start_day,
+            'end_date': end_day,
+            'employees': build_agenda(employees, start_day, end_day),
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Histórico de agendamentos em CSV (padrão) ou NDJSON (`output=ndjson`),
+        transmitido em blocos. Aceita os mesmos filtros da listagem
+        (`start_date`, `end_date`, `status`, `employee`, ...).
+        """
+        output = request.query_params.get('output', 'csv').lower()
+        if output not in export.FORMATS:
+            raise ParseError(f'output deve ser um de: {", ".join(export.FORMATS)}.')
+        rows = export.export_rows(self.get_queryset())
+        response = StreamingHttpResponse(export.stream(rows, output), content_type=export.FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="agendamentos.{output}"'
+        return response
+
+    MAX_BULK_IDS = 500
+
+    def _cancel_future_recurrences(self, parent_ids):
+        """
+        Cancela, em um único UPDATE, as ocorrências futuras das séries
+        informadas e encerra as séries por regra (sem novas ocorrências virtuais).
+        """
+        for employee_id in end_series(parent_ids):
+            availability_cache.invalidate_employee_services(employee_id)
+        future = Appointment.objects.filter(
+            recurrence_parent_id__in=parent_ids, status__in=Appointment.ACTIVE_STATUSES,
+            appointment_time__gte=timezone.now(),
+        )
+        affected = list(future.values_list('employee_id', 'appointment_time', 'pet_shop_id'))
+        if affected:
+            future.update(status='CANCELLED')
+            self._invalidate_cancelled([row[:2] for row in affected])
+            rollups.refresh_appointments((row[2], row[1]) for row in affected)
+        return len(affected)
+
+    def _invalidate_cancelled(self, rows):
+        """update() não dispara sinais: libera no cache os dias dos agendamentos cancelados."""
+        days_by_employee = {}
+        for employee_id, appointment_time in rows:
+            days_by_employee.setdefault(employee_id, set()).add(timezone.localdate(appointment_time))
+        for employee_id, days in days_by_employee.items():
+            availability_cache.invalidate_employee_days(employee_id, days)
 
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
@@ -269,38 +716,121 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         allowed_roles = ['PROPRIETARIO', 'GERENTE', 'FUNCIONARIO']
         if user.user_type not in allowed_roles:
             return Response({'detail': 'Apenas a equipe do pet shop pode confirmar agendamentos.'}, status=status.HTTP_403_FORBIDDEN)
-        appointment.status = 'CONFIRMED'
-        appointment.save()
+        if appointment.status != 'PENDING':
+            return Response({'detail': 'Apenas agendamentos pendentes podem ser confirmados.'}, status=status.HTTP_400_BAD_REQUEST)
+        with self._overlap_as_conflict(appointment.employee, appointment.appointment_time):
+            appointment.status = 'CONFIRMED'
+            appointment.save(update_fields=['status'])
         return Response(self.get_serializer(appointment).data)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
+        """Cancela o agendamento; com `include_future=true` cancela também as próximas ocorrências da série."""
         appointment = self.get_object()
         user = request.user
         is_tutor_owner = (user.user_type == 'TUTOR' and appointment.tutor == user)
         is_shop_staff = user.user_type in ['PROPRIETARIO', 'GERENTE', 'FUNCIONARIO']
         if not (is_tutor_owner or is_shop_staff):
             return Response({'detail': 'Você não tem permissão para cancelar este agendamento.'}, status=status.HTTP_403_FORBIDDEN)
-        appointment.status = 'CANCELLED'
-        appointment.save()
+        with transaction.atomic():
+            appointment.status = 'CANCELLED'
+            appointment.save(update_fields=['status'])
+            if _is_true(request.data.get('include_future', request.query_params.get('include_future'))):
+                self._cancel_future_recurrences([appointment.pk])
         return Response(self.get_serializer(appointment).data)
 
+    def _bulk_transition(self, request, new_status, from_statuses):
+        """
+        Aplica `new_status` a vários agendamentos com um único UPDATE e
+        retorna as linhas alteradas e um resumo.
+        Os alvos vêm de `ids` ou do filtro `date` (+ `employee_id` opcional) e
+        são restritos, na mesma consulta, aos agendamentos que o usuário pode ver.
+        """
+        ids = request.data.get('ids')
+        date_str = request.data.get('date')
+        targets = self.get_queryset().select_related(None).prefetch_related(None)
+        if ids:
+            if not isinstance(ids, list) or len(ids) > self.MAX_BULK_IDS:
+                raise ParseError(f'Informe em "ids" uma lista de até {self.MAX_BULK_IDS} agendamentos.')
+            try:
+                ids = [int(pk) for pk in ids]
+            except (TypeError, ValueError):
+                raise ParseError('IDs inválidos.')
+            targets = targets.filter(pk__in=ids)
+        elif date_str:
+            try:
+                day = datetime.strptime(date_str, '%Y-%m-%d').date()
+            except ValueError:
+                raise ParseError('Formato de data inválido. Use AAAA-MM-DD.')
+            day_start, day_end = day_bounds(day)
+            targets = targets.filter(appointment_time__gte=day_start, appointment_time__lt=day_end)
+            employee_id = request.data.get('employee_id')
+            if employee_id:
+                try:
+                    employee_id = int(employee_id)
+                except (TypeError, ValueError):
+                    raise ParseError('employee_id inválido.')
+                targets = targets.filter(employee_id=employee_id)
+        else:
+            raise ParseError('Informe "ids" ou "date".')
+
+        with transaction.atomic():
+            # As linhas ficam travadas entre a leitura dos status e o UPDATE
+            rows = list(targets.select_for_update().values_list(
+                'pk', 'status', 'employee_id', 'appointment_time', 'pet_shop_id'
+            ))
+            eligible = [row for row in rows if row[1] in from_statuses]
+            updated = Appointment.objects.filter(
+                pk__in=[row[0] for row in eligible], status__in=from_statuses
+            ).update(status=new_status)
+        # update() não dispara sinais: o faturamento dos dias afetados mudou
+        analytics.invalidate_days((row[4], timezone.localdate(row[3])) for row in eligible)
+        rollups.refresh_appointments((row[4], row[3]) for row in eligible)
+        found = {row[0] for row in rows}
+        summary = {
+            'updated': updated,
+            'updated_ids': [row[0] for row in eligible],
+            'skipped_ids': [row[0] for row in rows if row[1] not in from_statuses],
+        }
+        if ids:
+            summary['not_found_ids'] = [pk for pk in ids if pk not in found]
+        return eligible, summary
+
+    @action(detail=False, methods=['post'])
+    def bulk_confirm(self, request):
+        """Confirma vários agendamentos pendentes de uma vez (`ids` ou `date`/`employee_id`)."""
+        if request.user.user_type not in ['PROPRIETARIO', 'GERENTE', 'FUNCIONARIO'] and not request.user.is_superuser:
+            return Response({'detail': 'Apenas a equipe do pet shop pode confirmar agendamentos.'}, status=status.HTTP_403_FORBIDDEN)
+        _, summary = self._bulk_transition(request, 'CONFIRMED', ('PENDING',))
+        return Response(summary)
+
+    @action(detail=False, methods=['post'])
+    def bulk_cancel(self, request):
+        """
+        Cancela vários agendamentos de uma vez (`ids` ou `date`/`employee_id`).
+        Com `include_future=true`, cancela também as ocorrências futuras das
+        séries cujos pais estiverem entre eles.
+        """
+        eligible, summary = self._bulk_transition(request, 'CANCELLED', Appointment.ACTIVE_STATUSES)
+        self._invalidate_cancelled([(row[2], row[3]) for row in eligible])
+        if _is_true(request.data.get('include_future')):
+            summary['future_cancelled'] = self._cancel_future_recurrences(summary['updated_ids'])
+        return Response(summary)
+
 
 class TimeBlockViewSet(viewsets.ModelViewSet):
     serializer_class = TimeBlockSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimeBlockCursorPagination
 
     def get_queryset(self):
         user = self.request.user
+        blocks = TimeBlock.objects.all()
+        if self.action == 'list':
+            blocks = filter_time_blocks(blocks, self.request.query_params)
         if user.is_superuser:
-            return TimeBlock.objects.all()
-        petshops = []
-        if user.user_type == 'PROPRIETARIO':
-            petshops = user.petshops.all()
-        elif user.user_type in ['GERENTE', 'FUNCIONARIO']:
-            if user.works_at:
-                petshops = [user.works_at]
-        return TimeBlock.objects.filter(pet_shop__in=petshops)
+            return blocks
+        return blocks.filter(pet_shop_id__in=get_membership(self.request).staff_petshop_ids())
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -309,18 +839,59 @@ class TimeBlockViewSet(viewsets.ModelViewSet):
 
         if user.user_type not in ['PROPRIETARIO', 'GERENTE']:
             raise serializers.ValidationError("Apenas Proprietários ou Gerentes podem criar bloqueios de horário.")
-        if employee.works_at != pet_shop:
+        if employee.works_at_id != pet_shop.pk:
              raise serializers.ValidationError("Este funcionário não trabalha no pet shop selecionado.")
+        membership = get_membership(self.request)
         if user.user_type == 'PROPRIETARIO':
-            if pet_shop not in user.petshops.all():
+            if not membership.owns(pet_shop.pk):
                 raise serializers.ValidationError("Você só pode criar bloqueios para pet shops que você possui.")
         elif user.user_type == 'GERENTE':
-            if pet_shop != user.works_at:
+            if pet_shop.pk != membership.works_at_id:
                 raise serializers.ValidationError("Você só pode criar bloqueios para o pet shop onde trabalha.")
         serializer.save()
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.all()
     serializer_class = ReviewSerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Avaliações são públicas (filtráveis por `pet_shop`); só o autor altera ou apaga a sua."""
+        reviews = Review.objects.select_related('tutor', 'pet_shop').order_by('id')
+        if self.request.method not in permissions.SAFE_METHODS:
+            return reviews.filter(tutor=self.request.user)
+        pet_shop = self.request.query_params.get('pet_shop')
+        if pet_shop:
+            if not pet_shop.isdigit():
+                raise ParseError('pet_shop deve ser um ID numérico.')
+            reviews = reviews.filter(pet_shop_id=pet_shop)
+        return reviews
+
+    def perform_create(self, serializer):
+        user = self.request.user
+        appointment = serializer.validated_data['appointment']
+        if appointment.tutor_id != user.pk:
+            raise serializers.ValidationError("Você só pode avaliar os seus próprios agendamentos.")
+        if appointment.status != 'COMPLETED':
+            raise serializers.ValidationError("Só é possível avaliar agendamentos concluídos.")
+        serializer.save(tutor=user, pet_shop=appointment.pet_shop)
+
+    def perform_update(self, serializer):
+        # Appointment e pet shop da avaliação não mudam depois de criada.
+        serializer.save(appointment=serializer.instance.appointment, pet_shop=serializer.instance.pet_shop)
+
+
+class MetricsView(APIView):
+    """
+    Métricas por endpoint deste processo (api.middleware.RequestMetricsMiddleware):
+    contagem, médias, máximos e histogramas de latência e de consultas.
+    DELETE zera os contadores.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
+    def delete(self, request):
+        metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
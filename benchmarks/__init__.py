@@ -0,0 +1,23 @@
+# benchmarks/__init__.py
+"""
+Scripts de benchmark dos caminhos críticos da API.
+
+Execute a partir da raiz do projeto, por exemplo:
+    python -m benchmarks.availability
+
+- endpoints: endpoints de ponta a ponta (percentis e consultas, com baseline)
+- availability: algoritmo de disponibilidade isolado, sem banco
+- indexes: planos e tempos das consultas com e sem os índices compostos
+- nearby: busca de pet shops próximos vs. varredura completa
+
+Os dados semeados vêm de benchmarks/seed.py.
+"""
+import os
+
+
+def setup_django():
+    """Inicializa o Django para os scripts (SQLite em memória por padrão)."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    os.environ.setdefault('DATABASE_URL', 'sqlite://:memory:')
+    import django
+    django.setup()
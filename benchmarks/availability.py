@@ -0,0 +1,137 @@
+# benchmarks/availability.py
+"""
+Compara o motor de disponibilidade por intervalos (api.availability) com o
+laço triplo original de PetShopViewSet.availability, usando os mesmos dados
+em memória (sem banco), para isolar o custo do algoritmo.
+
+    python -m benchmarks.availability --performers 12 --bookings 20
+"""
+import argparse
+import random
+import time as clock
+from datetime import date, datetime, timedelta
+
+from . import setup_django
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+
+from api.availability import available_slots  # noqa: E402
+from api.models import User  # noqa: E402
+
+WORK_SCHEDULE = {
+    day: {"start": "08:00", "break_start": "12:00", "break_end": "13:00", "end": "19:00"}
+    for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday')
+}
+
+
+class Booking:
+    def __init__(self, employee, start, end):
+        self.employee = employee
+        self.appointment_time = self.start_time = start
+        self.end_time = end
+
+
+def legacy_availability(day, duration_minutes, performers, existing_appointments, existing_blocks):
+    """Cópia fiel do laço original (slots x funcionários x agendamentos)."""
+    total_duration = timedelta(minutes=duration_minutes)
+    day_of_week = day.strftime('%A').lower()
+    available = []
+    slot_time = datetime.combine(day, datetime.strptime("08:00", "%H:%M").time())
+    end_of_day = datetime.combine(day, datetime.strptime("20:00", "%H:%M").time())
+    end_of_day_aware = timezone.make_aware(end_of_day)
+
+    while slot_time < end_of_day:
+        slot_start_aware = timezone.make_aware(slot_time)
+        slot_end_aware = slot_start_aware + total_duration
+        if slot_end_aware > end_of_day_aware:
+            break
+
+        is_slot_available = False
+        for performer in performers:
+            performer_is_free = True
+            schedule = performer.work_schedule.get(day_of_week) if performer.work_schedule else None
+            if not schedule:
+                continue
+            work_start = datetime.strptime(schedule['start'], '%H:%M').time()
+            break_start = datetime.strptime(schedule['break_start'], '%H:%M').time()
+            break_end = datetime.strptime(schedule['break_end'], '%H:%M').time()
+            work_end = datetime.strptime(schedule['end'], '%H:%M').time()
+            fits_in_morning = (slot_start_aware.time() >= work_start and slot_end_aware.time() <= break_start)
+            fits_in_afternoon = (slot_start_aware.time() >= break_end and slot_end_aware.time() <= work_end)
+            if not (fits_in_morning or fits_in_afternoon):
+                continue
+            for appt in existing_appointments:
+                if appt.employee == performer:
+                    if slot_start_aware < appt.end_time and slot_end_aware > appt.appointment_time:
+                        performer_is_free = False
+                        break
+            if not performer_is_free:
+                continue
+            for block in existing_blocks:
+                if block.employee == performer:
+                    if slot_start_aware < block.end_time and slot_end_aware > block.start_time:
+                        performer_is_free = False
+                        break
+            if performer_is_free:
+                is_slot_available = True
+                break
+        if is_slot_available:
+            available.append(slot_time.strftime('%H:%M'))
+        slot_time += timedelta(minutes=15)
+    return available
+
+
+def build_day(day, performer_count, bookings_per_performer, seed):
+    rng = random.Random(seed)
+    performers = [User(pk=pk, username=f'func{pk}', work_schedule=WORK_SCHEDULE) for pk in range(1, performer_count + 1)]
+    appointments, blocks = [], []
+    midnight = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    for performer in performers:
+        for index in range(bookings_per_performer):
+            start = midnight + timedelta(minutes=rng.randrange(8 * 60, 19 * 60, 15))
+            end = start + timedelta(minutes=rng.choice((30, 45, 60)))
+            target = blocks if index % 5 == 0 else appointments
+            target.append(Booking(performer, start, end))
+    return performers, appointments, blocks
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = clock.perf_counter()
+        result = func()
+        timings.append(clock.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--performers', type=int, default=12)
+    parser.add_argument('--bookings', type=int, default=20, help='Agendamentos/bloqueios por funcionário.')
+    parser.add_argument('--duration', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    day = date(2025, 8, 4)  # segunda-feira
+    performers, appointments, blocks = build_day(day, args.performers, args.bookings, args.seed)
+    busy_rows = [(b.employee.pk, b.appointment_time, b.end_time) for b in appointments + blocks]
+
+    legacy_time, legacy_slots = measure(
+        lambda: legacy_availability(day, args.duration, performers, appointments, blocks), args.repeat
+    )
+    engine_time, engine_slots = measure(
+        lambda: available_slots(day, args.duration, performers, busy_rows), args.repeat
+    )
+
+    assert legacy_slots == engine_slots, 'Os dois algoritmos divergiram!'
+    print(f'funcionários={args.performers} reservas/funcionário={args.bookings} slots livres={len(engine_slots)}')
+    print(f'laço original: {legacy_time * 1000:8.2f} ms')
+    print(f'motor:         {engine_time * 1000:8.2f} ms')
+    print(f'ganho:         {legacy_time / engine_time:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
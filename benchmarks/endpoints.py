@@ -0,0 +1,246 @@
+# benchmarks/endpoints.py
+"""
+Benchmark de ponta a ponta dos endpoints críticos de agendamento, pela
+pilha completa (URLs, permissões, serializers, ORM) com o test client do
+DRF sobre um banco semeado por benchmarks/seed.py.
+
+Para cada cenário reporta latência (p50/p95/p99/máx) e consultas SQL por
+requisição. Com `--save` grava o resultado em JSON; com `--baseline`
+compara com um resultado anterior e sai com código 1 se o p95 piorar além
+de `--tolerance` ou se o número de consultas crescer.
+
+    python -m benchmarks.endpoints --save bench.json
+    python -m benchmarks.endpoints --baseline bench.json --tolerance 0.3
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time as clock
+from datetime import timedelta
+
+from . import setup_django
+
+setup_django()
+
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from api.availability import day_bounds  # noqa: E402
+from api.models import Appointment  # noqa: E402
+
+from .seed import seed  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Percentil por interpolação linear (`fraction` entre 0 e 1)."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Scenario:
+    """
+    Uma requisição medida. `prepare()` roda antes de cada repetição, fora do
+    tempo medido, e devolve os argumentos de `request(client, *args)`.
+    """
+
+    def __init__(self, name, user, request, expected_status=200, prepare=None, cold_cache=False):
+        self.name = name
+        self.user = user
+        self.request = request
+        self.expected_status = expected_status
+        self.prepare = prepare or (lambda: ())
+        self.cold_cache = cold_cache
+
+    def run(self, client, repeat, warmup):
+        client.force_authenticate(self.user)
+        timings, queries = [], []
+        for iteration in range(warmup + repeat):
+            args = self.prepare()
+            if self.cold_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = clock.perf_counter()
+                response = self.request(client, *args)
+                elapsed = clock.perf_counter() - started
+            if response.status_code != self.expected_status:
+                raise RuntimeError(
+                    f'{self.name}: esperado HTTP {self.expected_status}, recebido {response.status_code}: '
+                    f'{getattr(response, "data", response.content)!r}'
+                )
+            if iteration >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured.captured_queries))
+        return {
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': max(queries),
+            'queries_mean': round(statistics.fmean(queries), 2),
+        }
+
+
+def build_scenarios(data):
+    shop = data.petshops[0]
+    owner = data.owners[0]
+    staff = data.staff_by_shop[shop.pk]
+    manager, employee = staff[0], staff[-1]
+    service = data.services_by_shop[shop.pk][0]
+    performer_ids = list(service.performers.values_list('pk', flat=True))
+    pet = data.pets[0]
+    tutor = pet.tutor
+
+    # Dia útil no meio do período semeado (agenda cheia) e dias livres depois dele.
+    busy_day = data.start_day + timedelta(days=data.days // 2)
+    while busy_day.weekday() >= 5:
+        busy_day += timedelta(days=1)
+    free_days = (data.start_day + timedelta(days=data.days + offset) for offset in itertools.count())
+    free_slots = (
+        (day, minute, employee_id)
+        for day in free_days if day.weekday() < 5
+        for minute in range(8 * 60, 11 * 60, 60)
+        for employee_id in performer_ids
+    )
+
+    def next_slot():
+        day, minute, employee_id = next(free_slots)
+        midnight, _ = day_bounds(day)
+        return midnight + timedelta(minutes=minute), employee_id
+
+    def new_booking():
+        start, employee_id = next_slot()
+        return ({
+            'pet_id': pet.pk, 'pet_shop_id': shop.pk, 'service_id': service.pk,
+            'employee_id': employee_id, 'appointment_time': start.isoformat(),
+        },)
+
+    # Cada série ocupa uma janela própria de 13 semanas (12 repetições), bem
+    # depois das reservas avulsas, para não colidir com as séries anteriores.
+    series_base, series_employee_id = next_slot()
+    series_base += timedelta(weeks=200)
+    series_index = itertools.count()
+
+    def new_parent():
+        start, employee_id = series_base + timedelta(weeks=13 * next(series_index)), series_employee_id
+        parent = Appointment.objects.create(
+            tutor=tutor, pet=pet, pet_shop=shop, service=service, employee_id=employee_id,
+            appointment_time=start, end_time=start + timedelta(minutes=(service.duration_minutes or 60)),
+            total_price=service.base_price,
+        )
+        return (parent.pk, (start + timedelta(weeks=12)).date())
+
+    availability_url = f'/api/petshops/{shop.pk}/availability/'
+    day_params = {'date': busy_day.isoformat(), 'service_id': service.pk}
+    week_params = {
+        'start_date': busy_day.isoformat(), 'end_date': (busy_day + timedelta(days=6)).isoformat(),
+        'service_id': service.pk,
+    }
+    sample = Appointment.objects.filter(pet_shop=shop).order_by('appointment_time').first()
+
+    return [
+        Scenario('availability (dia, cache frio)', tutor,
+                 lambda client: client.get(availability_url, day_params), cold_cache=True),
+        Scenario('availability (dia, cache quente)', tutor,
+                 lambda client: client.get(availability_url, day_params)),
+        Scenario('availability (semana, cache frio)', tutor,
+                 lambda client: client.get(availability_url, week_params), cold_cache=True),
+        Scenario('agendamentos: lista do dono', owner,
+                 lambda client: client.get('/api/agendamentos/')),
+        Scenario('agendamentos: lista filtrada', manager,
+                 lambda client: client.get('/api/agendamentos/', {
+                     'employee': employee.pk, 'start_date': busy_day.isoformat(), 'end_date': busy_day.isoformat(),
+                 })),
+        Scenario('agendamentos: lista com expand', owner,
+                 lambda client: client.get('/api/agendamentos/', {'expand': 'pet,service,employee'})),
+        Scenario('agendamentos: agenda do dia', employee,
+                 lambda client: client.get('/api/agendamentos/agenda/', {'date': busy_day.isoformat()})),
+        Scenario('agendamentos: criar', tutor,
+                 lambda client, payload: client.post('/api/agendamentos/', payload, format='json'),
+                 expected_status=201, prepare=new_booking),
+        Scenario('create_recurrence (12 semanas)', owner,
+                 lambda client, pk, end: client.post(f'/api/agendamentos/{pk}/create_recurrence/', {
+                     'frequency': 'WEEKLY', 'recurrence_end_date': end.isoformat(),
+                 }, format='json'),
+                 prepare=new_parent),
+        Scenario('permissão: serviços (gerente, cache frio)', manager,
+                 lambda client: client.get(f'/api/petshops/{shop.pk}/services/'), cold_cache=True),
+        Scenario('permissão: serviços (dono)', owner,
+                 lambda client: client.get(f'/api/petshops/{shop.pk}/services/')),
+        Scenario('permissão: detalhe do agendamento (equipe)', employee,
+                 lambda client: client.get(f'/api/agendamentos/{sample.pk}/')),
+    ]
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regressões de `results` em relação a `baseline`."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f'{name}: consultas {previous["queries"]} -> {current["queries"]}')
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {previous["p95_ms"]:.2f} ms -> {current["p95_ms"]:.2f} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=20)
+    parser.add_argument('--employees', type=int, default=5, help='Funcionários por pet shop.')
+    parser.add_argument('--appointments', type=int, default=20_000)
+    parser.add_argument('--blocks', type=int, default=2_000)
+    parser.add_argument('--days', type=int, default=120, help='Período coberto pelos dados semeados.')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help='Roda só os cenários cujo nome contém este texto.')
+    parser.add_argument('--save', help='Grava os resultados (JSON) neste arquivo.')
+    parser.add_argument('--baseline', help='Compara com resultados gravados por --save.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Piora aceitável do p95 (0.25 = 25%%).')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    data = seed(shops=args.shops, employees=args.employees, appointments=args.appointments,
+                blocks=args.blocks, days=args.days, seed_value=args.seed)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    print(', '.join(f'{count} {name}' for name, count in data.counts.items()) + f' ({connection.vendor})')
+    print(f'{"cenário":45s} {"p50":>8s} {"p95":>8s} {"p99":>8s} {"máx":>8s} {"SQL":>4s}')
+    client = APIClient()
+    results = {}
+    for scenario in build_scenarios(data):
+        if args.only and args.only not in scenario.name:
+            continue
+        result = results[scenario.name] = scenario.run(client, args.repeat, args.warmup)
+        print(f'{scenario.name:45s} {result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} '
+              f'{result["p99_ms"]:8.2f} {result["max_ms"]:8.2f} {result["queries"]:4d}')
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline) as previous:
+            regressions = compare(results, json.load(previous)['results'], args.tolerance)
+        if regressions:
+            print('\nRegressões em relação a ' + args.baseline + ':')
+            for line in regressions:
+                print(f'  - {line}')
+            sys.exit(1)
+        print(f'\nSem regressões em relação a {args.baseline}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/export.py
+"""
+Pico de memória (tracemalloc) e tempo da exportação de agendamentos
+(api/export.py) para volumes crescentes, comparados com montar a mesma
+lista inteira em memória com o serializer completo.
+
+    python -m benchmarks.export --sizes 10000,50000,200000
+"""
+import argparse
+import time as clock
+import tracemalloc
+
+from . import setup_django
+
+setup_django()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from api import export  # noqa: E402
+from api.models import Appointment  # noqa: E402
+from api.serializers import AppointmentSerializer  # noqa: E402
+
+from .seed import seed  # noqa: E402
+
+
+def measure(function):
+    tracemalloc.start()
+    started = clock.perf_counter()
+    size = function()
+    elapsed = clock.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,50000,200000', help='Quantidades de agendamentos exportados.')
+    parser.add_argument('--serializer-limit', type=int, default=50_000,
+                        help='Maior volume medido também pelo serializer (lento e caro em memória).')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    sizes = sorted(int(value) for value in args.sizes.split(','))
+
+    call_command('migrate', verbosity=0)
+    seed(appointments=sizes[-1], blocks=0, days=365, seed_value=args.seed)
+    first_id = Appointment.objects.order_by('id').values_list('id', flat=True).first()
+
+    print(f'{"linhas":>8s} {"formato":>8s} {"tempo (s)":>10s} {"pico (MiB)":>11s} {"bytes":>12s}')
+    for size in sizes:
+        appointments = Appointment.objects.filter(id__lt=first_id + size)
+        for output in export.FORMATS:
+            def consume():
+                return sum(len(chunk) for chunk in export.stream(export.export_rows(appointments), output))
+            written, elapsed, peak = measure(consume)
+            print(f'{size:8d} {output:>8s} {elapsed:10.2f} {peak:11.1f} {written:12d}')
+        if size <= args.serializer_limit:
+            def serialize():
+                queryset = appointments.select_related('tutor', 'employee', 'pet__tutor', 'pet_shop', 'service')
+                return len(AppointmentSerializer(queryset.prefetch_related('service__performers'), many=True).data)
+            _, elapsed, peak = measure(serialize)
+            print(f'{size:8d} {"lista":>8s} {elapsed:10.2f} {peak:11.1f} {"-":>12s}')
+    print(f'({connection.vendor}, chunk_size={export.EXPORT_CHUNK_SIZE})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/indexes.py
+"""
+Mede as consultas críticas de agendamento com e sem os índices compostos
+(migração 0004) num SQLite em memória com muitos agendamentos, mostrando o
+plano (EXPLAIN QUERY PLAN) de cada uma.
+
+    python -m benchmarks.indexes --appointments 200000
+"""
+import argparse
+import random
+import time as clock
+from datetime import date, timedelta
+
+from . import setup_django
+
+setup_django()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from api.availability import MAX_BOOKING_SPAN, day_bounds, load_busy_rows  # noqa: E402
+from api.models import Appointment, Pet, PetShop, Service, TimeBlock, User  # noqa: E402
+
+START_DAY = date(2024, 1, 1)
+
+
+def seed(appointments, employees, shops, seed_value):
+    rng = random.Random(seed_value)
+    owner = User.objects.create(username='dono', user_type='PROPRIETARIO')
+    petshops = PetShop.objects.bulk_create(PetShop(owner=owner, name=f'Loja {i}') for i in range(shops))
+    staff = User.objects.bulk_create(
+        User(username=f'func{i}', user_type='FUNCIONARIO', works_at=petshops[i % shops]) for i in range(employees)
+    )
+    tutor = User.objects.create(username='tutor')
+    pet = Pet.objects.create(tutor=tutor, name='Rex')
+    service = Service.objects.create(pet_shop=petshops[0], name='Banho', base_price=50, duration_minutes=60)
+    statuses = [status for status, _ in Appointment.STATUS_CHOICES]
+
+    def appointment():
+        employee = rng.choice(staff)
+        start, _ = day_bounds(START_DAY + timedelta(days=rng.randrange(730)))
+        start += timedelta(minutes=rng.randrange(8 * 60, 19 * 60, 15))
+        return Appointment(
+            tutor=tutor, pet=pet, pet_shop_id=employee.works_at_id, service=service, employee=employee,
+            appointment_time=start, end_time=start + timedelta(minutes=60),
+            status=rng.choice(statuses), total_price=50,
+        )
+
+    Appointment.objects.bulk_create((appointment() for _ in range(appointments)), batch_size=5000)
+    blocks = []
+    for _ in range(appointments // 10):
+        employee = rng.choice(staff)
+        start, _ = day_bounds(START_DAY + timedelta(days=rng.randrange(730)))
+        blocks.append(TimeBlock(employee=employee, pet_shop_id=employee.works_at_id,
+                                start_time=start + timedelta(hours=10), end_time=start + timedelta(hours=11)))
+    TimeBlock.objects.bulk_create(blocks, batch_size=5000)
+    return staff, petshops
+
+
+def scenarios(staff, petshops):
+    day = START_DAY + timedelta(days=400)
+    performers = [employee.pk for employee in staff[:10]]
+    start, end = day_bounds(day)
+    start += timedelta(hours=10)
+    end = start + timedelta(hours=1)
+    return {
+        'disponibilidade (semana, 10 funcionários)': lambda: load_busy_rows(performers, day, day + timedelta(days=6)),
+        'conflito de horário': lambda: Appointment.objects.filter(
+            employee_id=performers[0], status__in=Appointment.ACTIVE_STATUSES,
+            appointment_time__gt=start - MAX_BOOKING_SPAN, appointment_time__lt=end, end_time__gt=start,
+        ).exists(),
+        'listagem do pet shop (50 primeiros)': lambda: list(
+            Appointment.objects.filter(pet_shop=petshops[0]).order_by('appointment_time', 'id')[:50]
+        ),
+    }
+
+
+def run(label, funcs, repeat):
+    print(f'\n== {label}')
+    for name, func in funcs.items():
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        timings = []
+        for _ in range(repeat):
+            started = clock.perf_counter()
+            func()
+            timings.append(clock.perf_counter() - started)
+        print(f'{name:45s} {min(timings) * 1000:9.2f} ms')
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for row in cursor.fetchall():
+                    print(f'    {row[-1]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=200_000)
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--shops', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if connection.vendor != 'sqlite':
+        parser.error('Este benchmark usa EXPLAIN QUERY PLAN do SQLite.')
+
+    call_command('migrate', verbosity=0)
+    staff, petshops = seed(args.appointments, args.employees, args.shops, args.seed)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    funcs = scenarios(staff, petshops)
+    run('com índices compostos', funcs, args.repeat)
+
+    with connection.schema_editor() as editor:
+        for model in (Appointment, TimeBlock):
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    run('sem índices compostos (apenas os índices das FKs)', funcs, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
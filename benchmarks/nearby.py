@@ -0,0 +1,92 @@
+# benchmarks/nearby.py
+"""
+Compara a busca de pet shops próximos (retângulo indexado + haversine,
+api/geo.py) com a varredura completa que o app fazia no cliente: ler todos
+os pet shops e ordenar pela distância.
+
+    python -m benchmarks.nearby --shops 50000
+"""
+import argparse
+import random
+import time as clock
+
+from . import setup_django
+
+setup_django()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from api import geo  # noqa: E402
+from api.models import PetShop, User  # noqa: E402
+
+# Retângulo aproximado do Brasil; metade dos pet shops concentrada em São Paulo.
+BRAZIL = (-33.7, 5.2, -73.9, -34.8)
+SAO_PAULO = (-23.5505, -46.6333)
+
+
+def seed(shops, seed_value):
+    rng = random.Random(seed_value)
+    owner = User.objects.create(username='dono', user_type='PROPRIETARIO')
+
+    def coordinates(index):
+        if index % 2:
+            return SAO_PAULO[0] + rng.gauss(0, 0.15), SAO_PAULO[1] + rng.gauss(0, 0.15)
+        return rng.uniform(BRAZIL[0], BRAZIL[1]), rng.uniform(BRAZIL[2], BRAZIL[3])
+
+    def petshop(index):
+        lat, lng = coordinates(index)
+        return PetShop(owner=owner, name=f'Loja {index}', latitude=round(lat, 6), longitude=round(lng, 6))
+
+    PetShop.objects.bulk_create((petshop(i) for i in range(shops)), batch_size=5000)
+
+
+def full_scan(lat, lng, radius_km, limit):
+    """Caminho antigo: todos os pet shops, distância calculada para cada um."""
+    ranked = []
+    for petshop in PetShop.objects.exclude(latitude=None).exclude(longitude=None):
+        distance = geo.haversine_km(lat, lng, petshop.latitude, petshop.longitude)
+        if distance <= radius_km:
+            ranked.append((distance, petshop.pk, petshop))
+    ranked.sort(key=lambda item: item[:2])
+    return [petshop for _, _, petshop in ranked[:limit]]
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = clock.perf_counter()
+        result = func()
+        timings.append(clock.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shops', type=int, default=50_000)
+    parser.add_argument('--radius', type=float, default=5)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    seed(args.shops, args.seed)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    queryset = PetShop.objects.order_by('id')
+    points = {'centro de São Paulo (denso)': SAO_PAULO, 'Cuiabá (esparso)': (-15.601, -56.097)}
+    print(f'{args.shops} pet shops, raio {args.radius} km, limite {args.limit}')
+    for label, (lat, lng) in points.items():
+        scan_time, expected = timed(lambda: full_scan(lat, lng, args.radius, args.limit), args.repeat)
+        box_time, found = timed(lambda: geo.nearby(queryset, lat, lng, args.radius, args.limit), args.repeat)
+        assert [p.pk for p in found] == [p.pk for p in expected], 'resultados divergentes'
+        print(f'\n== {label}: {len(found)} resultados')
+        print(f'{"varredura completa":30s} {scan_time * 1000:9.2f} ms')
+        print(f'{"retângulo indexado + haversine":30s} {box_time * 1000:9.2f} ms  ({scan_time / box_time:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
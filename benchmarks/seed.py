@@ -0,0 +1,119 @@
+# benchmarks/seed.py
+"""
+Gerador de dados reproduzível para os benchmarks: N pet shops, cada um com
+dono, funcionários com `work_schedule`, serviços com performers, tutores
+com pets, K agendamentos e bloqueios espalhados por um período.
+
+Usa bulk_create em todas as tabelas; com a mesma semente gera sempre os
+mesmos dados.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from api.availability import day_bounds
+from api.models import Appointment, Pet, PetShop, Service, TimeBlock, User
+
+START_DAY = date(2025, 1, 6)  # uma segunda-feira
+WORK_SCHEDULE = {
+    day: {"start": "08:00", "break_start": "12:00", "break_end": "13:00", "end": "18:00"}
+    for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday')
+}
+WORK_SCHEDULE['saturday'] = {"start": "08:00", "end": "12:00"}
+BATCH_SIZE = 5000
+
+
+@dataclass
+class SeedData:
+    petshops: list
+    owners: list
+    staff_by_shop: dict
+    services_by_shop: dict
+    tutors: list
+    pets: list
+    start_day: date
+    days: int
+    counts: dict = field(default_factory=dict)
+
+
+def seed(shops=20, employees=5, services=4, tutors=200, appointments=20_000, blocks=2_000,
+         days=120, start_day=START_DAY, seed_value=42):
+    """
+    Grava os dados e retorna um SeedData. `employees` e `services` são por
+    pet shop; agendamentos e bloqueios caem em horários de expediente dos
+    `days` dias a partir de `start_day`, sem checar conflitos (carga bruta).
+    """
+    rng = random.Random(seed_value)
+    owners = User.objects.bulk_create(
+        User(username=f'dono{i}', user_type='PROPRIETARIO') for i in range(shops)
+    )
+    petshops = PetShop.objects.bulk_create(
+        PetShop(owner=owner, name=f'Pet Shop {i}', latitude=round(-23.5 + rng.uniform(-0.3, 0.3), 6),
+                longitude=round(-46.6 + rng.uniform(-0.3, 0.3), 6))
+        for i, owner in enumerate(owners)
+    )
+    staff = User.objects.bulk_create(
+        User(username=f'func{shop.pk}_{i}', user_type='GERENTE' if i == 0 else 'FUNCIONARIO',
+             works_at=shop, work_schedule=WORK_SCHEDULE)
+        for shop in petshops for i in range(employees)
+    )
+    staff_by_shop = {}
+    for employee in staff:
+        staff_by_shop.setdefault(employee.works_at_id, []).append(employee)
+
+    catalog = Service.objects.bulk_create(
+        Service(pet_shop=shop, name=f'Serviço {i}', base_price=40 + 10 * i,
+                duration_minutes=rng.choice([30, 45, 60, 90]), buffer_time_minutes=rng.choice([0, 15]))
+        for shop in petshops for i in range(services)
+    )
+    services_by_shop = {}
+    performers = []
+    for service in catalog:
+        services_by_shop.setdefault(service.pet_shop_id, []).append(service)
+        team = staff_by_shop[service.pet_shop_id]
+        for employee in rng.sample(team, k=max(1, len(team) // 2 + 1)):
+            performers.append(Service.performers.through(service_id=service.pk, user_id=employee.pk))
+    Service.performers.through.objects.bulk_create(performers, batch_size=BATCH_SIZE)
+
+    tutor_rows = User.objects.bulk_create(
+        User(username=f'tutor{i}', user_type='TUTOR') for i in range(tutors)
+    )
+    pets = Pet.objects.bulk_create(Pet(tutor=tutor, name=f'Pet {tutor.pk}') for tutor in tutor_rows)
+
+    statuses = ['CONFIRMED'] * 6 + ['PENDING'] * 2 + ['COMPLETED', 'CANCELLED']
+
+    def working_start():
+        day = start_day + timedelta(days=rng.randrange(days))
+        while day.weekday() == 6:
+            day += timedelta(days=1)
+        midnight, _ = day_bounds(day)
+        return midnight + timedelta(minutes=rng.randrange(8 * 60, 17 * 60, 15))
+
+    def appointment():
+        shop = rng.choice(petshops)
+        service = rng.choice(services_by_shop[shop.pk])
+        pet = rng.choice(pets)
+        start = working_start()
+        return Appointment(
+            tutor_id=pet.tutor_id, pet=pet, pet_shop=shop, service=service,
+            employee=rng.choice(staff_by_shop[shop.pk]), appointment_time=start,
+            end_time=start + timedelta(minutes=(service.duration_minutes or 60) + service.buffer_time_minutes),
+            status=rng.choice(statuses), total_price=service.base_price,
+        )
+
+    Appointment.objects.bulk_create((appointment() for _ in range(appointments)), batch_size=BATCH_SIZE)
+
+    def time_block():
+        employee = rng.choice(staff)
+        start = working_start()
+        return TimeBlock(employee=employee, pet_shop_id=employee.works_at_id, start_time=start,
+                         end_time=start + timedelta(minutes=rng.choice([30, 60, 120])), reason='Bloqueio')
+
+    TimeBlock.objects.bulk_create((time_block() for _ in range(blocks)), batch_size=BATCH_SIZE)
+
+    return SeedData(
+        petshops=petshops, owners=owners, staff_by_shop=staff_by_shop, services_by_shop=services_by_shop,
+        tutors=tutor_rows, pets=pets, start_day=start_day, days=days,
+        counts={'petshops': shops, 'employees': len(staff), 'services': len(catalog), 'tutors': tutors,
+                'appointments': appointments, 'time_blocks': blocks},
+    )
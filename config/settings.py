@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config
 import dj_database_url
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Tempo, consultas e Server-Timing por endpoint (api/middleware.py)
+    'api.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -81,6 +84,50 @@ DATABASES = {
     'default': dj_database_url.parse(config('DATABASE_URL'))
 }
 
+# No SQLite não há SELECT ... FOR UPDATE: abrindo as transações em modo
+# IMMEDIATE, a verificação de conflito e a gravação de um agendamento ficam
+# serializadas (ver AppointmentViewSet.perform_create).
+# O banco de testes fica em arquivo (e não em memória compartilhada, que usa
+# travas por tabela) para que os testes de concorrência reflitam o real; o
+# arquivo vai para o diretório temporário, fora do repositório.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({'transaction_mode': 'IMMEDIATE', 'timeout': 20})
+    DATABASES['default'].setdefault('TEST', {}).setdefault(
+        'NAME', str(Path(tempfile.gettempdir()) / f'{BASE_DIR.name}_test_db.sqlite3')
+    )
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'conecta-my-pet',
+    }
+}
+
+# Tempo (em segundos) que um resultado de disponibilidade fica em cache.
+# As entradas também são invalidadas pelos sinais em api/signals.py.
+AVAILABILITY_CACHE_TIMEOUT = config('AVAILABILITY_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Instrumentação por requisição (api/middleware.py): métricas em /api/metrics/
+# e cabeçalho Server-Timing. Consultas acima de SLOW_QUERY_THRESHOLD_MS (0 =
+# desligado) são registradas no logger `api.slow_queries`.
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=True, cast=bool)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=0, cast=float)
+
+# Tempo (em segundos) que os indicadores de um dia encerrado ficam em cache
+# (api/analytics.py); alterações nos agendamentos do dia também os descartam.
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Tempo (em segundos) que os pet shops de cada dono ficam em cache (api/membership.py).
+MEMBERSHIP_CACHE_TIMEOUT = config('MEMBERSHIP_CACHE_TIMEOUT', default=300, cast=int)
+
+# Séries recorrentes "por regra": quantas semanas à frente ficam gravadas
+# (o comando `materialize_recurrences` avança esse horizonte).
+RECURRENCE_HORIZON_WEEKS = config('RECURRENCE_HORIZON_WEEKS', default=8, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -123,5 +170,15 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST Framework
+# Todas as listagens são paginadas; o cliente pode pedir `?page_size=` até API_MAX_PAGE_SIZE.
+
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=200, cast=int)
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.StandardPageNumberPagination',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=50, cast=int),
+}
+
 # Define o nosso User personalizado como o modelo de autenticação padrão
 AUTH_USER_MODEL = 'api.User'
\ No newline at end of file